@@ -0,0 +1,22 @@
+"""
+Password hashing in worker processes of bulk user imports.
+
+This module does not import models, so it can be imported by worker
+processes which are spawned rather than forked: forks of a threaded server
+inherit locks held by its other threads. Spawned workers start with the
+settings module, so settings overridden in the parent are passed to them.
+"""
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+
+def init_worker(hashers):
+    """Set up Django in a worker process with the password hashers of the parent."""
+    django.setup()
+    settings.PASSWORD_HASHERS = hashers
+
+
+def hash_passwords(passwords):
+    """Hash a chunk of passwords in a worker process, unusable passwords are made for missing ones."""
+    return [make_password(password) for password in passwords]
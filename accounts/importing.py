@@ -0,0 +1,232 @@
+"""
+Bulk import of users.
+
+Rows hold an `email`, a `full_name`, an optional `password`, an optional
+`role`, `student` or `instructor`, and optional `groups` of students, codes
+of student groups given as a list or as a string separated by semicolons or
+spaces. Users without a password get an unusable one and can reset it.
+
+Invalid rows are reported by their number, starting at 1, and skipped, the
+other rows are still imported. Hashing passwords takes most of the time of
+an import, so passwords of all valid rows are hashed in chunks across a
+process pool, see `accounts.hashing`, while users, their profiles and
+group memberships are inserted with bulk inserts in batches as their
+hashes arrive. Bulk inserts do not send model signals, so generations are
+bumped and `group_students_changed` is sent once at the end.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from accounts import hashing
+from accounts.models import InstructorProfile, StudentGroup, StudentProfile
+from accounts.signals import group_students_changed
+from common import bulk
+from common.cache import generations
+from common.permissions import permission_cache
+
+User = get_user_model()
+
+ROLES = ('student', 'instructor')
+GROUP_SEPARATOR = re.compile(r'[;\s]+')
+HASH_CHUNK_SIZE = 50
+FULL_NAME_LENGTH = User._meta.get_field('full_name').max_length
+REQUIRED = 'This field is required.'
+
+
+def get_codes(value):
+    if isinstance(value, str):
+        return [code for code in GROUP_SEPARATOR.split(value) if code]
+    if isinstance(value, list) and all(isinstance(code, str) for code in value):
+        return value
+    raise ValidationError('Enter a list of group codes.')
+
+
+class UserImporter:
+    """
+    Import users from rows, see the module description.
+
+    `counts` holds numbers of created users, student and instructor
+    profiles and group memberships, `errors` holds dictionaries of the row
+    number, its email and errors by field of rejected rows.
+    """
+
+    def __init__(self, batch_size=1000, workers=None):
+        self.batch_size = batch_size
+        self.workers = workers or getattr(settings, 'IMPORT_WORKERS', None) or os.cpu_count()
+        self.counts = {'users': 0, 'students': 0, 'instructors': 0, 'memberships': 0}
+        self.errors = []
+        self.emails = set()
+        self.groups = set()
+        self.students = set()
+
+    def run(self, rows):
+        """
+        Args:
+            rows: iterable of dictionaries of user fields
+
+        Returns: counts and errors of the import
+        """
+        rows = list(rows)
+        self.group_pks = self.get_groups(rows)
+        valid = []
+        for start in range(0, len(rows), self.batch_size):
+            valid.extend(self.validate(rows[start:start + self.batch_size], start + 1))
+
+        passwords = [row['password'] for row in valid]
+        executor = None
+        if self.workers > 1 and len(passwords) > HASH_CHUNK_SIZE:
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=hashing.init_worker, initargs=(settings.PASSWORD_HASHERS,))
+        try:
+            hashes = self.hash(passwords, executor)
+            for start in range(0, len(valid), self.batch_size):
+                batch = valid[start:start + self.batch_size]
+                for row in batch:
+                    row['password'] = next(hashes)
+                self.insert(batch)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        self.finish()
+        return {**self.counts, 'errors': self.errors}
+
+    @staticmethod
+    def get_groups(rows):
+        """
+        Returns: dictionary of primary keys of groups referenced by rows by code
+        """
+        codes = set()
+        for row in rows:
+            try:
+                codes.update(get_codes(row.get('groups') or []))
+            except (AttributeError, ValidationError):
+                pass
+        return dict(StudentGroup.objects.filter(code__in=codes).values_list('code', 'pk'))
+
+    def validate(self, rows, first_number):
+        """
+        Returns: list of valid rows with normalized values, errors of other rows are added to `errors`
+        """
+        emails = [
+            User.objects.normalize_email(str(row.get('email', '')).strip()) if isinstance(row, dict) else ''
+            for row in rows
+        ]
+        existing = set(User.objects.filter(email__in=[email for email in emails if email]).values_list(
+            'email', flat=True,
+        ))
+
+        valid = []
+        for number, (row, email) in enumerate(zip(rows, emails), first_number):
+            if not isinstance(row, dict):
+                self.add_error(number, '', {'non_field_errors': ['Expected an object.']})
+                continue
+            errors, result = {}, {'number': number, 'email': email}
+            if not email:
+                errors['email'] = [REQUIRED]
+            else:
+                try:
+                    validate_email(email)
+                except ValidationError as error:
+                    errors['email'] = error.messages
+                if email in existing or email in self.emails:
+                    errors['email'] = ['A user with this email already exists.']
+
+            result['full_name'] = str(row.get('full_name', '')).strip()
+            if not result['full_name']:
+                errors['full_name'] = [REQUIRED]
+            elif len(result['full_name']) > FULL_NAME_LENGTH:
+                errors['full_name'] = [f'Ensure this field has no more than {FULL_NAME_LENGTH} characters.']
+
+            result['password'] = row.get('password') or None
+            if result['password'] is not None and not isinstance(result['password'], str):
+                errors['password'] = ['Enter a string.']
+
+            result['role'] = str(row.get('role') or '').strip().lower() or None
+            if result['role'] is not None and result['role'] not in ROLES:
+                errors['role'] = [f'Choose one of: {", ".join(ROLES)}.']
+
+            try:
+                codes = get_codes(row.get('groups') or [])
+                missing = sorted(set(codes) - set(self.group_pks))
+                if missing:
+                    raise ValidationError(f'Unknown student groups: {", ".join(missing)}.')
+                if codes and result['role'] != 'student':
+                    raise ValidationError('Only students can join groups.')
+                result['groups'] = {self.group_pks[code] for code in codes}
+            except ValidationError as error:
+                errors['groups'] = error.messages
+
+            if errors:
+                self.add_error(number, email, errors)
+            else:
+                self.emails.add(email)
+                valid.append(result)
+        return valid
+
+    def hash(self, passwords, executor=None):
+        """
+        Returns: iterator of password hashes in order of passwords
+        """
+        if executor is None:
+            return iter(hashing.hash_passwords(passwords))
+        chunks = [passwords[start:start + HASH_CHUNK_SIZE] for start in range(0, len(passwords), HASH_CHUNK_SIZE)]
+        return chain.from_iterable(executor.map(hashing.hash_passwords, chunks))
+
+    def insert(self, rows):
+        """
+        Insert a batch of rows, rows are inserted one by one to find the
+        failing ones when the batch conflicts with concurrent changes.
+        """
+        try:
+            with transaction.atomic():
+                self.create(rows)
+        except IntegrityError:
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        self.create([row])
+                except IntegrityError as error:
+                    self.add_error(row['number'], row['email'], {'non_field_errors': [str(error)]})
+
+    def create(self, rows):
+        users = bulk.bulk_create(User, [
+            User(email=row['email'], full_name=row['full_name'], password=row['password']) for row in rows
+        ], self.batch_size)
+        profiles = {}
+        for model, role in ((StudentProfile, 'student'), (InstructorProfile, 'instructor')):
+            selected = [(row, user) for row, user in zip(rows, users) if row['role'] == role]
+            created = bulk.bulk_create(model, [model(user_id=user.pk) for row, user in selected], self.batch_size)
+            profiles[role] = list(zip((row for row, user in selected), created))
+
+        pairs = [(group, student.pk) for row, student in profiles['student'] for group in row['groups']]
+        bulk.bulk_add(StudentGroup.students.field, pairs, self.batch_size)
+
+        self.counts['users'] += len(users)
+        self.counts['students'] += len(profiles['student'])
+        self.counts['instructors'] += len(profiles['instructor'])
+        self.counts['memberships'] += len(pairs)
+        self.groups.update(group for group, student in pairs)
+        self.students.update(student for group, student in pairs)
+
+    def add_error(self, number, email, errors):
+        self.errors.append({'row': number, 'email': email, 'errors': errors})
+
+    def finish(self):
+        if not self.counts['users']:
+            return
+        for model in (User, StudentProfile, InstructorProfile, StudentGroup, StudentGroup.students.through):
+            generations.bump(model)
+        # Primary keys of deleted users may be reused by the database.
+        permission_cache.bump_version()
+        if self.students:
+            group_students_changed.send(sender=StudentGroup, groups=self.groups, students=self.students)
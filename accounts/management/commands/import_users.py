@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importing import UserImporter
+from common.tabular import read_csv, read_ndjson
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+class Command(BaseCommand):
+    help = 'Import users with student or instructor profiles and group memberships from CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path of the file to import.')
+        parser.add_argument('--format', choices=tuple(READERS),
+                            help='Format of the file, guessed from its extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of users per insert.')
+        parser.add_argument('--workers', type=int, help='Number of password hashing processes.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['file'].rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Unknown format "{file_format}", use --format.')
+        try:
+            with open(options['file'], encoding='utf-8', newline='') as file:
+                rows = READERS[file_format](file)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        result = UserImporter(options['batch_size'], options['workers']).run(rows)
+        for error in result.pop('errors'):
+            self.stderr.write(f'Row {error["row"]} ({error["email"]}): {json.dumps(error["errors"])}')
+        self.stdout.write(json.dumps(result, indent=2, sort_keys=True))
+        self.stdout.write(self.style.SUCCESS(f'Imported {result["users"]} of {len(rows)} users.'))
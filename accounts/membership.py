@@ -0,0 +1,53 @@
+"""
+Bulk changes of students of student groups.
+
+Given students are compared with the current members of a group, so only
+through table rows of added and removed students are written, with a bulk
+insert and a single delete. These do not send `m2m_changed`, so
+generations are bumped and `group_students_changed` is sent once with all
+changed students instead.
+"""
+from django.db import transaction
+
+from accounts.models import StudentGroup, StudentProfile
+from accounts.signals import group_students_changed
+from common import bulk
+from common.cache import generations
+
+ADD, REMOVE, REPLACE = 'add', 'remove', 'replace'
+
+
+@transaction.atomic
+def change_students(group, student_ids, mode, batch_size=1000):
+    """
+    Add students to a group, remove them from it or replace its students.
+    Args:
+        group: student group
+        student_ids: iterable of primary keys of students
+        mode: `ADD`, `REMOVE` or `REPLACE`
+
+    Returns: tuple of sets of primary keys of added and removed students
+    """
+    field = StudentGroup.students.field
+    through = field.remote_field.through
+    members = through.objects.filter(studentgroup=group)
+    student_ids = set(student_ids)
+    current = set(members.values_list('studentprofile_id', flat=True))
+
+    added = student_ids - current if mode in (ADD, REPLACE) else set()
+    if mode == REMOVE:
+        removed = student_ids & current
+    elif mode == REPLACE:
+        removed = current - student_ids
+    else:
+        removed = set()
+
+    bulk.bulk_add(field, [(group.pk, student_id) for student_id in sorted(added)], batch_size)
+    if removed:
+        members.filter(studentprofile__in=removed).delete()
+
+    if added or removed:
+        for model in (StudentGroup, StudentProfile, through):
+            generations.bump(model)
+        group_students_changed.send(sender=StudentGroup, groups={group.pk}, students=added | removed)
+    return added, removed
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.8 on 2026-10-18 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_auto_20210612_1909'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='modified_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='instructorprofile',
+            name='modified_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='modified_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
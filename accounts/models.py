@@ -1,3 +1,5 @@
+import secrets
+
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 from django.core.validators import validate_email
@@ -15,7 +17,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin, UUIDFieldMixin):
     full_name = models.CharField(max_length=255)
     email = models.EmailField(unique=True, validators=[validate_email])
     created_date = models.DateTimeField(default=timezone.now, editable=False)
-    modified_date = models.DateTimeField(default=timezone.now, editable=False)
+    modified_date = models.DateTimeField(auto_now=True)
     is_staff = models.BooleanField(
         _('staff status'),
         default=False,
@@ -56,7 +58,7 @@ class UserProfile(UUIDFieldMixin, models.Model):
         related_name='%(class)s'
     )
     created_date = models.DateTimeField(default=timezone.now, editable=False)
-    modified_date = models.DateTimeField(default=timezone.now, editable=False)
+    modified_date = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.user.__str__()
@@ -93,3 +95,29 @@ class StudentGroup(UUIDFieldMixin, models.Model):
 
     def __str__(self):
         return self.code
+
+
+class FeedToken(models.Model):
+    """Secret token authenticating calendar feed subscriptions of a user."""
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=CASCADE,
+        related_name='feed_token',
+    )
+    key = models.CharField(max_length=64, unique=True)
+    created_date = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self):
+        return self.user.__str__()
+
+    @staticmethod
+    def generate_key():
+        return secrets.token_urlsafe(32)
+
+    @classmethod
+    def rotate(cls, user):
+        """Replace the token of a user with a new one."""
+        token, _ = cls.objects.update_or_create(
+            user=user, defaults={'key': cls.generate_key(), 'created_date': timezone.now()},
+        )
+        return token
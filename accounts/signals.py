@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent once after bulk changes of group memberships, which do not send
+# `m2m_changed`, with sets of primary keys of the changed `groups` and of
+# the added or removed `students`.
+group_students_changed = Signal()
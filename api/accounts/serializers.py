@@ -2,9 +2,11 @@ from dj_rest_auth.serializers import LoginSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
-from accounts.models import StudentProfile, InstructorProfile, StudentGroup
-from api.common.serializers import UUIDHyperlinkedRelatedField
+from accounts.models import FeedToken, StudentProfile, InstructorProfile, StudentGroup
+from api.common.serializers import HyperlinkedModelSerializer, HyperlinkedRelatedField, UUIDHyperlinkedRelatedField
+from common.authentication import FeedTokenAuthentication
 
 
 class CustomLoginSerializer(LoginSerializer):
@@ -19,7 +21,7 @@ class CustomLoginSerializer(LoginSerializer):
         pass
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
+class UserSerializer(HyperlinkedModelSerializer):
     """Custom serializer for user model."""
 
     class Meta:
@@ -47,7 +49,7 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
         return user
 
 
-class UserUpdateSerializer(serializers.HyperlinkedModelSerializer):
+class UserUpdateSerializer(HyperlinkedModelSerializer):
     """Custom update serializer for user model."""
 
     class Meta:
@@ -64,14 +66,15 @@ class UserUpdateSerializer(serializers.HyperlinkedModelSerializer):
         instance.email = validated_data.get('email', instance.email)
         instance.full_name = validated_data.get(
             'full_name', instance.full_name)
-        instance.groups.set(validated_data.get('groups', instance.groups))
+        if 'groups' in validated_data:
+            instance.groups.set(validated_data['groups'])
         instance.save()
         return instance
 
 
-class GroupSerializer(serializers.HyperlinkedModelSerializer):
+class GroupSerializer(HyperlinkedModelSerializer):
     """Custom serializer for group model."""
-    permissions = serializers.HyperlinkedRelatedField(
+    permissions = HyperlinkedRelatedField(
         view_name='permission-detail',
         queryset=Permission.objects.all(),
         many=True,
@@ -82,7 +85,7 @@ class GroupSerializer(serializers.HyperlinkedModelSerializer):
         fields = '__all__'
 
 
-class PermissionSerializer(serializers.HyperlinkedModelSerializer):
+class PermissionSerializer(HyperlinkedModelSerializer):
     """Custom serializer for permission model."""
 
     class Meta:
@@ -90,7 +93,7 @@ class PermissionSerializer(serializers.HyperlinkedModelSerializer):
         fields = ('url', 'name', 'codename',)
 
 
-class UserProfileSerializer(serializers.HyperlinkedModelSerializer):
+class UserProfileSerializer(HyperlinkedModelSerializer):
     """Custom serializer for user profile model."""
     user = UUIDHyperlinkedRelatedField(
         view_name='user-detail',
@@ -138,7 +141,7 @@ class InstructorProfileSerializer(UserProfileSerializer):
         }
 
 
-class StudentGroupSerializer(serializers.HyperlinkedModelSerializer):
+class StudentGroupSerializer(HyperlinkedModelSerializer):
     students = UUIDHyperlinkedRelatedField(
         view_name='student-detail',
         queryset=StudentProfile.objects.all(),
@@ -156,3 +159,45 @@ class StudentGroupSerializer(serializers.HyperlinkedModelSerializer):
                 'lookup_field': 'uuid',
             }
         }
+
+
+class StudentGroupStudentsSerializer(serializers.Serializer):
+    """Students to add to a group, remove from it or replace its students with, and numbers of changed members."""
+    students = serializers.ListField(child=serializers.UUIDField(), write_only=True)
+    added = serializers.IntegerField(read_only=True)
+    removed = serializers.IntegerField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+
+    def validate_students(self, value):
+        students = dict(StudentProfile.objects.filter(uuid__in=value).values_list('uuid', 'pk'))
+        missing = set(value) - set(students)
+        if missing:
+            raise serializers.ValidationError(f'Unknown students: {", ".join(sorted(map(str, missing)))}.')
+        return list(students.values())
+
+
+class UserImportErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    email = serializers.CharField()
+    errors = serializers.DictField(child=serializers.ListField(child=serializers.CharField()))
+
+
+class UserImportSerializer(serializers.Serializer):
+    """Numbers of created users, profiles and group memberships and errors of rejected rows of an import."""
+    users = serializers.IntegerField()
+    students = serializers.IntegerField()
+    instructors = serializers.IntegerField()
+    memberships = serializers.IntegerField()
+    errors = UserImportErrorSerializer(many=True)
+
+
+class FeedTokenSerializer(serializers.ModelSerializer):
+    calendar = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FeedToken
+        fields = ('key', 'created_date', 'calendar',)
+
+    def get_calendar(self, obj) -> str:
+        url = reverse('user-calendar', request=self.context.get('request'))
+        return f'{url}?{FeedTokenAuthentication.query_param}={obj.key}'
@@ -1,11 +1,22 @@
+import json
+import tempfile
+from io import StringIO
 from uuid import uuid4
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
 from accounts.models import StudentGroup, StudentProfile, InstructorProfile
+from accounts.signals import group_students_changed
+from common.permissions import permission_cache
 
 User = get_user_model()
 
@@ -126,6 +137,28 @@ class UserCrudTests(APITestCase):
         response = self.client.put(self.user_detail_url, data={})
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_update_account_details_modified_date(self):
+        """Test if updating account details updates the modification date."""
+        modified_date = self.test_data.superuser.modified_date
+        self.test_data.login_as_superuser(self.client)
+        self.client.patch(self.user_detail_url, data={'full_name': 'Jane Doe'})
+        self.test_data.superuser.refresh_from_db()
+        self.assertGreater(self.test_data.superuser.modified_date, modified_date)
+
+    def test_bulk_update_password(self):
+        """Test if bulk updates of users ignore passwords instead of storing them unhashed."""
+        self.test_data.login_as_superuser(self.client)
+        user = self.test_data.user1
+        response = self.client.patch(self.user_list_url, [
+            {'uuid': str(user.uuid), 'full_name': 'Jack Roe', 'password': 'plaintext', 'is_staff': True},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.full_name, 'Jack Roe')
+        self.assertNotEqual(user.password, 'plaintext')
+        self.assertTrue(user.check_password('test'))
+        self.assertFalse(user.is_staff)
+
     def test_delete_user(self):
         """Test if user can delete another user."""
         self.test_data.login_as_superuser(self.client)
@@ -232,3 +265,232 @@ class StudentGroupCrudTests(APITestCase):
         """Test if not authenticated user can delete student group."""
         response = self.client.delete(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PermissionCacheTests(APITestCase):
+    """Test module for the cross-request permission cache."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.login_data = {
+            'email': self.test_data.user1.email,
+            'password': 'test',
+        }
+        self.group = Group.objects.create(name='Viewers')
+        self.group.permissions.add(Permission.objects.get(codename='view_studentgroup'))
+        self.list_url = reverse('student-group-list')
+        permission_cache.reset_stats()
+
+    def test_permissions_are_cached_between_requests(self):
+        """Test if user permissions are loaded from the database only once."""
+        self.test_data.user1.groups.add(self.group)
+        self.client.post(self.test_data.login_url, self.login_data)
+
+        first_response = self.client.get(self.list_url)
+        second_response = self.client.get(self.list_url)
+        self.assertEqual(first_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(permission_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_user_groups_change_invalidates_cache(self):
+        """Test if adding a user to a group invalidates cached permissions."""
+        self.client.post(self.test_data.login_url, self.login_data)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.test_data.user1.groups.add(self.group)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_group_permissions_change_invalidates_cache(self):
+        """Test if removing group permissions invalidates cached permissions."""
+        self.test_data.user1.groups.add(self.group)
+        self.client.post(self.test_data.login_url, self.login_data)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.group.permissions.clear()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_user_permissions_change_invalidates_cache(self):
+        """Test if granting a user permission invalidates cached permissions."""
+        self.client.post(self.test_data.login_url, self.login_data)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.test_data.user1.user_permissions.add(Permission.objects.get(codename='view_studentgroup'))
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class StudentGroupStudentsTests(APITestCase):
+    """Test module for bulk changes of students of student groups."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('student-group-students', kwargs={'uuid': self.test_data.student_group.uuid})
+        self.students = [self.test_data.student] + [
+            StudentProfile.objects.create(user=User.objects.create_user(
+                full_name=f'Student {number}', email=f'student{number}@test.com', password='test',
+            ))
+            for number in range(3)
+        ]
+        self.received = []
+        group_students_changed.connect(self.receive, sender=StudentGroup)
+        self.addCleanup(group_students_changed.disconnect, self.receive, sender=StudentGroup)
+
+    def receive(self, **kwargs):
+        self.received.append(kwargs['students'])
+
+    def change(self, method, students, expected):
+        response = getattr(self.client, method)(self.url, {'students': [student.uuid for student in students]},
+                                                format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['added'], response.data['removed'], response.data['count']), expected)
+        return response
+
+    def test_add_students(self):
+        """Test if only students who are not members are added with a single signal."""
+        self.change('post', self.students, (3, 0, 4))
+        self.assertEqual(set(self.test_data.student_group.students.all()), set(self.students))
+        self.assertEqual(self.received, [{student.pk for student in self.students[1:]}])
+
+        self.change('post', self.students[:2], (0, 0, 4))
+        self.assertEqual(len(self.received), 1)
+
+    def test_remove_students(self):
+        """Test if only members are removed."""
+        self.change('delete', self.students[:2], (0, 1, 0))
+        self.assertEqual(self.received, [{self.test_data.student.pk}])
+
+    def test_replace_students(self):
+        """Test if students are replaced by writing only changed memberships."""
+        with CaptureQueriesContext(connection) as queries:
+            self.change('put', self.students[1:3], (2, 1, 2))
+        self.assertEqual(set(self.test_data.student_group.students.all()), set(self.students[1:3]))
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(self.received, [{student.pk for student in self.students[:3]}])
+
+        self.change('put', [], (0, 2, 0))
+
+    def test_invalid_students(self):
+        """Test if unknown students are rejected without changing members."""
+        response = self.client.post(self.url, {'students': [str(self.students[1].uuid), str(uuid4())]},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.test_data.student_group.students.count(), 1)
+
+    def test_change_students_not_authorized(self):
+        """Test if changing students requires the permission to change groups."""
+        self.client.logout()
+        self.test_data.user1.user_permissions.add(Permission.objects.get(codename='delete_studentgroup'))
+        self.client.post(self.test_data.login_url, {'email': self.test_data.user1.email, 'password': 'test'})
+        response = self.client.delete(self.url, {'students': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UserImportTests(APITestCase):
+    """Test module for bulk imports of users."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('user-import')
+        self.rows = [
+            {'email': 'ann@test.com', 'full_name': 'Ann Doe', 'password': 'secret', 'role': 'student',
+             'groups': ['TG4316']},
+            {'email': 'bob@test.com', 'full_name': 'Bob Doe', 'role': 'instructor'},
+            {'email': self.test_data.user1.email, 'full_name': 'Jack Doe'},
+            {'email': 'not an email', 'full_name': ''},
+            {'email': 'cid@test.com', 'full_name': 'Cid Doe', 'role': 'student', 'groups': 'TG4316 XX0000'},
+            {'email': 'ann@test.com', 'full_name': 'Ann Again'},
+        ]
+
+    def test_import_users(self):
+        """Test if valid rows are imported with profiles and memberships and invalid rows are reported."""
+        response = self.client.post(self.url, self.rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual({key: response.data[key] for key in ('users', 'students', 'instructors', 'memberships')},
+                         {'users': 2, 'students': 1, 'instructors': 1, 'memberships': 1})
+        self.assertEqual([(error['row'], sorted(error['errors'])) for error in response.data['errors']], [
+            (3, ['email']), (4, ['email', 'full_name']), (5, ['groups']), (6, ['email']),
+        ])
+
+        ann = User.objects.get(email='ann@test.com')
+        self.assertTrue(ann.check_password('secret'))
+        self.assertEqual(list(ann.studentprofile.student_groups.all()), [self.test_data.student_group])
+        bob = User.objects.get(email='bob@test.com')
+        self.assertFalse(bob.has_usable_password())
+        self.assertTrue(InstructorProfile.objects.filter(user=bob).exists())
+
+    def test_import_users_from_csv(self):
+        """Test if CSV uploads are imported and passwords are hashed in a process pool."""
+        lines = ['email,full_name,password,role,groups']
+        lines += [f'user{number}@test.com,User {number},pass{number},student,TG4316' for number in range(60)]
+        received = []
+        group_students_changed.connect(lambda **kwargs: received.append(kwargs), sender=StudentGroup, weak=False,
+                                       dispatch_uid='test_import_users_from_csv')
+        try:
+            with override_settings(IMPORT_WORKERS=2,
+                                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                response = self.client.post(self.url, '\n'.join(lines), content_type='text/csv')
+                self.assertTrue(User.objects.get(email='user59@test.com').check_password('pass59'))
+        finally:
+            group_students_changed.disconnect(sender=StudentGroup, dispatch_uid='test_import_users_from_csv')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['users'], response.data['errors']), (60, []))
+        self.assertEqual(self.test_data.student_group.students.count(), 61)
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['groups'], {self.test_data.student_group.pk})
+        self.assertEqual(len(received[0]['students']), 60)
+
+    def test_import_users_from_csv_multiline(self):
+        """Test if quoted CSV fields spanning lines are kept within their rows."""
+        content = 'email,full_name,role\r\nann@test.com,"Ann\nDoe",student\r\nbob@test.com,Bob Doe,student\r\n'
+        response = self.client.post(self.url, content, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['users'], response.data['errors']), (2, []))
+        self.assertEqual(User.objects.get(email='ann@test.com').full_name, 'Ann\nDoe')
+
+    @override_settings(IMPORT_MAX_ROWS=5)
+    def test_import_too_many_users(self):
+        """Test if uploads longer than `IMPORT_MAX_ROWS` rows are rejected without importing any of them."""
+        response = self.client.post(self.url, self.rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(email='ann@test.com').exists())
+
+    def test_import_users_command(self):
+        """Test if the command imports NDJSON files and reports rejected rows."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as file:
+            file.write('\n'.join(json.dumps(row) for row in self.rows[:3]))
+            file.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_users', file.name, stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 2 of 3 users.', stdout.getvalue())
+        self.assertIn('Row 3 (jack.doe@test.com)', stderr.getvalue())
+
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as file:
+            file.write('{"email": "dan@test.com"}\nnot json\n')
+            file.flush()
+            with self.assertRaises(CommandError):
+                call_command('import_users', file.name, stdout=StringIO())
+
+    def test_invalid_import(self):
+        """Test if uploads which are not lists or rejected entirely are bad requests."""
+        response = self.client.post(self.url, {'email': 'ann@test.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, self.rows[2:4], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['errors']), 2)
+        response = self.client.post(self.url, '{"email": "ann@test.com"}\n[', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_users_not_authorized(self):
+        """Test if users without the permission to add users cannot import them."""
+        self.client.logout()
+        self.client.post(self.test_data.login_url, {'email': self.test_data.user1.email, 'password': 'test'})
+        response = self.client.post(self.url, self.rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,11 +1,20 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission, Group
-from django_auto_prefetching import AutoPrefetchViewSetMixin
-from rest_framework import viewsets
+from rest_framework import generics, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-from accounts.models import StudentProfile, InstructorProfile, StudentGroup
+from accounts import membership
+from accounts.importing import UserImporter
+from accounts.models import FeedToken, StudentProfile, InstructorProfile, StudentGroup
 from api.accounts.filters import InstructorProfileFilter, StudentGroupFilter, StudentProfileFilter
 from api.accounts.serializers import (
+    FeedTokenSerializer,
+    UserImportSerializer,
     UserSerializer,
     UserUpdateSerializer,
     GroupSerializer,
@@ -13,56 +22,135 @@ from api.accounts.serializers import (
     StudentProfileSerializer,
     InstructorProfileSerializer,
     StudentGroupSerializer,
+    StudentGroupStudentsSerializer,
 )
-from api.common.views import MultiSerializerMixin, UUIDLookupFieldMixin
+from api.common.pagination import CursorOrLimitOffsetPagination
+from api.common.parsers import CSVParser, NDJSONParser
+from api.common.views import BulkModelMixin, CachedResponseMixin, ConditionalRequestMixin, MultiSerializerMixin, \
+    QuerysetPlanMixin, StreamingListMixin, UUIDLookupFieldMixin
+from common.permissions import RelationDjangoModelPermissions
 
 
-class UserViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin, AutoPrefetchViewSetMixin):
+class UserViewSet(QuerysetPlanMixin, ConditionalRequestMixin, StreamingListMixin, BulkModelMixin,
+                  viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = get_user_model().objects.all()
     serializers = {
         'default': UserSerializer,
         'update': UserUpdateSerializer,
+        'import_users': UserImportSerializer,
     }
+    cache_dependencies = (Group,)
+    last_modified_field = 'modified_date'
+    pagination_class = CursorOrLimitOffsetPagination
     filterset_fields = ('full_name', 'email', 'is_staff', 'is_active',)
     search_fields = ('full_name', 'email',)
 
+    @action(detail=False, methods=['post'], url_path='import', url_name='import',
+            parser_classes=(JSONParser, CSVParser, NDJSONParser))
+    def import_users(self, request):
+        """
+        Import users with optional student or instructor profiles and group
+        memberships from a JSON list, CSV or NDJSON, see `accounts.importing`.
+        Rejected rows are reported without aborting the import. Uploads are
+        imported within the request, so they are limited to `IMPORT_MAX_ROWS`
+        rows, larger files are imported with the `import_users` command.
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of users.']})
+        max_rows = getattr(settings, 'IMPORT_MAX_ROWS', 10000)
+        if len(request.data) > max_rows:
+            raise ValidationError({'non_field_errors': [f'Ensure this list has no more than {max_rows} users.']})
+        result = UserImporter().run(request.data)
+        if result['users']:
+            response_status = status.HTTP_201_CREATED
+        elif result['errors']:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        return Response(self.get_serializer(result).data, status=response_status)
 
-class GroupViewSet(viewsets.ModelViewSet, MultiSerializerMixin, AutoPrefetchViewSetMixin):
+
+class GroupViewSet(QuerysetPlanMixin, ConditionalRequestMixin, StreamingListMixin, BulkModelMixin,
+                   viewsets.ModelViewSet, MultiSerializerMixin):
     queryset = Group.objects.all()
     serializers = {
         'default': GroupSerializer,
     }
+    cache_dependencies = (Permission,)
 
 
-class PermissionViewSet(viewsets.ReadOnlyModelViewSet, MultiSerializerMixin, AutoPrefetchViewSetMixin):
+class PermissionViewSet(QuerysetPlanMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet, MultiSerializerMixin):
     queryset = Permission.objects.all()
     serializers = {
         'default': PermissionSerializer,
     }
 
 
-class StudentProfileViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin,
-                            AutoPrefetchViewSetMixin):
+class StudentProfileViewSet(QuerysetPlanMixin, ConditionalRequestMixin, CachedResponseMixin, StreamingListMixin,
+                            BulkModelMixin, viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = StudentProfile.objects.all()
     serializers = {
         'default': StudentProfileSerializer,
     }
+    cache_dependencies = (get_user_model(), StudentGroup,)
+    last_modified_field = 'modified_date'
     filterset_class = StudentProfileFilter
 
 
-class InstructorProfileViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin,
-                               AutoPrefetchViewSetMixin):
+class InstructorProfileViewSet(QuerysetPlanMixin, ConditionalRequestMixin, CachedResponseMixin, StreamingListMixin,
+                               BulkModelMixin, viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = InstructorProfile.objects.all()
     serializers = {
         'default': InstructorProfileSerializer,
     }
+    cache_dependencies = (get_user_model(),)
+    last_modified_field = 'modified_date'
     filterset_class = InstructorProfileFilter
 
 
-class StudentGroupViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin, AutoPrefetchViewSetMixin):
+class StudentGroupViewSet(QuerysetPlanMixin, ConditionalRequestMixin, StreamingListMixin, BulkModelMixin,
+                          viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = StudentGroup.objects.all()
     serializers = {
         'default': StudentGroupSerializer,
+        'students': StudentGroupStudentsSerializer,
     }
+    cache_dependencies = (StudentProfile,)
     filterset_class = StudentGroupFilter
     search_fields = ('code',)
+    student_modes = {'POST': membership.ADD, 'DELETE': membership.REMOVE, 'PUT': membership.REPLACE}
+
+    @action(detail=True, methods=['post', 'put', 'delete'], permission_classes=(RelationDjangoModelPermissions,))
+    def students(self, request, uuid=None):
+        """
+        Add students given by UUID to the group with POST, remove them with
+        DELETE or replace all students of the group with PUT. Only changed
+        memberships are written.
+        """
+        group = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        added, removed = membership.change_students(
+            group, serializer.validated_data['students'], self.student_modes[request.method],
+        )
+        return Response(self.get_serializer({
+            'added': len(added), 'removed': len(removed), 'count': group.students.count(),
+        }).data)
+
+
+class FeedTokenView(generics.GenericAPIView):
+    """
+    Show the calendar feed token of the current user, creating it on first
+    use, or replace it with a new one to revoke existing subscriptions.
+    """
+    serializer_class = FeedTokenSerializer
+    permission_classes = (IsAuthenticated,)
+    filter_backends = ()
+
+    def get(self, request):
+        token = FeedToken.objects.filter(user=request.user).first() or FeedToken.rotate(request.user)
+        return Response(self.get_serializer(token).data)
+
+    def post(self, request):
+        token = FeedToken.rotate(request.user)
+        return Response(self.get_serializer(token).data, status=status.HTTP_201_CREATED)
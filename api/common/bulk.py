@@ -0,0 +1,279 @@
+"""
+Bulk writes of lists of objects validated by model serializers.
+
+Hyperlinks and values of unique fields of all items are looked up with a
+query per field before items are validated, see `resolve_hyperlinks` and
+`find_unique_values`. Objects of serializers whose writable fields map to
+concrete model fields and to many-to-many fields with automatic through
+models are inserted with bulk inserts or updated with a bulk update, and
+only added and removed through table rows are written, in batches.
+Serializers with custom `create()` or `update()` methods or items with
+writable nested data are saved one by one. Bulk writes do not send model
+signals, so generations are bumped and `bulk_saved` is sent once per
+write instead.
+"""
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from rest_framework import relations, serializers
+
+from api.common.reverse import get_path_template
+from api.common.serializers import HyperlinkedRelatedField, UniqueValidator, get_field_key
+from common import bulk
+from common.bulk import PK_LOOKUP_BATCH_SIZE
+from common.cache import generations
+from common.signals import bulk_saved
+
+
+def parse_lookups(model_field, values):
+    """
+    Returns: dictionary of valid values converted by the model field by value
+    """
+    parsed = {}
+    for value in values:
+        try:
+            parsed[value] = model_field.to_python(value)
+        except ValidationError:
+            continue
+    return parsed
+
+
+def get_lookup_value(field, url):
+    """
+    Returns: lookup value of a hyperlink to the detail view of the field or
+    None if it does not match the precompiled path of the view
+    """
+    template = get_path_template(field.view_name, field.lookup_url_kwarg)
+    if template is None or not isinstance(url, str):
+        return None
+    prefix, suffix = template
+    path = urlparse(url).path
+    if len(path) <= len(prefix) + len(suffix) or not path.startswith(prefix) or not path.endswith(suffix):
+        return None
+    value = path[len(prefix):len(path) - len(suffix)]
+    return None if '/' in value else value
+
+
+def iter_field_values(serializer, data):
+    """
+    Yield writable fields and their values in data of a serializer, also in
+    nested serializers. Values of many-related fields are yielded one by
+    one with their child relation.
+    """
+    if not isinstance(data, dict):
+        return
+    for name, field in serializer.fields.items():
+        if field.read_only or name not in data:
+            continue
+        value = data[name]
+        if isinstance(field, serializers.ListSerializer):
+            for item in value if isinstance(value, list) else ():
+                yield from iter_field_values(field.child, item)
+        elif isinstance(field, serializers.BaseSerializer):
+            yield from iter_field_values(field, value)
+        elif isinstance(field, relations.ManyRelatedField):
+            for item in value if isinstance(value, list) else ():
+                yield field.child_relation, item
+        else:
+            yield field, value
+
+
+def find_objects(queryset, field_name, values):
+    """
+    Load objects by values of a lookup field with a query per batch of values.
+
+    Returns: tuple of dictionaries of valid values converted by the model
+    field by value and of objects by converted value
+    """
+    parsed = parse_lookups(queryset.model._meta.get_field(field_name), values)
+    lookups = list(set(parsed.values()))
+    found = {}
+    for start in range(0, len(lookups), PK_LOOKUP_BATCH_SIZE):
+        batch = queryset.filter(**{f'{field_name}__in': lookups[start:start + PK_LOOKUP_BATCH_SIZE]})
+        found.update((getattr(obj, field_name), obj) for obj in batch)
+    return parsed, found
+
+
+def resolve_hyperlinks(serializer, items):
+    """
+    Load objects referenced by writable hyperlinked fields of all items with
+    a query per field and batch of values.
+    Args:
+        serializer: model serializer of items
+        items: list of request data of items
+
+    Returns: dictionary of objects, or None for missing ones, by lookup
+    value by field key, see `HyperlinkedRelatedField.get_object`
+    """
+    links = {}
+    for item in items:
+        for field, value in iter_field_values(serializer, item):
+            if isinstance(field, HyperlinkedRelatedField) and field.queryset is not None:
+                lookup_value = get_lookup_value(field, value)
+                if lookup_value is not None:
+                    links.setdefault(get_field_key(field), (field, set()))[1].add(lookup_value)
+
+    resolved = {}
+    for key, (field, values) in links.items():
+        parsed, found = find_objects(field.get_queryset(), field.lookup_field, values)
+        resolved[key] = {value: found.get(lookup) for value, lookup in parsed.items()}
+    return resolved
+
+
+def find_unique_values(serializer, items):
+    """
+    Find objects with values of unique fields of all items with a query per
+    field and batch of values.
+
+    Returns: dictionary of sets of primary keys of objects by value by
+    field key, see `api.common.serializers.UniqueValidator`
+    """
+    values = {}
+    for item in items:
+        for field, value in iter_field_values(serializer, item):
+            for validator in field.validators:
+                if isinstance(validator, UniqueValidator) and isinstance(value, (str, int)):
+                    values.setdefault(get_field_key(field), (field, validator, set()))[2].add(value)
+
+    unique_values = {}
+    for key, (field, validator, field_values) in values.items():
+        parsed, found = find_objects(validator.queryset, field.source_attrs[-1], field_values)
+        pks = defaultdict(set)
+        for value, obj in found.items():
+            pks[value].add(obj.pk)
+        unique_values[key] = {value: pks[value] for value in parsed.values()}
+    return unique_values
+
+
+class BulkWriter:
+    """
+    Save validated data of items of a model serializer, see the module
+    description. `is_bulk` tells whether objects are written in bulk.
+    """
+
+    def __init__(self, serializer, batch_size=1000):
+        self.model = serializer.Meta.model
+        self.batch_size = batch_size
+        self.nested = set()
+        self.many_to_many = {}
+        self.is_bulk = self.check_fields(serializer)
+
+    def check_fields(self, serializer):
+        serializer_class = type(serializer)
+        if serializer_class.create is not serializers.ModelSerializer.create \
+                or serializer_class.update is not serializers.ModelSerializer.update:
+            return False
+        # Primary keys of inserted objects are needed for relations and responses.
+        if not connection.features.can_return_rows_from_bulk_insert and not hasattr(self.model, 'uuid'):
+            return False
+
+        for field in serializer.fields.values():
+            if field.read_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                self.nested.add(field.source)
+                continue
+            if len(field.source_attrs) != 1:
+                return False
+            try:
+                model_field = self.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return False
+            if model_field.many_to_many:
+                if not model_field.concrete or not model_field.remote_field.through._meta.auto_created:
+                    return False
+                self.many_to_many[field.source] = model_field
+            elif not model_field.concrete:
+                return False
+        return True
+
+    def can_write(self, items):
+        """Whether validated data of all items can be written in bulk."""
+        return self.is_bulk and not any(self.nested.intersection(data) for data in items)
+
+    def create(self, items):
+        """
+        Args:
+            items: list of validated data
+
+        Returns: list of created objects
+        """
+        objs, related = [], []
+        for data in items:
+            data = dict(data)
+            related.append({name: data.pop(name) for name in self.many_to_many if name in data})
+            objs.append(self.model(**data))
+        objs = bulk.bulk_create(self.model, objs, self.batch_size)
+        self.write_relations(objs, related, replace=False)
+        self.finish(objs, True, set().union(*items))
+        return objs
+
+    def update(self, objs, items):
+        """
+        Args:
+            objs: list of updated objects
+            items: list of validated data of objects
+
+        Returns: list of updated objects
+        """
+        fields, related = set(), []
+        for obj, data in zip(objs, items):
+            related.append({})
+            for name, value in data.items():
+                if name in self.many_to_many:
+                    related[-1][name] = value
+                else:
+                    setattr(obj, name, value)
+                    fields.add(name)
+
+        # Bulk updates skip `pre_save()` of fields, which sets `auto_now` fields.
+        auto_now = [field for field in self.model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        for obj in objs:
+            for field in auto_now:
+                field.pre_save(obj, False)
+        update_fields = fields | {field.name for field in auto_now}
+        if update_fields:
+            self.model.objects.bulk_update(objs, update_fields, batch_size=self.batch_size)
+        self.write_relations(objs, related, replace=True)
+        self.finish(objs, False, fields | set().union(*related))
+        return objs
+
+    def write_relations(self, objs, related, replace):
+        """
+        Insert missing many-to-many rows of objects and delete rows of
+        targets which are no longer given when `replace` is set.
+        """
+        for name, field in self.many_to_many.items():
+            targets = {obj.pk: {target.pk for target in data[name]} for obj, data in zip(objs, related) if name in data}
+            if not targets:
+                continue
+            through = field.remote_field.through
+            source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+
+            current, removed = defaultdict(set), []
+            if replace:
+                rows = through.objects.filter(**{f'{source}__in': list(targets)}).values_list('pk', source, target)
+                for pk, source_pk, target_pk in rows:
+                    if target_pk in targets[source_pk]:
+                        current[source_pk].add(target_pk)
+                    else:
+                        removed.append(pk)
+            bulk.bulk_add(field, [
+                (source_pk, target_pk)
+                for source_pk, target_pks in targets.items() for target_pk in sorted(target_pks - current[source_pk])
+            ], self.batch_size)
+            for start in range(0, len(removed), PK_LOOKUP_BATCH_SIZE):
+                through.objects.filter(pk__in=removed[start:start + PK_LOOKUP_BATCH_SIZE]).delete()
+
+    def finish(self, objs, created, fields):
+        if not objs:
+            return
+        models = {self.model}
+        for name in fields & set(self.many_to_many):
+            field = self.many_to_many[name]
+            models.update((field.remote_field.through, field.related_model))
+        for model in models:
+            generations.bump(model)
+        bulk_saved.send(sender=self.model, objects=objs, created=created, fields=fields)
@@ -0,0 +1,30 @@
+from rest_framework.reverse import reverse
+
+
+def get_endpoints(router):
+    """
+    List a request for every list, detail and write route of a router.
+
+    Detail routes use the middle object of the viewset queryset. Writes are
+    empty partial updates, so they validate, save and render an object
+    without changing it.
+    Args:
+        router: router with registered viewsets
+
+    Returns: list of (name, method, url, data) tuples
+    """
+    endpoints = []
+    for _, viewset, basename in router.registry:
+        endpoints.append((f'{basename}-list', 'get', reverse(f'{basename}-list'), None))
+
+        queryset = viewset.queryset.order_by('pk')
+        count = queryset.count()
+        if not count:
+            continue
+        obj = queryset[count // 2]
+        lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+        url = reverse(f'{basename}-detail', kwargs={lookup_url_kwarg: getattr(obj, viewset.lookup_field)})
+        endpoints.append((f'{basename}-detail', 'get', url, None))
+        if hasattr(viewset, 'partial_update'):
+            endpoints.append((f'{basename}-detail', 'patch', url, {}))
+    return endpoints
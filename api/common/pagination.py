@@ -0,0 +1,81 @@
+from rest_framework import pagination
+from rest_framework.filters import OrderingFilter
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination ordered by the primary key.
+
+    Pages are fetched with an indexed range condition instead of an offset
+    and without counting all rows. Orderings requested with the ordering
+    filter are honoured, other orderings fall back to `view.cursor_ordering`
+    or the newest rows first.
+    """
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for filter_cls in getattr(view, 'filter_backends', []):
+            if issubclass(filter_cls, OrderingFilter):
+                ordering = filter_cls().get_ordering(request, queryset, view)
+                break
+
+        if not ordering:
+            ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+class CursorOrLimitOffsetPagination(pagination.BasePagination):
+    """
+    Limit/offset pagination which switches to cursor pagination when the
+    `cursor` query parameter is present.
+
+    An empty `cursor` parameter requests the first page of cursor pagination,
+    so existing clients keep limit/offset pages with counts.
+    """
+    cursor_pagination_class = CursorPagination
+    limit_offset_pagination_class = pagination.LimitOffsetPagination
+
+    def __init__(self):
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.limit_offset_paginator = self.limit_offset_pagination_class()
+        self.paginator = self.limit_offset_paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_paginator.cursor_query_param in request.query_params:
+            self.paginator = self.cursor_paginator
+        else:
+            self.paginator = self.limit_offset_paginator
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.limit_offset_paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = self.limit_offset_paginator.get_schema_operation_parameters(view)
+        names = {parameter['name'] for parameter in parameters}
+        return parameters + [
+            parameter for parameter in self.cursor_paginator.get_schema_operation_parameters(view)
+            if parameter['name'] not in names
+        ]
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    @property
+    def template(self):
+        return self.paginator.template
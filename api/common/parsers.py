@@ -0,0 +1,39 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from common.tabular import read_csv, read_ndjson
+
+
+class TabularParser(parsers.BaseParser):
+    """Parse uploads into lists of rows by column name, see `common.tabular`."""
+    read = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return self.read(self.get_lines(codecs.getreader(encoding)(stream).read()))
+        except (UnicodeDecodeError, ValueError) as error:
+            raise ParseError(f'{self.media_type} parse error - {error}')
+
+    def get_lines(self, text):
+        return text.splitlines()
+
+
+class CSVParser(TabularParser):
+    """Parse CSV with a header row."""
+    media_type = 'text/csv'
+    read = staticmethod(read_csv)
+
+    def get_lines(self, text):
+        # Quoted fields may span lines, so the CSV reader splits records itself.
+        return io.StringIO(text, newline='')
+
+
+class NDJSONParser(TabularParser):
+    """Parse newline delimited JSON objects."""
+    media_type = 'application/x-ndjson'
+    read = staticmethod(read_ndjson)
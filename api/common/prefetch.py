@@ -0,0 +1,155 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import relations, serializers
+
+
+class QuerysetPlan:
+    """
+    Describe which columns and relations of a model a serializer reads.
+
+    A plan restricts the loaded columns with `only()`, joins to-one relations
+    with `select_related()` and fetches to-many relations with
+    `prefetch_related()`, so serializing a page runs a constant number of
+    queries and never loads data of fields that are not rendered. Generic
+    foreign keys are prefetched with one query per content type.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.only = {model._meta.pk.name}
+        self.restricted = True
+        self.select_related = {}
+        self.prefetch_related = {}
+        self.generic_prefetch_related = set()
+
+    @classmethod
+    def from_serializer(cls, serializer, model=None):
+        """
+        Build a plan from readable fields of a model serializer.
+        Args:
+            serializer: model serializer instance or list serializer
+            model: serialized model, defaults to the serializer model
+
+        Returns: queryset plan
+        """
+        serializer = getattr(serializer, 'child', serializer)
+        plan = cls(model or serializer.Meta.model)
+        for field in serializer.fields.values():
+            if not field.write_only:
+                plan.add_field(field)
+        return plan
+
+    def add_field(self, field):
+        if isinstance(field, relations.ManyRelatedField):
+            field, source = field.child_relation, field.source
+        else:
+            source = field.source
+
+        if source == '*':
+            if isinstance(field, relations.HyperlinkedRelatedField):
+                self.only.add(field.lookup_field)
+            else:
+                self.restricted = False
+            return
+
+        name = source.split('.')[0]
+        try:
+            model_field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            self.restricted = False
+            return
+
+        if isinstance(model_field, GenericForeignKey):
+            self.only.update((model_field.ct_field, model_field.fk_field))
+            self.generic_prefetch_related.add(name)
+        elif not model_field.is_relation:
+            self.only.add(name)
+        elif name != source:
+            self.only.add(name)
+            if not model_field.concrete or not (model_field.many_to_many or model_field.one_to_many):
+                self.select_related.setdefault(name, QuerysetPlan(model_field.related_model)).restricted = False
+        elif model_field.many_to_many or model_field.one_to_many:
+            self.add_prefetch(name, model_field, field)
+        else:
+            if model_field.concrete:
+                self.only.add(name)
+            self.add_select(name, model_field, field)
+
+    def add_select(self, name, model_field, field):
+        if isinstance(field, relations.RelatedField) and field.use_pk_only_optimization() and model_field.concrete:
+            return
+
+        related_plan = self.get_related_plan(model_field, field)
+        self.select_related[name] = self.select_related.get(name, related_plan).merge(related_plan)
+
+    def add_prefetch(self, name, model_field, field):
+        related_plan = self.get_related_plan(model_field, field)
+        if model_field.one_to_many:
+            related_plan.only.add(model_field.field.name)
+        self.prefetch_related[name] = self.prefetch_related.get(name, related_plan).merge(related_plan)
+
+    def get_related_plan(self, model_field, field):
+        related_model = model_field.related_model
+        if isinstance(field, serializers.BaseSerializer):
+            return QuerysetPlan.from_serializer(field, related_model)
+
+        plan = QuerysetPlan(related_model)
+        if isinstance(field, relations.HyperlinkedRelatedField):
+            plan.only.add(field.lookup_field)
+        elif not isinstance(field, relations.PrimaryKeyRelatedField):
+            plan.restricted = False
+        return plan
+
+    def merge(self, other):
+        if other is self:
+            return self
+        self.only |= other.only
+        self.restricted = self.restricted and other.restricted
+        for name, plan in other.select_related.items():
+            self.select_related[name] = self.select_related.get(name, plan).merge(plan)
+        for name, plan in other.prefetch_related.items():
+            self.prefetch_related[name] = self.prefetch_related.get(name, plan).merge(plan)
+        self.generic_prefetch_related |= other.generic_prefetch_related
+        return self
+
+    def get_lookups(self, prefix=''):
+        """
+        Get queryset lookups of the plan.
+
+        Returns: tuple of `only()` fields or None if columns cannot be
+        restricted, `select_related()` lookups and `prefetch_related()`
+        lookups
+        """
+        only = {f'{prefix}{name}' for name in self.only} if self.restricted else None
+        select_related = []
+        prefetch_related = []
+
+        for name, plan in self.select_related.items():
+            path = f'{prefix}{name}'
+            select_related.append(path)
+            related_only, related_select, related_prefetch = plan.get_lookups(f'{path}__')
+            if only is not None and related_only is not None:
+                only |= related_only
+            select_related += related_select
+            prefetch_related += related_prefetch
+
+        for name, plan in self.prefetch_related.items():
+            queryset = plan.apply(plan.model._default_manager.all())
+            prefetch_related.append(Prefetch(f'{prefix}{name}', queryset=queryset))
+
+        # Generic foreign keys do not accept custom querysets, items of
+        # every content type are fetched in a single query.
+        prefetch_related += [f'{prefix}{name}' for name in sorted(self.generic_prefetch_related)]
+
+        return only, select_related, prefetch_related
+
+    def apply(self, queryset):
+        only, select_related, prefetch_related = self.get_lookups()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if only is not None:
+            queryset = queryset.only(*only)
+        return queryset
@@ -0,0 +1,43 @@
+import csv
+import io
+
+from rest_framework import renderers
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """Render metrics in the Prometheus text exposition format."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = ''.join(f'# {key}: {value}\n' for key, value in data.items())
+        return data.encode(self.charset)
+
+
+class ICalendarRenderer(renderers.BaseRenderer):
+    """Render iCalendar feeds, errors are rendered as plain text lines."""
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = ''.join(f'{key}: {value}\r\n' for key, value in data.items())
+        return data.encode(self.charset)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """Render lists of rows as CSV, errors are rendered as plain text lines."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return ''.join(f'{key}: {value}\r\n' for key, value in data.items()).encode(self.charset)
+        output = io.StringIO()
+        csv.writer(output).writerows(data)
+        return output.getvalue().encode(self.charset)
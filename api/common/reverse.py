@@ -0,0 +1,88 @@
+from uuid import UUID
+
+from django.urls import NoReverseMatch, get_script_prefix, get_urlconf, reverse
+from rest_framework.reverse import preserve_builtin_query_params
+
+LOOKUP_SENTINEL = 'lookupsentinel0c9f3a7e'
+
+_path_templates = {}
+
+
+def _split_template(url):
+    parts = url.split(LOOKUP_SENTINEL)
+    return tuple(parts) if len(parts) == 2 else None
+
+
+def get_path_template(view_name, lookup_url_kwarg, format=None):
+    """
+    Split the reversed detail path of a view into a prefix and suffix
+    around the lookup value. Templates are compiled once per process.
+    Args:
+        view_name: name of the detail view
+        lookup_url_kwarg: name of the URL keyword argument used for lookup
+        format: optional format suffix
+
+    Returns: tuple of path prefix and suffix or None if the path cannot be
+    precompiled
+    """
+    key = (view_name, lookup_url_kwarg, format, get_urlconf(), get_script_prefix())
+    try:
+        return _path_templates[key]
+    except KeyError:
+        pass
+
+    kwargs = {lookup_url_kwarg: LOOKUP_SENTINEL}
+    if format is not None:
+        kwargs['format'] = format
+    try:
+        template = _split_template(reverse(view_name, kwargs=kwargs))
+    except NoReverseMatch:
+        template = None
+    _path_templates[key] = template
+    return template
+
+
+def get_url_template(view_name, lookup_url_kwarg, request, format=None):
+    """
+    Get the absolute URL template of a detail view for the current request.
+    Templates are compiled once per request on top of the path templates.
+
+    Returns: tuple of URL prefix and suffix or None if the URL cannot be
+    precompiled
+    """
+    templates = request.__dict__.setdefault('_url_templates', {})
+    key = (view_name, lookup_url_kwarg, format)
+    try:
+        return templates[key]
+    except KeyError:
+        pass
+
+    template = None
+    if getattr(request, 'versioning_scheme', None) is None:
+        path_template = get_path_template(view_name, lookup_url_kwarg, format)
+        if path_template is not None:
+            url = request.build_absolute_uri(LOOKUP_SENTINEL.join(path_template))
+            template = _split_template(preserve_builtin_query_params(url, request))
+    templates[key] = template
+    return template
+
+
+def build_url(view_name, lookup_url_kwarg, lookup_value, request=None, format=None):
+    """
+    Build the same URL as `rest_framework.reverse.reverse` for a detail view
+    without resolving the URL conf on every call.
+
+    Returns: URL or None if the URL cannot be precompiled
+    """
+    if not isinstance(lookup_value, (UUID, int)):
+        return None
+
+    if request is None:
+        template = get_path_template(view_name, lookup_url_kwarg, format)
+    else:
+        template = get_url_template(view_name, lookup_url_kwarg, request, format)
+    if template is None:
+        return None
+
+    prefix, suffix = template
+    return f'{prefix}{lookup_value}{suffix}'
@@ -0,0 +1,10 @@
+from rest_framework.routers import DefaultRouter
+
+
+class BulkRouter(DefaultRouter):
+    """Route PATCH and DELETE requests of list URLs to bulk actions of viewsets providing them."""
+    routes = [
+        route._replace(mapping={**route.mapping, 'patch': 'bulk_update', 'delete': 'bulk_destroy'})
+        if route.name == '{basename}-list' else route
+        for route in DefaultRouter.routes
+    ]
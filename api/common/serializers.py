@@ -1,6 +1,10 @@
+from django.core.exceptions import ObjectDoesNotExist
 from generic_relations.relations import GenericRelatedField
-from rest_framework import serializers
+from rest_framework import relations, serializers, validators
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
 
+from api.common.reverse import build_url
 from common.models import (
     FileContentItem,
     ImageContentItem,
@@ -9,10 +13,128 @@ from common.models import (
 )
 
 
-class UUIDHyperlinkedRelatedField(serializers.HyperlinkedRelatedField):
+class PrecompiledUrlMixin:
+    """Build hyperlinks from precompiled URL templates instead of reversing them."""
+
+    def get_url(self, obj, view_name, request, format):
+        if hasattr(obj, 'pk') and obj.pk in (None, ''):
+            return None
+
+        url = build_url(view_name, self.lookup_url_kwarg, getattr(obj, self.lookup_field), request, format)
+        if url is None:
+            return super().get_url(obj, view_name, request, format)
+        return url
+
+
+def get_field_key(field):
+    """
+    Identify a field by its serializer class and name, so the key is shared
+    by fields of all instances of the serializer.
+    """
+    if isinstance(field.parent, relations.ManyRelatedField):
+        field = field.parent
+    return type(field.parent), field.field_name
+
+
+class HyperlinkedRelatedField(PrecompiledUrlMixin, serializers.HyperlinkedRelatedField):
+    """Use objects resolved in batches by `api.common.bulk.resolve_hyperlinks` when available."""
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        resolved = self.context.get('resolved_hyperlinks', {}).get(get_field_key(self))
+        lookup_value = view_kwargs.get(self.lookup_url_kwarg)
+        if resolved is None or lookup_value not in resolved:
+            return super().get_object(view_name, view_args, view_kwargs)
+        if resolved[lookup_value] is None:
+            raise ObjectDoesNotExist
+        return resolved[lookup_value]
+
+
+class HyperlinkedIdentityField(PrecompiledUrlMixin, serializers.HyperlinkedIdentityField):
+    pass
+
+
+class UUIDHyperlinkedRelatedField(HyperlinkedRelatedField):
     lookup_field = 'uuid'
 
 
+class UniqueValidator(validators.UniqueValidator):
+    """Use primary keys of objects by value found in batches by `api.common.bulk.find_unique_values` when available."""
+
+    def __call__(self, value, serializer_field):
+        found = serializer_field.context.get('unique_values', {}).get(get_field_key(serializer_field))
+        if found is None or self.lookup != 'exact' or value not in found:
+            return super().__call__(value, serializer_field)
+        instance = getattr(serializer_field.parent, 'instance', None)
+        if found[value] - {getattr(instance, 'pk', None)}:
+            raise serializers.ValidationError(self.message, code='unique')
+
+
+class UUIDHyperlinkField(serializers.URLField):
+    """Read-only hyperlink to a detail view built from a UUID value."""
+
+    def __init__(self, view_name, **kwargs):
+        self.view_name = view_name
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        url = build_url(self.view_name, 'uuid', value, request)
+        if url is None:
+            url = reverse(self.view_name, kwargs={'uuid': value}, request=request)
+        return url
+
+
+class SparseFieldsetMixin:
+    """
+    Restrict fields of the top-level serializer with `fields` and `omit`
+    query parameters of read requests, e.g. `?fields=uuid,code,title`.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self.is_top_level():
+            return fields
+
+        query_params = getattr(request, 'query_params', request.GET)
+        only = self.parse_field_names(query_params, self.fields_query_param)
+        omit = self.parse_field_names(query_params, self.omit_query_param)
+        return {
+            name: field for name, field in fields.items()
+            if (not only or name in only) and name not in omit
+        }
+
+    def is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    @staticmethod
+    def parse_field_names(query_params, param):
+        return {
+            name.strip() for value in query_params.getlist(param) for name in value.split(',') if name.strip()
+        }
+
+
+class HyperlinkedModelSerializer(SparseFieldsetMixin, serializers.HyperlinkedModelSerializer):
+    serializer_related_field = HyperlinkedRelatedField
+    serializer_url_field = HyperlinkedIdentityField
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if 'validators' in field_kwargs:
+            field_kwargs['validators'] = [
+                UniqueValidator(validator.queryset, validator.message, validator.lookup)
+                if type(validator) is validators.UniqueValidator else validator
+                for validator in field_kwargs['validators']
+            ]
+        return field_class, field_kwargs
+
+
 class ContentItemSerializer(serializers.ModelSerializer):
     class Meta:
         abstract = True
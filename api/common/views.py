@@ -1,5 +1,29 @@
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
 from rest_framework import mixins
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.serializers import ModelSerializer
+
+from api.common.bulk import BulkWriter, find_unique_values, parse_lookups, resolve_hyperlinks
+from api.common.prefetch import QuerysetPlan
+from api.common.renderers import ICalendarRenderer
+from common.authentication import FeedTokenAuthentication
+from common.cache import generations
+from common.permissions import permission_cache
 
 
 class UUIDLookupFieldMixin(mixins.RetrieveModelMixin):
@@ -10,6 +34,496 @@ class MultiSerializerMixin(viewsets.GenericViewSet):
     serializers = {
         'default': None,
     }
+    # Actions using the serializer of another action unless they have their own.
+    serializer_fallbacks = {
+        'bulk_update': 'update',
+    }
 
     def get_serializer_class(self):
-        return self.serializers.get(self.action, self.serializers['default'])
+        action = self.action
+        if action not in self.serializers:
+            action = self.serializer_fallbacks.get(action, 'default')
+        return self.serializers.get(action, self.serializers['default'])
+
+
+class QuerysetPlanMixin:
+    """
+    Load only the columns and relations rendered by the serializer of read
+    requests, see `QuerysetPlan`.
+
+    Plans are derived once per serializer class and set of rendered fields
+    and shared between requests. Querysets of actions which are not
+    rendered by a model serializer are left unchanged.
+    """
+    _queryset_plans = {}
+
+    def get_queryset_plan(self):
+        if not hasattr(self, '_queryset_plan'):
+            serializer = self.get_serializer()
+            if isinstance(serializer, ModelSerializer):
+                key = (type(serializer), tuple(serializer.fields))
+                plan = self._queryset_plans.get(key)
+                if plan is None:
+                    plan = self._queryset_plans[key] = QuerysetPlan.from_serializer(serializer)
+            else:
+                plan = None
+            self._queryset_plan = plan
+        return self._queryset_plan
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset
+        plan = self.get_queryset_plan()
+        return queryset if plan is None else plan.apply(queryset)
+
+
+class StreamingListMixin:
+    """
+    Stream the whole filtered list as a JSON array when the `stream` query
+    parameter is set, e.g. `?stream=1`.
+
+    Rows are fetched with a server-side iterator in chunks of
+    `stream_chunk_size`, relations are prefetched per chunk and every chunk
+    is rendered before the next one is fetched, so memory use does not grow
+    with the number of rows. Streamed lists are not paginated.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+
+    def is_stream_requested(self):
+        value = self.request.query_params.get(self.stream_query_param, '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_stream_requested():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_json(queryset), content_type='application/json')
+
+    def stream_json(self, queryset):
+        # QuerySet.iterator() ignores prefetch_related(), so the lookups are
+        # applied to every chunk instead.
+        prefetch_lookups = queryset._prefetch_related_lookups
+        rows = queryset.prefetch_related(None).iterator(chunk_size=self.stream_chunk_size)
+        return self.render_stream(rows, lambda chunk: prefetch_related_objects(chunk, *prefetch_lookups))
+
+    def render_stream(self, rows, prepare_chunk=None):
+        """
+        Serialize and render an iterable of rows as a JSON array in chunks.
+        Args:
+            rows: iterable of instances accepted by the serializer
+            prepare_chunk: optional callable called with every chunk
+
+        Returns: iterator of rendered bytes
+        """
+        rows = iter(rows)
+        renderer = JSONRenderer()
+
+        yield b'['
+        separator = b''
+        for chunk in iter(lambda: list(islice(rows, self.stream_chunk_size)), []):
+            if prepare_chunk is not None:
+                prepare_chunk(chunk)
+            data = self.get_serializer(chunk, many=True).data
+            yield separator + renderer.render(data)[1:-1]
+            separator = b','
+        yield b']'
+
+
+class BulkModelMixin:
+    """
+    Create objects from a list with POST, update objects identified by
+    `lookup_field` values of items of a list with PATCH and delete objects
+    given by a list of `lookup_field` values with DELETE on the list URL,
+    see `api.common.bulk`.
+
+    A list is written in a single transaction, so nothing is written unless
+    all items are valid, and errors are reported in a list of errors by
+    field aligned with the items. Lists are limited to `bulk_max_items`
+    items, the `BULK_MAX_ITEMS` setting by default. Serializers defining
+    `validate_bulk(item_serializers)` check valid items against each other,
+    returning errors aligned with the items.
+    """
+    bulk_max_items = None
+    bulk_batch_size = 1000
+
+    def get_bulk_max_items(self):
+        return self.bulk_max_items or getattr(settings, 'BULK_MAX_ITEMS', 1000)
+
+    def get_bulk_items(self):
+        items = self.request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        max_items = self.get_bulk_max_items()
+        if len(items) > max_items:
+            raise ValidationError({'non_field_errors': [f'Ensure this list has no more than {max_items} items.']})
+        return items
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        items = self.get_bulk_items()
+        return self.bulk_save(items, [None] * len(items), status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, *args, **kwargs):
+        items = self.get_bulk_items()
+        objs, errors = self.get_bulk_objects([
+            item.get(self.lookup_field) if isinstance(item, dict) else None for item in items
+        ])
+        if any(errors):
+            raise ValidationError(errors)
+        return self.bulk_save(items, objs, status.HTTP_200_OK)
+
+    @transaction.atomic
+    def bulk_destroy(self, request, *args, **kwargs):
+        objs, errors = self.get_bulk_objects(self.get_bulk_items())
+        if any(errors):
+            raise ValidationError(errors)
+        if objs:
+            self.get_queryset().model._default_manager.filter(pk__in=[obj.pk for obj in objs]).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def get_bulk_objects(self, lookups):
+        """
+        Find objects by values of `lookup_field`, checking object permissions.
+
+        Returns: tuple of lists of objects and of errors by field aligned with lookups
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        opts = queryset.model._meta
+        parsed = parse_lookups(opts.pk if self.lookup_field == 'pk' else opts.get_field(self.lookup_field), [
+            lookup for lookup in lookups if isinstance(lookup, (str, int))
+        ])
+        found = {
+            getattr(obj, self.lookup_field): obj
+            for obj in queryset.filter(**{f'{self.lookup_field}__in': set(parsed.values())})
+        }
+
+        objs, errors, seen = [], [], set()
+        for lookup in lookups:
+            obj = found.get(parsed.get(lookup)) if isinstance(lookup, (str, int)) else None
+            if lookup in (None, ''):
+                error = 'This field is required.'
+            elif obj is None:
+                error = 'Not found.'
+            elif obj.pk in seen:
+                error = 'The object is given by an earlier item.'
+            else:
+                error = None
+                seen.add(obj.pk)
+                self.check_object_permissions(self.request, obj)
+            objs.append(obj)
+            errors.append({self.lookup_field: [error]} if error else {})
+        return objs, errors
+
+    @transaction.atomic
+    def bulk_save(self, items, objs, response_status):
+        """
+        Validate and save items, creating objects which are None.
+
+        Returns: response with the saved objects
+        """
+        if not items:
+            return Response([], status=response_status)
+        context = self.get_serializer_context()
+        serializer = self.get_serializer(context=context)
+        context['resolved_hyperlinks'] = resolve_hyperlinks(serializer, items)
+        context['unique_values'] = find_unique_values(serializer, items)
+        item_serializers = [
+            self.get_serializer(obj, data=item, partial=obj is not None, context=context)
+            for obj, item in zip(objs, items)
+        ]
+        errors = [{} if item.is_valid() else item.errors for item in item_serializers]
+        if not any(errors) and hasattr(serializer, 'validate_bulk'):
+            errors = serializer.validate_bulk(item_serializers)
+        if any(errors):
+            raise ValidationError(errors)
+
+        writer = BulkWriter(serializer, self.bulk_batch_size)
+        try:
+            with transaction.atomic():
+                saved = self.write_bulk(writer, item_serializers)
+        except IntegrityError:
+            # Items are saved one by one to find the failing ones, all of them are rolled back.
+            errors = []
+            for item_serializer in item_serializers:
+                try:
+                    with transaction.atomic():
+                        self.write_bulk(writer, [item_serializer])
+                    errors.append({})
+                except IntegrityError as error:
+                    errors.append({'non_field_errors': [str(error)]})
+            raise ValidationError(errors)
+
+        pks = [obj.pk for obj in saved]
+        objects = QuerysetPlan.from_serializer(serializer).apply(self.get_queryset().filter(pk__in=pks))
+        objects = {obj.pk: obj for obj in objects}
+        data = self.get_serializer([objects[pk] for pk in pks], many=True).data
+        return Response(data, status=response_status)
+
+    @staticmethod
+    def write_bulk(writer, item_serializers):
+        """
+        Returns: list of saved objects of validated item serializers
+        """
+        items = [item.validated_data for item in item_serializers]
+        if not writer.can_write(items):
+            return [item.save() for item in item_serializers]
+        if item_serializers[0].instance is None:
+            return writer.create(items)
+        return writer.update([item.instance for item in item_serializers], items)
+
+
+class DateRangeMixin:
+    """Parse the inclusive date range of `from` and `to` query parameters."""
+    date_range_max_days = 366
+
+    def get_date_range(self):
+        """
+        Returns: tuple of the first and the last date of the range
+
+        Raises: ValidationError if the range is missing, invalid or too long
+        """
+        dates, errors = {}, {}
+        for param in ('from', 'to'):
+            try:
+                dates[param] = parse_date(self.request.query_params.get(param, ''))
+            except ValueError:
+                dates[param] = None
+            if dates[param] is None:
+                errors[param] = ['Enter a valid date in YYYY-MM-DD format.']
+        if errors:
+            raise ValidationError(errors)
+
+        date_from, date_to = dates['from'], dates['to']
+        if date_from > date_to:
+            raise ValidationError({'to': ['Ensure this date is not earlier than `from`.']})
+        if (date_to - date_from).days >= self.date_range_max_days:
+            raise ValidationError({'to': [f'Ensure the range does not exceed {self.date_range_max_days} days.']})
+        return date_from, date_to
+
+
+class ModelDependenciesMixin:
+    """
+    Describe which models affect the representation of a viewset.
+
+    `cache_dependencies` lists models besides the viewset model whose changes
+    alter responses, e.g. nested or hyperlinked relations. Viewsets whose
+    querysets or filtersets depend on the current user set `cache_per_user`.
+    """
+    cache_dependencies = ()
+    cache_per_user = False
+
+    def get_cache_dependencies(self):
+        return (self.queryset.model,) + tuple(self.cache_dependencies)
+
+    def get_cache_scope(self):
+        """
+        Representations depend on the caller only through their permissions,
+        so users with the same permissions share a scope unless
+        `cache_per_user` is set. It includes the permission cache version, so
+        changes of permissions switch scopes.
+        """
+        user = self.request.user
+        if user.is_superuser:
+            scope = 'superuser'
+        else:
+            perms = sorted(permission_cache.load(user)) if user.is_authenticated else ()
+            digest = hashlib.md5(','.join(perms).encode()).hexdigest()
+            scope = f'perms:{permission_cache.get_version()}:{digest}'
+        return f'user:{user.pk}:{scope}' if self.cache_per_user else scope
+
+    def get_request_signature(self):
+        """Return a string identifying the host, URL kwargs and query parameters of the request."""
+        request = self.request
+        params = '&'.join(sorted(
+            f'{key}={value}' for key, values in request.query_params.lists() for value in values
+        ))
+        kwargs = '&'.join(f'{key}={value}' for key, value in sorted(self.kwargs.items()))
+        return f'{request.build_absolute_uri("/")}|{kwargs}|{params}'
+
+
+class CachedResponseMixin(ModelDependenciesMixin):
+    """
+    Cache rendered list and retrieve responses.
+
+    Cache keys vary by action, URL kwargs, query parameters, host and the
+    caller's scope, and include generations of the viewset model and
+    `cache_dependencies`, so any change of these models invalidates cached
+    responses.
+    """
+    cache_formats = ('json',)
+    cache_key_prefix = 'response'
+
+    def get_cache_key(self):
+        generation = ','.join(map(str, generations.get(self.get_cache_dependencies())))
+        digest = hashlib.md5(f'{self.get_request_signature()}|{generation}'.encode()).hexdigest()
+        return ':'.join((
+            self.cache_key_prefix, self.__class__.__name__, self.action,
+            self.request.accepted_renderer.format, self.get_cache_scope(), digest,
+        ))
+
+    def cached_response(self, action, request, *args, **kwargs):
+        if request.accepted_renderer.format not in self.cache_formats:
+            return action(request, *args, **kwargs)
+
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = action(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and not response.streaming:
+            timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+            response.add_post_render_callback(
+                lambda rendered: cache.set(key, (rendered.content, rendered['Content-Type']), timeout)
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalRequestMixin(ModelDependenciesMixin):
+    """
+    Answer conditional requests using validators computed without serializing.
+
+    List validators are derived from generations of the viewset model and
+    `cache_dependencies`. Detail validators use the `last_modified_field`
+    of the object instead of the viewset model generation when it is set.
+    Reads get `ETag` and `Last-Modified` headers and 304 responses, writes
+    honour `If-Match` and `If-Unmodified-Since` with 412 responses.
+    """
+    last_modified_field = None
+    detail_actions = ('retrieve', 'update', 'partial_update', 'destroy')
+    precondition_headers = (
+        'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE',
+    )
+
+    def get_detail_dependencies(self):
+        model = self.queryset.model
+        through_models = tuple(field.remote_field.through for field in model._meta.many_to_many) + tuple(
+            relation.through for relation in model._meta.related_objects if relation.many_to_many
+        )
+        dependencies = self.get_cache_dependencies() + through_models
+        if self.last_modified_field:
+            dependencies = dependencies[1:]
+        return dependencies
+
+    def get_validators(self):
+        """
+        Compute validators of the current representation.
+
+        Returns: tuple of the ETag and the last modification timestamp, both
+        may be None if they are unknown
+        """
+        parts = [self.__class__.__name__, self.request.accepted_renderer.format, self.get_request_signature()]
+        object_modified = None
+
+        if self.action in self.detail_actions:
+            dependencies = self.get_detail_dependencies()
+            if self.last_modified_field:
+                lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+                object_modified = self.filter_queryset(self.get_queryset()).prefetch_related(None).filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                ).values_list(self.last_modified_field, flat=True).first()
+                if object_modified is None:
+                    return None, None
+                parts.append(object_modified.isoformat())
+        else:
+            dependencies = self.get_cache_dependencies()
+            parts.append(self.get_cache_scope())
+
+        generation, last_modified = generations.get_state(dependencies)
+        parts.append(','.join(map(str, generation)))
+        if last_modified is not None and object_modified is not None:
+            last_modified = max(last_modified, object_modified.timestamp())
+
+        etag = '"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+        return etag, last_modified and int(last_modified)
+
+    def conditional_response(self, action, request, *args, **kwargs):
+        is_safe = request.method in ('GET', 'HEAD')
+        if not is_safe and not any(header in request.META for header in self.precondition_headers):
+            return action(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = action(request, *args, **kwargs)
+        if is_safe and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self.conditional_response(super().update, request, *args, **kwargs)
+
+    def partial_update(self, request, *args, **kwargs):
+        return self.conditional_response(super().partial_update, request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        return self.conditional_response(super().destroy, request, *args, **kwargs)
+
+
+class CalendarFeedMixin:
+    """
+    Serve streamed iCalendar feeds authenticated with feed tokens.
+
+    Feeds are identified by an ETag derived from the feed key and generations
+    of `feed_dependencies`. Rendered feeds are cached under their ETag, so a
+    feed is only regenerated after a change of any of these models, and
+    polling calendar applications get 304 responses without reading it.
+    """
+    authentication_classes = (FeedTokenAuthentication,)
+    renderer_classes = (JSONRenderer, ICalendarRenderer)
+    feed_dependencies = ()
+    feed_cache_prefix = 'feed'
+    feed_content_type = 'text/calendar; charset=utf-8'
+
+    def feed_response(self, key, render):
+        """
+        Args:
+            key: string identifying the feed
+            render: callable returning an iterator of rendered chunks of the feed
+
+        Returns: conditional, cached or streamed response
+        """
+        generation = ','.join(map(str, generations.get(self.feed_dependencies)))
+        digest = hashlib.md5(f'{key}|{generation}'.encode()).hexdigest()
+        etag = f'"{digest}"'
+
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            cache_key = f'{self.feed_cache_prefix}:{digest}'
+            content = cache.get(cache_key)
+            if content is None:
+                response = StreamingHttpResponse(self.cache_feed(cache_key, render()),
+                                                 content_type=self.feed_content_type)
+            else:
+                response = HttpResponse(content, content_type=self.feed_content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def cache_feed(self, key, chunks):
+        rendered = []
+        for chunk in chunks:
+            chunk = chunk.encode()
+            rendered.append(chunk)
+            yield chunk
+        cache.set(key, b''.join(rendered), getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
@@ -128,6 +128,11 @@ class NonPeriodicTimetableItemFilter(TimetableItemFilter):
 
 
 class AssignmentFilter(NonPeriodicTimetableItemFilter):
+    date_range = filters.DateTimeFromToRangeFilter(
+        label='Date range',
+        field_name='date',
+    )
+
     class Meta:
         model = Assignment
         fields = NonPeriodicTimetableItemFilter.Meta.fields + ()
@@ -1,9 +1,23 @@
+from datetime import time
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils.timezone import localtime
 from drf_writable_nested import serializers as nested_serializers
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
 
 from accounts.models import InstructorProfile, StudentProfile, StudentGroup
-from api.common.serializers import ContentSerializer, UUIDHyperlinkedRelatedField
+from api.common.serializers import ContentSerializer, HyperlinkedModelSerializer, UUIDHyperlinkedRelatedField, \
+    UUIDHyperlinkField
+from education.availability import MINUTES_PER_DAY
+from education.conflicts import find_batch_conflicts, find_conflicts, iter_assignment_slots, iter_event_slots
+from education.grading import CREATED, REJECTED, UNCHANGED, UPDATED
+from education.occupancy import BIN_SIZES, SUBJECTS
+from education.occurrences import combine
 from education.models import (
+    AgendaEntry,
     Assignment,
     AssignmentContent,
     Course,
@@ -12,12 +26,76 @@ from education.models import (
     Grade,
     NonPeriodicEventDetails,
     PeriodicEventDetails,
+    PeriodicTimetableItem,
     Solution,
     SolutionContent,
+    SolverJob,
     Timetable,
     EventType,
 )
 
+User = get_user_model()
+
+
+class ScheduleConflictsMixin:
+    """
+    Reject schedules overlapping occurrences in agendas of their instructors
+    and students. Updates are only checked when one of `schedule_fields`
+    changes.
+
+    Serializers define `get_schedule_slots(attrs)`, returning an iterable of
+    `education.conflicts.Slot` of the validated schedule, and
+    `get_replaced_entries()`, returning a Q object of agenda entries
+    replaced by the updated instance. Checked slots are kept, so schedules of
+    bulk writes are checked against each other with `validate_bulk`.
+    """
+    schedule_fields = ()
+    max_conflict_errors = 10
+    schedule_slots = ()
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if self.instance is None or any(field in attrs for field in self.schedule_fields):
+            exclude = None if self.instance is None else self.get_replaced_entries()
+            self.schedule_slots = list(self.get_schedule_slots(attrs))
+            conflicts = find_conflicts(self.schedule_slots, exclude)
+            if conflicts:
+                raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: self.describe(conflicts)})
+        return attrs
+
+    def validate_bulk(self, item_serializers):
+        """
+        Returns: list of errors by field of valid items overlapping earlier items aligned with items
+        """
+        conflicts = find_batch_conflicts([item.schedule_slots for item in item_serializers])
+        return [
+            {api_settings.NON_FIELD_ERRORS_KEY: item.describe(item_conflicts)} if item_conflicts else {}
+            for item, item_conflicts in zip(item_serializers, conflicts)
+        ]
+
+    def get_schedule_value(self, attrs, field):
+        if field in attrs:
+            return attrs[field]
+        value = getattr(self.instance, field, None)
+        return list(value.all()) if hasattr(value, 'all') else value
+
+    def describe(self, conflicts):
+        names = dict(User.objects.filter(pk__in={conflict.user for conflict in conflicts}).values_list(
+            'pk', 'full_name',
+        ))
+        errors = [
+            '{name} has "{other}" from {other_start:%Y-%m-%d %H:%M} to {other_end:%H:%M} overlapping '
+            '"{title}" from {start:%Y-%m-%d %H:%M} to {end:%H:%M}.'.format(
+                name=names.get(conflict.user) or conflict.user, other=conflict.other.title,
+                other_start=localtime(conflict.other.start), other_end=localtime(conflict.other.end),
+                title=conflict.slot.title, start=localtime(conflict.slot.start), end=localtime(conflict.slot.end),
+            )
+            for conflict in conflicts[:self.max_conflict_errors]
+        ]
+        if len(conflicts) > self.max_conflict_errors:
+            errors.append(f'{len(conflicts) - self.max_conflict_errors} more schedule conflicts found.')
+        return errors
+
 
 class CourseContentSerializer(ContentSerializer):
     class Meta:
@@ -37,7 +115,7 @@ class SolutionContentSerializer(ContentSerializer):
         fields = ContentSerializer.Meta.fields + ()
 
 
-class CourseSerializer(serializers.HyperlinkedModelSerializer):
+class CourseSerializer(HyperlinkedModelSerializer):
     instructors = UUIDHyperlinkedRelatedField(
         view_name='instructor-detail',
         queryset=InstructorProfile.objects.all(),
@@ -71,7 +149,7 @@ class CourseSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
-class TimetableSerializer(serializers.HyperlinkedModelSerializer):
+class TimetableSerializer(HyperlinkedModelSerializer):
     course = UUIDHyperlinkedRelatedField(
         view_name='course-detail',
         queryset=Course.objects.all(),
@@ -102,7 +180,7 @@ class TimetableSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
-class TimetableItemSerializer(serializers.HyperlinkedModelSerializer):
+class TimetableItemSerializer(HyperlinkedModelSerializer):
     timetable = UUIDHyperlinkedRelatedField(
         view_name='timetable-detail',
         queryset=Timetable.objects.all(),
@@ -139,7 +217,9 @@ class NonPeriodicTimetableItemSerializer(TimetableItemSerializer):
         fields = TimetableItemSerializer.Meta.fields + ('date',)
 
 
-class AssignmentSerializer(NonPeriodicTimetableItemSerializer):
+class AssignmentSerializer(ScheduleConflictsMixin, NonPeriodicTimetableItemSerializer):
+    schedule_fields = ('timetable', 'date', 'start_time', 'end_time', 'instructor', 'students',)
+
     solutions = UUIDHyperlinkedRelatedField(
         view_name='assignment-detail',
         read_only=True,
@@ -159,8 +239,15 @@ class AssignmentSerializer(NonPeriodicTimetableItemSerializer):
             }
         }
 
+    def get_schedule_slots(self, attrs):
+        fields = ('title',) + self.schedule_fields
+        return iter_assignment_slots(**{field: self.get_schedule_value(attrs, field) for field in fields})
+
+    def get_replaced_entries(self):
+        return Q(assignment=self.instance)
 
-class SolutionSerializer(serializers.HyperlinkedModelSerializer):
+
+class SolutionSerializer(HyperlinkedModelSerializer):
     assignment = UUIDHyperlinkedRelatedField(
         view_name='assignment-detail',
         queryset=Assignment.objects.all(),
@@ -191,7 +278,7 @@ class SolutionSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
-class GradeSerializer(serializers.HyperlinkedModelSerializer):
+class GradeSerializer(HyperlinkedModelSerializer):
     solution = UUIDHyperlinkedRelatedField(
         view_name='solution-detail',
         queryset=Solution.objects.all(),
@@ -215,6 +302,22 @@ class GradeSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
+class GradeUploadResultSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=(CREATED, UPDATED, UNCHANGED, REJECTED))
+    grade = serializers.UUIDField(required=False)
+    errors = serializers.DictField(child=serializers.ListField(child=serializers.CharField()), required=False)
+
+
+class GradeUploadSerializer(serializers.Serializer):
+    """Numbers of rows of a grade upload by status and results of rows."""
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    unchanged = serializers.IntegerField()
+    rejected = serializers.IntegerField()
+    results = GradeUploadResultSerializer(many=True)
+
+
 class EventDetailsSerializer(serializers.ModelSerializer):
     instructor = UUIDHyperlinkedRelatedField(
         view_name='instructor-detail',
@@ -246,8 +349,10 @@ class NonPeriodicEventDetailsSerializer(EventDetailsSerializer):
         fields = EventDetailsSerializer.Meta.fields + ('date',)
 
 
-class EventSerializer(serializers.HyperlinkedModelSerializer, nested_serializers.NestedCreateMixin,
+class EventSerializer(ScheduleConflictsMixin, HyperlinkedModelSerializer, nested_serializers.NestedCreateMixin,
                       nested_serializers.NestedUpdateMixin):
+    schedule_fields = ('timetable', 'periodic_event_details', 'non_periodic_event_details',)
+
     event_type = UUIDHyperlinkedRelatedField(
         view_name='event-type-detail',
         queryset=EventType.objects.all(),
@@ -276,8 +381,35 @@ class EventSerializer(serializers.HyperlinkedModelSerializer, nested_serializers
             }
         }
 
+    def get_schedule_slots(self, attrs):
+        details = {}
+        for field in ('periodic_event_details', 'non_periodic_event_details'):
+            if field in attrs:
+                details[field] = attrs[field]
+            elif self.instance is not None:
+                # Unchanged details of the updated event.
+                details[field] = [
+                    self.get_details_values(obj, self.fields[field].child.Meta.fields)
+                    for obj in getattr(self.instance, field).all()
+                ]
+            else:
+                details[field] = ()
+        return iter_event_slots(
+            self.get_schedule_value(attrs, 'title'), self.get_schedule_value(attrs, 'timetable'),
+            details['periodic_event_details'], details['non_periodic_event_details'],
+        )
+
+    @staticmethod
+    def get_details_values(obj, fields):
+        values = {field: getattr(obj, field) for field in fields if field != 'students'}
+        values['students'] = list(obj.students.all())
+        return values
+
+    def get_replaced_entries(self):
+        return Q(event=self.instance)
 
-class EventTypeSerializer(serializers.HyperlinkedModelSerializer):
+
+class EventTypeSerializer(HyperlinkedModelSerializer):
     class Meta:
         model = EventType
         fields = ('url', 'uuid', 'title',)
@@ -287,3 +419,244 @@ class EventTypeSerializer(serializers.HyperlinkedModelSerializer):
                 'lookup_field': 'uuid',
             }
         }
+
+
+class OccurrenceSerializer(serializers.Serializer):
+    event = UUIDHyperlinkField(view_name='event-detail')
+    title = serializers.CharField()
+    event_type = serializers.CharField()
+    timetable = UUIDHyperlinkField(view_name='timetable-detail')
+    instructor = UUIDHyperlinkField(view_name='instructor-detail')
+    details = serializers.UUIDField()
+    periodic = serializers.BooleanField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+
+class AgendaEntrySerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=AgendaEntry.Kind.choices)
+    title = serializers.CharField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    event = UUIDHyperlinkField(view_name='event-detail', source='event_uuid')
+    details = serializers.UUIDField()
+    assignment = UUIDHyperlinkField(view_name='assignment-detail', source='assignment_uuid')
+
+
+class DeadlineSerializer(serializers.Serializer):
+    """Upcoming assignment with the submission status of the current student, which is null for other users."""
+    assignment = UUIDHyperlinkField(view_name='assignment-detail', source='uuid')
+    title = serializers.CharField()
+    timetable = UUIDHyperlinkField(view_name='timetable-detail', source='timetable_uuid')
+    deadline = serializers.DateTimeField()
+    submitted = serializers.BooleanField(allow_null=True)
+    graded = serializers.BooleanField(allow_null=True)
+    solution = UUIDHyperlinkField(view_name='solution-detail', source='solution_uuid', allow_null=True)
+    grade = serializers.IntegerField(source='grade_value', allow_null=True)
+
+    def to_representation(self, instance):
+        deadline = combine(localtime(instance['date']).date(), instance['end_time'])
+        return super().to_representation({**instance, 'deadline': deadline})
+
+
+class ScheduleSlotSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=AgendaEntry.Kind.choices)
+    title = serializers.CharField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    event = UUIDHyperlinkField(view_name='event-detail')
+    details = serializers.UUIDField()
+    assignment = UUIDHyperlinkField(view_name='assignment-detail')
+
+
+class ConflictSerializer(serializers.Serializer):
+    user = UUIDHyperlinkField(view_name='user-detail')
+    occurrence = ScheduleSlotSerializer(source='slot')
+    conflicting_occurrence = ScheduleSlotSerializer(source='other')
+
+
+class FreeSlotQuerySerializer(serializers.Serializer):
+    """Query parameters of the free slot search, instructors and groups are resolved to user identifiers."""
+    instructors = serializers.ListField(child=serializers.UUIDField(), required=False)
+    student_groups = serializers.ListField(child=serializers.UUIDField(), required=False)
+    duration = serializers.IntegerField(min_value=1, max_value=MINUTES_PER_DAY)
+    resolution = serializers.ChoiceField(choices=(1, 5, 10, 15, 30, 60), default=15)
+    day_start = serializers.TimeField(required=False)
+    day_end = serializers.TimeField(required=False)
+
+    def validate_instructors(self, value):
+        instructors = dict(InstructorProfile.objects.filter(uuid__in=value).values_list('uuid', 'user_id'))
+        self.check_missing(value, instructors, 'instructors')
+        return list(instructors.values())
+
+    def validate_student_groups(self, value):
+        groups = dict(StudentGroup.objects.filter(uuid__in=value).values_list('uuid', 'pk'))
+        self.check_missing(value, groups, 'student groups')
+        return list(StudentProfile.objects.filter(student_groups__in=groups.values()).values_list('user_id', flat=True))
+
+    @staticmethod
+    def check_missing(uuids, found, name):
+        missing = set(uuids) - set(found)
+        if missing:
+            raise serializers.ValidationError(f'Unknown {name}: {", ".join(sorted(map(str, missing)))}.')
+
+    def validate(self, attrs):
+        if not attrs.get('instructors') and not attrs.get('student_groups'):
+            raise serializers.ValidationError('Select at least one instructor or student group.')
+        if 'day_start' in attrs and 'day_end' in attrs and attrs['day_end'] <= attrs['day_start']:
+            raise serializers.ValidationError({'day_end': ['Ensure this time is later than `day_start`.']})
+        return attrs
+
+
+class FreeSlotSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+
+class OccupancyQuerySerializer(serializers.Serializer):
+    """Query parameters of occupancy matrices, all occupied subjects are included unless `subjects` are given."""
+    by = serializers.ChoiceField(choices=tuple(SUBJECTS))
+    bin = serializers.ChoiceField(choices=BIN_SIZES, default=60)
+    subjects = serializers.ListField(child=serializers.UUIDField(), required=False)
+
+    def validate(self, attrs):
+        if 'subjects' in attrs:
+            attrs['subjects'] = sorted(set(attrs['subjects']), key=str)
+            model = SUBJECTS[attrs['by']].model
+            FreeSlotQuerySerializer.check_missing(
+                attrs['subjects'], model.objects.filter(uuid__in=attrs['subjects']).values_list('uuid', flat=True),
+                str(model._meta.verbose_name_plural),
+            )
+        return attrs
+
+
+class OccupancySerializer(serializers.Serializer):
+    """Occupied minutes of a subject by weekday and bin of a day."""
+    uuid = serializers.UUIDField()
+    name = serializers.CharField()
+    total = serializers.IntegerField()
+    matrix = serializers.ListField(child=serializers.ListField(child=serializers.IntegerField()))
+
+
+class TimetableCloneSerializer(serializers.Serializer):
+    """Parameters of a clone of a timetable, the code is generated from the original one by default."""
+    start_date = serializers.DateField()
+    code = serializers.CharField(
+        max_length=Timetable._meta.get_field('code').max_length, required=False,
+        validators=[UniqueValidator(queryset=Timetable.objects.all())],
+    )
+    title = serializers.CharField(max_length=Timetable._meta.get_field('title').max_length, required=False)
+
+
+class CourseTimetablesCloneSerializer(serializers.Serializer):
+    """Parameters of clones of all timetables of a course, the earliest one starts at `start_date`."""
+    start_date = serializers.DateField()
+
+
+class SolverEventSerializer(serializers.Serializer):
+    """Periodic event details to place, attended by students of the course groups unless groups are given."""
+    details = serializers.UUIDField()
+    duration = serializers.IntegerField(min_value=1, max_value=MINUTES_PER_DAY)
+    biweekly = serializers.BooleanField(default=False)
+    instructor = serializers.UUIDField(allow_null=True, default=None)
+    student_groups = serializers.ListField(child=serializers.UUIDField(), default=list)
+
+
+class BlockedTimeSerializer(serializers.Serializer):
+    """Weekly time unavailable to instructors and student groups, or to everybody when none are given."""
+    weekday = serializers.ChoiceField(choices=PeriodicTimetableItem.WeekDay.choices)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    repeat_type = serializers.ChoiceField(
+        choices=PeriodicTimetableItem.RepeatType.choices, default=PeriodicTimetableItem.RepeatType.Weekly,
+    )
+    instructors = serializers.ListField(child=serializers.UUIDField(), default=list)
+    student_groups = serializers.ListField(child=serializers.UUIDField(), default=list)
+
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({'end_time': ['Ensure this time is later than `start_time`.']})
+        return attrs
+
+
+class SolverParametersSerializer(serializers.Serializer):
+    events = SolverEventSerializer(many=True, allow_empty=False)
+    blocked = BlockedTimeSerializer(many=True, default=list)
+    weekdays = serializers.ListField(
+        child=serializers.ChoiceField(choices=PeriodicTimetableItem.WeekDay.choices), allow_empty=False,
+        default=PeriodicTimetableItem.WeekDay.values[:5],
+    )
+    day_start = serializers.TimeField(default=time(8))
+    day_end = serializers.TimeField(default=time(20))
+    resolution = serializers.ChoiceField(choices=(5, 10, 15, 30, 60), default=15)
+
+    def validate(self, attrs):
+        if attrs['day_end'] <= attrs['day_start']:
+            raise serializers.ValidationError({'day_end': ['Ensure this time is later than `day_start`.']})
+        events = attrs['events']
+        if len({event['details'] for event in events}) < len(events):
+            raise serializers.ValidationError({'events': ['Event details must be unique.']})
+        window = (attrs['day_end'].hour - attrs['day_start'].hour) * 60 + attrs['day_end'].minute - \
+            attrs['day_start'].minute
+        if any(event['duration'] > window for event in events):
+            raise serializers.ValidationError({'events': ['Durations must fit between `day_start` and `day_end`.']})
+
+        instructors = {event['instructor'] for event in events if event['instructor']}
+        groups = set()
+        for item in events + attrs['blocked']:
+            groups.update(item['student_groups'])
+        for blocked in attrs['blocked']:
+            instructors.update(blocked['instructors'])
+        FreeSlotQuerySerializer.check_missing(
+            instructors, InstructorProfile.objects.filter(uuid__in=instructors).values_list('uuid', flat=True),
+            'instructors',
+        )
+        FreeSlotQuerySerializer.check_missing(
+            groups, StudentGroup.objects.filter(uuid__in=groups).values_list('uuid', flat=True), 'student groups',
+        )
+        return attrs
+
+
+class SolverJobSerializer(HyperlinkedModelSerializer):
+    timetable = UUIDHyperlinkedRelatedField(
+        view_name='timetable-detail',
+        queryset=Timetable.objects.all(),
+    )
+    created_by = UUIDHyperlinkedRelatedField(
+        view_name='user-detail',
+        read_only=True,
+    )
+    parameters = SolverParametersSerializer()
+
+    class Meta:
+        model = SolverJob
+        fields = (
+            'url', 'uuid', 'timetable', 'parameters', 'status', 'progress', 'conflicts', 'penalty', 'solution',
+            'error', 'created_by', 'created_date', 'updated_date', 'applied_date',
+        )
+        read_only_fields = (
+            'status', 'progress', 'conflicts', 'penalty', 'solution', 'error', 'updated_date', 'applied_date',
+        )
+        extra_kwargs = {
+            'url': {
+                'view_name': 'solver-job-detail',
+                'lookup_field': 'uuid',
+            }
+        }
+
+    def validate(self, attrs):
+        uuids = {event['details'] for event in attrs['parameters']['events']}
+        found = PeriodicEventDetails.objects.filter(uuid__in=uuids, event__timetable=attrs['timetable']).values_list(
+            'uuid', flat=True,
+        )
+        missing = uuids - set(found)
+        if missing:
+            raise serializers.ValidationError({'parameters': [
+                f'Unknown event details of the timetable: {", ".join(sorted(map(str, missing)))}.'
+            ]})
+        return attrs
+
+    def create(self, validated_data):
+        # Parameters are stored in their JSON representation.
+        validated_data['parameters'] = self.fields['parameters'].to_representation(validated_data['parameters'])
+        return SolverJob.objects.create(**validated_data)
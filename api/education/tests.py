@@ -1,14 +1,33 @@
-from datetime import datetime
+import csv
+import json
+from datetime import date, datetime, time
+from io import StringIO
+from unittest.mock import patch
 from uuid import uuid4
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import make_aware
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
-from accounts.models import StudentProfile, InstructorProfile, StudentGroup
+from accounts.importing import UserImporter
+from accounts.membership import ADD, REPLACE, change_students
+from accounts.models import FeedToken, StudentProfile, InstructorProfile, StudentGroup
+from api.education.views import GradeViewSet
+from common.cache import generations
+from common.models import TextContentItem, VideoContentItem
 from education.models import (
+    AgendaEntry,
+    AssignmentContent,
     Course,
+    CourseContent,
     Timetable,
     EventType,
     Event,
@@ -18,7 +37,14 @@ from education.models import (
     Assignment,
     Solution,
     Grade,
+    SolutionContent,
+    SolverJob,
 )
+from education.conflicts import IntervalIndex, Slot
+from education.ical import fold
+from education.occurrences import iter_dates
+from education.solver_jobs import run_job
+from education.synthetic import InstitutionGenerator
 
 User = get_user_model()
 
@@ -818,3 +844,1657 @@ class GradeCrudTests(APITestCase):
         """Test if not authenticated user can delete grade."""
         response = self.client.delete(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class GradeUploadTests(APITestCase):
+    """Test module for bulk upserts of grades of an assignment."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('assignment-grades', kwargs={'uuid': self.test_data.assignment.uuid})
+
+        self.ann, self.bob = [
+            StudentProfile.objects.create(user=User.objects.create_user(
+                full_name=f'{name} Doe', email=f'{name.lower()}.doe@test.com', password='test',
+            ))
+            for name in ('Ann', 'Bob')
+        ]
+        self.ann_solution = Solution.objects.create(assignment=self.test_data.assignment, student=self.ann)
+        Solution.objects.create(assignment=self.test_data.assignment, student=self.bob)
+        self.bob_solution = Solution.objects.create(assignment=self.test_data.assignment, student=self.bob)
+
+    def upload(self, rows, expected_status=status.HTTP_200_OK, **kwargs):
+        response = self.client.post(self.url, rows, **kwargs or {'format': 'json'})
+        self.assertEqual(response.status_code, expected_status)
+        return response.data
+
+    def test_upload_grades(self):
+        """Test if grades are inserted or updated by solution or student and invalid rows are rejected."""
+        solution = self.test_data.solution.uuid
+        data = self.upload([
+            {'solution': str(solution), 'value': 95, 'comment': 'Good'},
+            {'email': self.ann.user.email, 'value': '80'},
+            {'email': self.bob.user.email, 'value': 70},
+            {'solution': str(solution), 'value': 60},
+            {'email': 'nobody@test.com', 'value': 1},
+            {'solution': 'invalid', 'value': -1},
+            'invalid',
+        ])
+        self.assertEqual((data['created'], data['updated'], data['unchanged'], data['rejected']), (2, 1, 0, 4))
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['updated', 'created', 'created', 'rejected', 'rejected', 'rejected', 'rejected'])
+        self.assertEqual(sorted(data['results'][5]['errors']), ['solution', 'value'])
+
+        grade = Grade.objects.get(solution=self.test_data.solution)
+        self.assertEqual((grade.value, grade.comment, grade.instructor), (95, 'Good', self.test_data.instructor))
+        self.assertEqual(Grade.objects.get(solution=self.ann_solution).value, 80)
+        self.assertEqual(Grade.objects.get(solution=self.bob_solution).value, 70)
+        self.assertEqual(str(Grade.objects.get(solution=self.ann_solution).uuid), str(data['results'][1]['grade']))
+
+    def test_upload_grades_from_csv(self):
+        """Test if CSV uploads are upserted and repeated uploads leave grades unchanged."""
+        content = f'email,value,comment\n{self.ann.user.email},77,Fine\n'
+        data = self.upload(content, content_type='text/csv')
+        self.assertEqual(data['created'], 1)
+        data = self.upload(content, content_type='text/csv')
+        self.assertEqual((data['created'], data['unchanged']), (0, 1))
+
+    def test_upload_grades_queries(self):
+        """Test if the number of queries does not depend on the number of rows."""
+        Grade.objects.all().delete()
+        with CaptureQueriesContext(connection) as single:
+            self.upload([{'email': self.ann.user.email, 'value': 1},
+                         {'solution': str(self.test_data.solution.uuid), 'value': 3}])
+        Grade.objects.all().delete()
+        with CaptureQueriesContext(connection) as several:
+            self.upload([{'email': self.ann.user.email, 'value': 1}, {'email': self.bob.user.email, 'value': 2},
+                         {'solution': str(self.test_data.solution.uuid), 'value': 3}])
+        self.assertEqual(len(several), len(single))
+
+    def test_upload_grades_of_other_assignments(self):
+        """Test if solutions of other assignments are rejected."""
+        assignment = Assignment.objects.create(
+            title='Other Assignment', timetable=self.test_data.timetable, date=make_aware(datetime(2021, 9, 8)),
+            start_time=time(9), end_time=time(10),
+        )
+        solution = Solution.objects.create(assignment=assignment, student=self.ann)
+        url = reverse('assignment-grades', kwargs={'uuid': assignment.uuid})
+        response = self.client.post(url, [{'solution': str(self.ann_solution.uuid), 'value': 1}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, [{'email': self.ann.user.email, 'value': 1}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(Grade.objects.filter(solution=solution).exists())
+
+    def test_upload_grades_permissions(self):
+        """Test if uploads require permissions to add and change grades."""
+        self.client.logout()
+        user = self.test_data.user2
+        user.user_permissions.add(*Permission.objects.filter(codename__in=('add_assignment', 'change_assignment')))
+        self.client.post(self.test_data.login_url, {'email': user.email, 'password': 'test'})
+        rows = [{'email': self.ann.user.email, 'value': 1}]
+        self.upload(rows, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(*Permission.objects.filter(codename__in=(
+            'view_assignment', 'add_grade', 'change_grade',
+        )))
+        self.upload(rows)
+        self.assertEqual(Grade.objects.get(solution=self.ann_solution).instructor, self.test_data.instructor)
+
+    def test_invalid_upload(self):
+        """Test if uploads which are not lists are rejected."""
+        self.upload({'email': self.ann.user.email, 'value': 1}, status.HTTP_400_BAD_REQUEST, format='json')
+
+
+class BulkWriteTests(APITestCase):
+    """Test module for bulk creates, updates and deletes of lists on list endpoints."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.instructor_url = reverse('instructor-detail', kwargs={'uuid': self.test_data.instructor.uuid})
+        self.group_url = reverse('student-group-detail', kwargs={'uuid': self.test_data.student_group.uuid})
+        self.course_url = reverse('course-detail', kwargs={'uuid': self.test_data.course.uuid})
+
+    def get_courses(self, count, start=0):
+        return [
+            {'code': f'BC{number}', 'title': f'Bulk Course {number}', 'instructors': [self.instructor_url],
+             'student_groups': [self.group_url]}
+            for number in range(start, start + count)
+        ]
+
+    def get_timetables(self, count):
+        return [
+            {'code': f'BT{number}', 'title': f'Bulk Timetable {number}', 'course': self.course_url,
+             'start_date': '2021-09-01', 'end_date': '2021-12-31'}
+            for number in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """Test if a list of courses is created with many-to-many relations and returned in order."""
+        response = self.client.post(reverse('course-list'), self.get_courses(3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([course['code'] for course in response.data], ['BC0', 'BC1', 'BC2'])
+        self.assertTrue(response.data[0]['instructors'][0].endswith(self.instructor_url))
+
+        courses = Course.objects.filter(code__startswith='BC')
+        self.assertEqual(courses.count(), 3)
+        for course in courses:
+            self.assertEqual(list(course.instructors.all()), [self.test_data.instructor])
+            self.assertEqual(list(course.student_groups.all()), [self.test_data.student_group])
+
+    def test_bulk_create_queries(self):
+        """Test if the number of queries does not depend on the number of items."""
+        with CaptureQueriesContext(connection) as single:
+            self.client.post(reverse('course-list'), self.get_courses(1), format='json')
+        with CaptureQueriesContext(connection) as several:
+            response = self.client.post(reverse('course-list'), self.get_courses(20, start=1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(several), len(single))
+
+    def test_bulk_create_errors(self):
+        """Test if errors are reported by item and nothing is written when any item is invalid."""
+        courses = self.get_courses(3)
+        courses[1]['instructors'] = [reverse('instructor-detail', kwargs={'uuid': uuid4()})]
+        courses[2]['code'] = self.test_data.course.code
+        response = self.client.post(reverse('course-list'), courses, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(list(response.data[1]), ['instructors'])
+        self.assertEqual(list(response.data[2]), ['code'])
+        self.assertFalse(Course.objects.filter(code__startswith='BC').exists())
+
+    def test_bulk_create_duplicates(self):
+        """Test if items conflicting with earlier items of the list are reported."""
+        courses = self.get_courses(3)
+        courses[2]['code'] = courses[0]['code']
+        response = self.client.post(reverse('course-list'), courses, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([list(errors) for errors in response.data], [[], [], ['non_field_errors']])
+        self.assertFalse(Course.objects.filter(code__startswith='BC').exists())
+
+    def test_bulk_create_nested(self):
+        """Test if events with nested details are created and attending students get agenda entries."""
+        events = [
+            {'title': f'Bulk Event {number}', 'event_type': reverse(
+                'event-type-detail', kwargs={'uuid': self.test_data.event_type.uuid},
+            ), 'timetable': reverse('timetable-detail', kwargs={'uuid': self.test_data.timetable.uuid}),
+             'non_periodic_event_details': [{'start_time': f'{number + 1:02}:00', 'end_time': f'{number + 1:02}:30',
+                                             'date': '2021-01-04T00:00:00Z', 'instructor': self.instructor_url,
+                                             'students': []}]}
+            for number in range(2)
+        ]
+        response = self.client.post(reverse('event-list'), events, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = Event.objects.filter(title__startswith='Bulk Event')
+        self.assertEqual(NonPeriodicEventDetails.objects.filter(event__in=created).count(), 2)
+        self.assertEqual(AgendaEntry.objects.filter(event__in=created, user=self.test_data.user1).count(), 2)
+
+    def test_bulk_update(self):
+        """Test if a list of objects is updated by UUID and many-to-many relations are replaced."""
+        timetables = self.client.post(reverse('timetable-list'), self.get_timetables(2), format='json').data
+        other = StudentGroup.objects.create(code='BG1')
+        other_url = reverse('student-group-detail', kwargs={'uuid': other.uuid})
+        updated_at = self.test_data.course.updated_at
+        # Students of groups attend assignments which list no students.
+        self.test_data.assignment.students.clear()
+        ann = StudentProfile.objects.create(user=User.objects.create_user(
+            full_name='Ann Doe', email='ann.doe@test.com', password='test',
+        ))
+        self.test_data.student_group.students.add(ann)
+        self.assertTrue(AgendaEntry.objects.filter(user=ann.user).exists())
+
+        response = self.client.patch(reverse('timetable-list'), [
+            {'uuid': timetable['uuid'], 'title': f'Renamed {number}'} for number, timetable in enumerate(timetables)
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([timetable['title'] for timetable in response.data], ['Renamed 0', 'Renamed 1'])
+        self.assertEqual(Timetable.objects.filter(title__startswith='Renamed').count(), 2)
+
+        response = self.client.patch(reverse('course-list'), [
+            {'uuid': str(self.test_data.course.uuid), 'student_groups': [other_url]},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.test_data.course.refresh_from_db()
+        self.assertEqual(list(self.test_data.course.student_groups.all()), [other])
+        self.assertGreater(self.test_data.course.updated_at, updated_at)
+        self.assertFalse(AgendaEntry.objects.filter(user=ann.user).exists())
+
+    def test_bulk_update_agenda(self):
+        """Test if agendas of attending users are rebuilt after bulk updates of assignments."""
+        assignment = self.test_data.assignment
+        response = self.client.patch(reverse('assignment-list'), [
+            {'uuid': str(assignment.uuid), 'date': '2021-09-08T00:00:00Z', 'start_time': '12:00', 'end_time': '14:00'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        entry = AgendaEntry.objects.get(assignment=assignment, user=self.test_data.user1)
+        self.assertEqual(entry.start, make_aware(datetime(2021, 9, 8, 12)))
+
+    def test_bulk_update_errors(self):
+        """Test if unknown, missing and repeated objects are reported by item."""
+        course = str(self.test_data.course.uuid)
+        response = self.client.patch(reverse('course-list'), [
+            {'uuid': course, 'title': 'Renamed'}, {'uuid': course}, {'uuid': str(uuid4())}, {'title': 'Renamed'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual([list(errors) for errors in response.data[1:]], [['uuid']] * 3)
+        self.test_data.course.refresh_from_db()
+        self.assertEqual(self.test_data.course.title, 'Test Course')
+
+    def test_bulk_destroy(self):
+        """Test if a list of objects is deleted by UUID only when all of them exist."""
+        timetables = [
+            timetable['uuid']
+            for timetable in self.client.post(reverse('timetable-list'), self.get_timetables(3), format='json').data
+        ]
+        response = self.client.delete(reverse('timetable-list'), timetables[:2] + [str(uuid4())], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Timetable.objects.filter(uuid__in=timetables).count(), 3)
+
+        response = self.client.delete(reverse('timetable-list'), timetables[:2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Timetable.objects.filter(uuid__in=timetables).values_list('code', flat=True)), ['BT2'])
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_bulk_max_items(self):
+        """Test if lists longer than the maximum number of items are rejected."""
+        response = self.client.post(reverse('course-list'), self.get_courses(3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Course.objects.filter(code__startswith='BC').exists())
+
+    def test_bulk_permissions(self):
+        """Test if bulk updates require the permission to change objects."""
+        self.client.logout()
+        user = self.test_data.user2
+        user.user_permissions.add(*Permission.objects.filter(codename__in=('view_course', 'add_course')))
+        self.client.post(self.test_data.login_url, {'email': user.email, 'password': 'test'})
+        update = [{'uuid': str(self.test_data.course.uuid), 'title': 'Renamed'}]
+        response = self.client.patch(reverse('course-list'), update, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('course-list'), self.get_courses(1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ResponseCacheTests(APITestCase):
+    """Test module for cached list and retrieve responses."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.list_url = reverse('course-list')
+        self.detail_url = reverse('course-detail', kwargs={'uuid': self.test_data.course.uuid})
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_cached_list_skips_queries(self):
+        """Test if a repeated list request is served from the cache."""
+        first_response, first_queries = self.get(self.list_url)
+        second_response, second_queries = self.get(self.list_url)
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertLess(second_queries, first_queries)
+
+    def test_cache_varies_by_query_params(self):
+        """Test if responses for different query parameters are cached separately."""
+        self.get(self.list_url)
+        response, _ = self.get(self.list_url, code='unknown')
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_cache_shared_by_permissions(self):
+        """Test if users with the same permissions share cached responses and others do not."""
+        self.client.logout()
+        url = reverse('event-type-list')
+        view_event_type = Permission.objects.get(codename='view_eventtype')
+        user1, user2 = self.test_data.user1, self.test_data.user2
+        user1.user_permissions.add(view_event_type)
+        user2.user_permissions.add(view_event_type)
+        self.client.post(self.test_data.login_url, {'email': user1.email, 'password': 'test'})
+        first_response, first_queries = self.get(url)
+        self.client.post(self.test_data.login_url, {'email': user2.email, 'password': 'test'})
+        second_response, second_queries = self.get(url)
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertLess(second_queries, first_queries)
+
+        user2.user_permissions.add(Permission.objects.get(codename='view_timetable'))
+        _, third_queries = self.get(url)
+        self.assertEqual(third_queries, first_queries)
+
+    def test_cache_per_user(self):
+        """Test if responses filtered by the current user are not shared by users with the same permissions."""
+        self.client.logout()
+        view_course = Permission.objects.get(codename='view_course')
+        user1, user2 = self.test_data.user1, self.test_data.user2
+        user1.user_permissions.add(view_course)
+        user2.user_permissions.add(view_course)
+        self.client.post(self.test_data.login_url, {'email': user1.email, 'password': 'test'})
+        _, first_queries = self.get(self.list_url)
+        self.client.post(self.test_data.login_url, {'email': user2.email, 'password': 'test'})
+        _, second_queries = self.get(self.list_url)
+        self.assertEqual(second_queries, first_queries)
+        _, third_queries = self.get(self.list_url)
+        self.assertLess(third_queries, first_queries)
+
+    def test_evicted_generation_does_not_repeat(self):
+        """Test if generations evicted from the cache restart at values never used before."""
+        self.get(self.detail_url)
+        key = generations.make_key(Course)
+        generation = cache.get(key)
+        cache.delete(key)
+        self.assertNotEqual(generations.get([Course]), (generation,))
+        self.client.patch(self.detail_url, {'title': 'Updated Course'})
+        cache.delete(key)
+        response, _ = self.get(self.detail_url)
+        self.assertEqual(response.json()['title'], 'Updated Course')
+
+    def test_update_invalidates_cache(self):
+        """Test if updating a course invalidates cached responses."""
+        self.get(self.detail_url)
+        self.client.patch(self.detail_url, {'title': 'Updated Course'})
+        response, _ = self.get(self.detail_url)
+        self.assertEqual(response.json()['title'], 'Updated Course')
+
+    def test_m2m_change_invalidates_cache(self):
+        """Test if changing course instructors invalidates cached responses."""
+        self.get(self.detail_url)
+        self.test_data.course.instructors.clear()
+        response, _ = self.get(self.detail_url)
+        self.assertEqual(response.json()['instructors'], [])
+
+    def test_related_change_invalidates_cache(self):
+        """Test if creating a related timetable invalidates cached responses."""
+        self.get(self.detail_url)
+        timetable = Timetable.objects.create(
+            code='TT4317',
+            course=self.test_data.course,
+            start_date=datetime.now(),
+            end_date=datetime.now(),
+        )
+        response, _ = self.get(self.detail_url)
+        self.assertIn(str(timetable.uuid), ' '.join(response.json()['timetables']))
+
+
+class ConditionalRequestTests(APITestCase):
+    """Test module for conditional requests on courses."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.list_url = reverse('course-list')
+        self.detail_url = reverse('course-detail', kwargs={'uuid': self.test_data.course.uuid})
+
+    def test_list_not_modified(self):
+        """Test if an unchanged course list returns 304 for a matching ETag."""
+        response = self.client.get(self.list_url)
+        self.assertIn('ETag', response)
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified(self):
+        """Test if a changed course list returns 200 for a stale ETag."""
+        etag = self.client.get(self.list_url)['ETag']
+        Course.objects.create(code='TC4317', title='Test Course 2')
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_not_modified_since(self):
+        """Test if an unchanged course returns 304 for a matching modification date."""
+        response = self.client.get(self.detail_url)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_ignores_other_courses(self):
+        """Test if changing another course keeps the course ETag."""
+        etag = self.client.get(self.detail_url)['ETag']
+        Course.objects.create(code='TC4317', title='Test Course 2')
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_with_matching_etag(self):
+        """Test if a course can be updated with a matching If-Match header."""
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.patch(self.detail_url, {'title': 'Updated Course'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_with_stale_etag(self):
+        """Test if a course update with a stale If-Match header is rejected."""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.patch(self.detail_url, {'title': 'Updated Course'})
+
+        response = self.client.patch(self.detail_url, {'title': 'Lost Update'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.test_data.course.refresh_from_db()
+        self.assertEqual(self.test_data.course.title, 'Updated Course')
+
+    def test_instructors_change_modifies_course(self):
+        """Test if changing course instructors changes the course ETag."""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.test_data.course.instructors.clear()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CursorPaginationTests(APITestCase):
+    """Test module for cursor pagination of grades."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        for value in range(5):
+            solution = Solution.objects.create(assignment=self.test_data.assignment, student=self.test_data.student)
+            Grade.objects.create(value=value % 2, solution=solution, instructor=self.test_data.instructor)
+        self.list_url = reverse('grade-list')
+
+    def get_all_pages(self, params):
+        response = self.client.get(self.list_url, params)
+        results = response.json()['results']
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results += response.json()['results']
+        return results
+
+    def test_cursor_pages(self):
+        """Test if cursor pages return every grade once without counting."""
+        response = self.client.get(self.list_url, {'cursor': '', 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.json())
+        self.assertEqual(len(response.json()['results']), 2)
+
+        results = self.get_all_pages({'cursor': '', 'limit': 2})
+        self.assertEqual(len(results), Grade.objects.count())
+        self.assertEqual(len({grade['uuid'] for grade in results}), len(results))
+
+    def test_cursor_pages_with_filters(self):
+        """Test if cursor pages keep filter parameters."""
+        results = self.get_all_pages({'cursor': '', 'limit': 1, 'value': 1})
+        self.assertEqual(len(results), Grade.objects.filter(value=1).count())
+        self.assertTrue(all(grade['value'] == 1 for grade in results))
+
+    def test_invalid_cursor(self):
+        """Test if an invalid cursor is rejected."""
+        response = self.client.get(self.list_url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_limit_offset_pages(self):
+        """Test if grades keep limit/offset pages without a cursor."""
+        response = self.client.get(self.list_url, {'limit': 2, 'offset': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], Grade.objects.count())
+
+
+
+class SparseFieldsetTests(APITestCase):
+    """Test module for sparse fieldsets of courses."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.list_url = reverse('course-list')
+        self.detail_url = reverse('course-detail', kwargs={'uuid': self.test_data.course.uuid})
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries
+
+    def test_fields(self):
+        """Test if only requested fields are rendered."""
+        response, _ = self.get(self.list_url, fields='uuid,code')
+        self.assertEqual(set(response.json()['results'][0]), {'uuid', 'code'})
+
+        response, _ = self.get(self.detail_url, fields='uuid,title,unknown')
+        self.assertEqual(set(response.json()), {'uuid', 'title'})
+
+    def test_omit(self):
+        """Test if omitted fields are not rendered."""
+        response, _ = self.get(self.detail_url, omit='contents,timetables')
+        self.assertNotIn('contents', response.json())
+        self.assertNotIn('timetables', response.json())
+        self.assertIn('instructors', response.json())
+
+    def test_sparse_fields_prune_queries(self):
+        """Test if relations which are not rendered are not queried."""
+        _, queries = self.get(self.list_url)
+        _, sparse_queries = self.get(self.list_url, fields='uuid,code')
+        self.assertLess(len(sparse_queries), len(queries))
+
+        course_query = sparse_queries.captured_queries[-1]['sql']
+        self.assertIn('"education_course"."code"', course_query)
+        self.assertNotIn('"education_course"."syllabus"', course_query)
+
+    def test_write_ignores_fields(self):
+        """Test if sparse fieldsets do not restrict validated fields."""
+        url = f'{self.detail_url}?fields=uuid'
+        response = self.client.patch(url, {'title': 'New Title'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['title'], 'New Title')
+
+
+class QuerysetPlanTests(APITestCase):
+    """Test module for query counts of list pages."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        for item in self.create_content_items(-1):
+            AssignmentContent.objects.create(assignment=self.test_data.assignment, item=item)
+            SolutionContent.objects.create(solution=self.test_data.solution, item=item)
+
+        for index in range(4):
+            assignment = Assignment.objects.create(
+                title=f'Assignment {index}',
+                timetable=self.test_data.timetable,
+                start_time=datetime.now().time(),
+                end_time=datetime.now().time(),
+                instructor=self.test_data.instructor,
+                date=datetime.now().date(),
+            )
+            assignment.students.add(self.test_data.student)
+            solution = Solution.objects.create(assignment=assignment, student=self.test_data.student)
+            Grade.objects.create(value=index, solution=solution, instructor=self.test_data.instructor)
+            for item in self.create_content_items(index):
+                AssignmentContent.objects.create(assignment=assignment, item=item)
+                SolutionContent.objects.create(solution=solution, item=item)
+
+    @staticmethod
+    def create_content_items(index):
+        return (
+            TextContentItem.objects.create(title=f'Text {index}', content='Text'),
+            VideoContentItem.objects.create(title=f'Video {index}', url='https://test.com/video'),
+        )
+
+    def count_queries(self, url, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'limit': limit})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(queries)
+
+    def assertConstantQueries(self, view_name):
+        url = reverse(view_name)
+        self.assertEqual(self.count_queries(url, 1), self.count_queries(url, 5), view_name)
+
+    def test_assignment_queries(self):
+        """Test if the query count of assignment pages does not grow with page size."""
+        self.assertConstantQueries('assignment-list')
+
+    def test_solution_queries(self):
+        """Test if the query count of solution pages does not grow with page size."""
+        self.assertConstantQueries('solution-list')
+
+    def test_grade_queries(self):
+        """Test if the query count of grade pages does not grow with page size."""
+        self.assertConstantQueries('grade-list')
+
+    def test_course_contents_queries(self):
+        """Test if the query count of a course does not grow with the number of contents."""
+        url = reverse('course-detail', kwargs={'uuid': self.test_data.course.uuid})
+        for item in self.create_content_items(0):
+            CourseContent.objects.create(course=self.test_data.course, item=item)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        for index in range(1, 5):
+            for item in self.create_content_items(index):
+                CourseContent.objects.create(course=self.test_data.course, item=item)
+        with CaptureQueriesContext(connection) as more_queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['contents']), 10)
+        self.assertEqual(response.json()['contents'][-1]['item']['url'], 'https://test.com/video')
+        self.assertEqual(len(more_queries), len(queries))
+
+
+class StreamingListTests(APITestCase):
+    """Test module for streamed lists."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        for value in range(5):
+            solution = Solution.objects.create(assignment=self.test_data.assignment, student=self.test_data.student)
+            Grade.objects.create(value=value % 2, solution=solution, instructor=self.test_data.instructor)
+
+    def get_stream(self, url, **params):
+        response = self.client.get(url, {'stream': '1', **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_stream_list(self):
+        """Test if a streamed list contains every grade without pagination."""
+        with patch.object(GradeViewSet, 'stream_chunk_size', 2):
+            grades = self.get_stream(reverse('grade-list'))
+        self.assertEqual(len(grades), Grade.objects.count())
+        self.assertEqual(
+            {grade['uuid'] for grade in grades},
+            {str(uuid) for uuid in Grade.objects.values_list('uuid', flat=True)},
+        )
+
+    def test_stream_list_with_filters(self):
+        """Test if a streamed list honours filters."""
+        grades = self.get_stream(reverse('grade-list'), value=1)
+        self.assertEqual(len(grades), Grade.objects.filter(value=1).count())
+        self.assertTrue(all(grade['value'] == 1 for grade in grades))
+
+    def test_stream_list_with_search(self):
+        """Test if a streamed list honours search."""
+        Course.objects.create(code='OC1', title='Other Course')
+        courses = self.get_stream(reverse('course-list'), search='Test')
+        self.assertEqual([course['code'] for course in courses], [self.test_data.course.code])
+
+    def test_stream_empty_list(self):
+        """Test if an empty streamed list is a valid JSON array."""
+        self.assertEqual(self.get_stream(reverse('grade-list'), value=50), [])
+
+
+class InstitutionGeneratorTests(APITestCase):
+    """Test module for the synthetic institution generator."""
+
+    def test_generate_institution(self):
+        """Test if the generated institution is consistent and visible through the API."""
+        test_data = TestData()
+        test_data.login_as_superuser(self.client)
+        self.assertEqual(self.client.get(reverse('course-list')).json()['count'], 1)
+
+        call_command('generate_institution', scale=1, seed=1, stdout=StringIO())
+
+        generator = InstitutionGenerator
+        self.assertEqual(Course.objects.count(), generator.courses + 1)
+        self.assertEqual(StudentProfile.objects.count(), generator.student_groups * generator.students_per_group + 1)
+        self.assertFalse(Course.objects.exclude(pk=test_data.course.pk).filter(instructors=None).exists())
+        self.assertEqual(
+            Solution.objects.filter(grade__isnull=False).count(),
+            int((Solution.objects.count() - 1) * generator.grade_rate) + 1,
+        )
+        self.assertEqual(CourseContent.objects.count(), generator.courses * generator.contents_per_course)
+
+        response = self.client.get(reverse('course-list'))
+        self.assertEqual(response.json()['count'], generator.courses + 1)
+
+
+class OccurrenceTests(APITestCase):
+    """Test module for expanded event occurrences."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('event-occurrences')
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10)
+        details.save()
+
+    def test_weekly_dates(self):
+        """Test if weekly items repeat every week of the term."""
+        dates = iter_dates('MO', 'W', date(2021, 9, 1), date(2021, 9, 30), date(2021, 1, 1), date(2021, 12, 31))
+        self.assertEqual([day.day for day in dates], [6, 13, 20, 27])
+
+    def test_even_and_odd_dates(self):
+        """Test if even and odd weeks are counted from the first week of the term."""
+        args = (date(2021, 9, 1), date(2021, 9, 30), date(2021, 9, 1), date(2021, 9, 30))
+        self.assertEqual([day.day for day in iter_dates('WE', 'O', *args)], [1, 15, 29])
+        self.assertEqual([day.day for day in iter_dates('MO', 'O', *args)], [13, 27])
+        self.assertEqual([day.day for day in iter_dates('MO', 'E', *args)], [6, 20])
+        self.assertEqual([day.day for day in iter_dates('MO', 'E', date(2021, 9, 1), date(2021, 9, 30),
+                                                        date(2021, 9, 14), date(2021, 9, 30))], [20])
+
+    def test_occurrences(self):
+        """Test if periodic and non-periodic occurrences are merged in order of their start."""
+        response = self.client.get(self.url, {'from': '2021-09-01', 'to': '2021-09-15'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        occurrences = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual([occurrence['start'][:16] for occurrence in occurrences], [
+            '2021-09-06T09:00', '2021-09-06T10:00', '2021-09-13T10:00',
+        ])
+        self.assertEqual([occurrence['periodic'] for occurrence in occurrences], [False, True, True])
+        self.assertEqual(occurrences[1]['details'], str(self.test_data.periodic_event_details.uuid))
+        self.assertTrue(occurrences[1]['event'].endswith(
+            reverse('event-detail', kwargs={'uuid': self.test_data.event.uuid})
+        ))
+
+    def test_occurrences_with_filters(self):
+        """Test if occurrences honour event filters."""
+        response = self.client.get(self.url, {'from': '2021-09-01', 'to': '2021-09-15', 'search': 'Other'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+    def test_invalid_range(self):
+        """Test if missing, reversed and too long ranges are rejected."""
+        for params in ({}, {'from': '2021-09-01'}, {'from': '2021-09-15', 'to': '2021-09-01'},
+                       {'from': '2021-01-01', 'to': '2023-01-01'}, {'from': 'invalid', 'to': '2021-09-01'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class AgendaTests(APITestCase):
+    """Test module for materialized agendas of the current user."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.client.post(self.test_data.login_url, {'email': self.test_data.user1.email, 'password': 'test'})
+        self.url = reverse('agenda')
+        self.params = {'from': '2021-09-01', 'to': '2021-09-15'}
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10)
+        details.save()
+        assignment = self.test_data.assignment
+        assignment.date, assignment.start_time, assignment.end_time = make_aware(datetime(2021, 9, 8)), time(12), \
+            time(14)
+        assignment.save()
+
+    def get_starts(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(entry['kind'], entry['start'][:16]) for entry in response.data['results']]
+
+    def test_agenda(self):
+        """Test if events and assignments of the user are listed in order of their start."""
+        self.assertEqual(self.get_starts(), [
+            ('E', '2021-09-06T09:00'), ('E', '2021-09-06T10:00'), ('A', '2021-09-08T12:00'),
+            ('E', '2021-09-13T10:00'),
+        ])
+        entry = self.client.get(self.url, self.params).data['results'][2]
+        self.assertIsNone(entry['event'])
+        self.assertTrue(entry['assignment'].endswith(
+            reverse('assignment-detail', kwargs={'uuid': self.test_data.assignment.uuid})
+        ))
+
+    def test_agenda_of_other_users(self):
+        """Test if agendas only list entries of the current user."""
+        self.client.logout()
+        self.test_data.login_as_superuser(self.client)
+        self.assertEqual(self.get_starts(), [])
+
+    def test_agenda_follows_changes(self):
+        """Test if agendas are rebuilt when events, details and group memberships change."""
+        self.test_data.periodic_event_details.delete()
+        self.assertEqual(len(self.get_starts()), 2)
+
+        self.test_data.nonperiodic_event_details.students.clear()
+        self.assertEqual(len(self.get_starts()), 2)
+
+        self.test_data.student_group.students.remove(self.test_data.student)
+        self.test_data.assignment.students.clear()
+        self.assertEqual(self.get_starts(), [])
+
+        self.test_data.student.student_groups.add(self.test_data.student_group)
+        self.assertEqual(len(self.get_starts()), 2)
+
+        self.test_data.course.student_groups.clear()
+        self.assertEqual(self.get_starts(), [])
+
+    def test_agenda_follows_group_changes(self):
+        """Test if agendas of students are rebuilt when their groups leave courses or are deleted."""
+        self.test_data.assignment.students.clear()
+        self.test_data.periodic_event_details.students.clear()
+        self.test_data.nonperiodic_event_details.students.clear()
+        self.test_data.student_group.joined_courses.clear()
+        self.assertEqual(self.get_starts(), [])
+
+        self.test_data.course.student_groups.add(self.test_data.student_group)
+        self.assertEqual(len(self.get_starts()), 4)
+        self.test_data.student_group.delete()
+        self.assertEqual(self.get_starts(), [])
+
+    def test_group_delete_queries(self):
+        """Test if deleting a group refreshes agendas with a number of queries independent of its students."""
+        counts = []
+        for number, students in enumerate((2, 20)):
+            group = StudentGroup.objects.create(code=f'TG{number}')
+            for index in range(students):
+                user = User.objects.create_user(
+                    full_name=f'Student {index}', email=f'student{number}.{index}@test.com', password='test',
+                )
+                StudentProfile.objects.create(user=user).student_groups.add(group)
+            self.test_data.course.student_groups.add(group)
+            with CaptureQueriesContext(connection) as queries:
+                group.delete()
+            counts.append(len(queries))
+            self.assertFalse(AgendaEntry.objects.filter(user__email__startswith=f'student{number}.').exists())
+        self.assertEqual(counts[0], counts[1])
+
+    def test_agenda_follows_bulk_membership_changes(self):
+        """Test if agendas are rebuilt after students are removed from and added to groups in bulk."""
+        self.test_data.assignment.students.clear()
+        change_students(self.test_data.student_group, [], REPLACE)
+        self.assertEqual(len(self.get_starts()), 3)
+        change_students(self.test_data.student_group, [self.test_data.student.pk], ADD)
+        self.assertEqual(len(self.get_starts()), 4)
+
+    def test_agenda_of_imported_students(self):
+        """Test if agendas of students imported into groups are built."""
+        for details in (self.test_data.periodic_event_details, self.test_data.nonperiodic_event_details,
+                        self.test_data.assignment):
+            details.students.clear()
+        UserImporter(workers=1).run([
+            {'email': 'ann@test.com', 'full_name': 'Ann Doe', 'role': 'student', 'groups': 'TG4316'},
+        ])
+        entries = AgendaEntry.objects.filter(user__email='ann@test.com').values_list('kind', 'start')
+        self.assertEqual(len(entries), 6)
+        self.assertEqual(set(entries), set(AgendaEntry.objects.filter(user=self.test_data.user1).values_list(
+            'kind', 'start',
+        )))
+
+    def test_refresh_agenda_command(self):
+        """Test if the command rebuilds agendas."""
+        AgendaEntry.objects.all().delete()
+        call_command('refresh_agenda', stdout=StringIO())
+        self.assertEqual(len(self.get_starts()), 4)
+
+    def test_unauthenticated(self):
+        """Test if agendas require authentication."""
+        self.client.logout()
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@patch('django.utils.timezone.now', lambda: make_aware(datetime(2021, 9, 6, 12)))
+class DeadlineTests(APITestCase):
+    """Test module for upcoming deadlines of the current user."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.client.post(self.test_data.login_url, {'email': self.test_data.user1.email, 'password': 'test'})
+        self.url = reverse('deadlines')
+
+        assignment = self.test_data.assignment
+        assignment.date, assignment.start_time, assignment.end_time = make_aware(datetime(2021, 9, 8)), time(12), \
+            time(14)
+        assignment.save()
+        for day, end_time in ((6, time(11)), (20, time(10))):
+            Assignment.objects.create(
+                title=f'Assignment {day}', timetable=self.test_data.timetable, date=make_aware(datetime(2021, 9, day)),
+                start_time=time(9), end_time=end_time,
+            )
+
+    def get_deadlines(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(deadline['title'], deadline['deadline'][:16]) for deadline in response.data['results']]
+
+    def test_deadlines(self):
+        """Test if assignments due within the period are listed with the submission status of the student."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        deadline = response.data['results'][0]
+        self.assertEqual(deadline['deadline'][:16], '2021-09-08T14:00')
+        self.assertEqual((deadline['submitted'], deadline['graded'], deadline['grade']), (True, True, 90))
+        self.assertTrue(deadline['solution'].endswith(
+            reverse('solution-detail', kwargs={'uuid': self.test_data.solution.uuid})
+        ))
+
+        self.test_data.grade.delete()
+        deadline = self.client.get(self.url).data['results'][0]
+        self.assertEqual((deadline['submitted'], deadline['graded'], deadline['grade']), (True, False, None))
+
+    def test_deadlines_within(self):
+        """Test if passed deadlines are skipped and deadlines at the end of the period are included."""
+        self.assertEqual(self.get_deadlines(within='1d'), [])
+        self.assertEqual(self.get_deadlines(within='50h'), [('Test Assignment', '2021-09-08T14:00')])
+        self.assertEqual(self.get_deadlines(within='49h'), [])
+        self.assertEqual(self.get_deadlines(within='2w'), [
+            ('Test Assignment', '2021-09-08T14:00'), ('Assignment 20', '2021-09-20T10:00'),
+        ])
+
+    def test_deadlines_of_group_courses(self):
+        """Test if students get assignments of courses of their groups without being added to them."""
+        self.test_data.assignment.students.clear()
+        self.assertEqual(len(self.get_deadlines(within='2w')), 2)
+        self.test_data.student_group.students.remove(self.test_data.student)
+        self.assertEqual(self.get_deadlines(within='2w'), [])
+
+    def test_deadlines_queries(self):
+        """Test if the submission status does not take a query per assignment."""
+        with CaptureQueriesContext(connection) as single:
+            self.get_deadlines()
+        with CaptureQueriesContext(connection) as several:
+            self.assertEqual(len(self.get_deadlines(within='2w')), 2)
+        self.assertEqual(len(several), len(single))
+
+    def test_instructor_deadlines(self):
+        """Test if instructors get assignments they instruct without a submission status."""
+        self.client.logout()
+        self.client.post(self.test_data.login_url, {'email': self.test_data.user2.email, 'password': 'test'})
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        deadline = response.data['results'][0]
+        self.assertEqual((deadline['submitted'], deadline['graded'], deadline['solution']), (None, None, None))
+
+    def test_invalid_within(self):
+        """Test if invalid or too long periods are rejected."""
+        for within in ('7', 'd', '-1d', '7m', '60w'):
+            response = self.client.get(self.url, {'within': within})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, within)
+
+
+class ConflictTests(APITestCase):
+    """Test module for scheduling conflict detection."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+
+        self.instructor_url = reverse('instructor-detail', kwargs={'uuid': self.test_data.instructor.uuid})
+        self.assignment = {
+            'title': 'Test Assignment 2',
+            'timetable': reverse('timetable-detail', kwargs={'uuid': self.test_data.timetable.uuid}),
+            'start_time': '10:30',
+            'end_time': '12:00',
+            'date': '2021-09-13T00:00:00Z',
+            'instructor': self.instructor_url,
+            'students': [],
+        }
+
+    def test_interval_index(self):
+        """Test if the interval index returns exactly the overlapping intervals."""
+        day = make_aware(datetime(2021, 9, 6))
+        intervals = [
+            Slot(day.replace(hour=hour), day.replace(hour=hour + length), str(hour), None, None, None, None, ())
+            for hour, length in ((8, 4), (9, 1), (11, 1), (13, 1))
+        ]
+        index = IntervalIndex(intervals)
+        overlapping = index.overlapping(day.replace(hour=10), day.replace(hour=11, minute=30))
+        self.assertEqual([interval.title for interval in overlapping], ['8', '11'])
+
+    def test_create_conflicting_assignment(self):
+        """Test if assignments overlapping events of their instructor are rejected."""
+        response = self.client.post(reverse('assignment-list'), self.assignment)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['non_field_errors']
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith('Jack Doe has "Test Event" from 2021-09-13 10:00 to 11:00'))
+        self.assertTrue(errors[1].startswith('Jill Doe has "Test Event"'))
+
+    def test_create_adjacent_assignment(self):
+        """Test if assignments starting when an event ends are accepted."""
+        response = self.client.post(reverse('assignment-list'), dict(self.assignment, start_time='11:00'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_create_conflicting_event_details(self):
+        """Test if events with details overlapping each other are rejected."""
+        details = {
+            'start_time': '14:00', 'end_time': '15:00', 'instructor': self.instructor_url, 'students': [],
+            'weekday': PeriodicTimetableItem.WeekDay.Tuesday, 'repeat_type': PeriodicTimetableItem.RepeatType.Weekly,
+        }
+        event = {
+            'title': 'Test Event 2',
+            'timetable': reverse('timetable-detail', kwargs={'uuid': self.test_data.timetable.uuid}),
+            'event_type': reverse('event-type-detail', kwargs={'uuid': self.test_data.event_type.uuid}),
+            'periodic_event_details': [details],
+            'non_periodic_event_details': [dict(details, date='2021-09-14T00:00:00Z')],
+        }
+        response = self.client.post(reverse('event-list'), event, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['non_field_errors']), 2)
+
+        event['non_periodic_event_details'] = []
+        response = self.client.post(reverse('event-list'), event, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_create_parallel_sections(self):
+        """Test if simultaneous details of different students and instructors are accepted."""
+        user = User.objects.create_user(email='jane.doe@test.com', full_name='Jane Doe', password='test')
+        student = StudentProfile.objects.create(user=user)
+        self.test_data.student_group.students.add(student)
+        user = User.objects.create_user(email='john.doe@test.com', full_name='John Doe', password='test')
+        instructor = InstructorProfile.objects.create(user=user)
+
+        details = {
+            'start_time': '14:00', 'end_time': '15:00', 'instructor': self.instructor_url,
+            'students': [reverse('student-detail', kwargs={'uuid': self.test_data.student.uuid})],
+            'weekday': PeriodicTimetableItem.WeekDay.Tuesday, 'repeat_type': PeriodicTimetableItem.RepeatType.Weekly,
+        }
+        event = {
+            'title': 'Test Event 2',
+            'timetable': reverse('timetable-detail', kwargs={'uuid': self.test_data.timetable.uuid}),
+            'event_type': reverse('event-type-detail', kwargs={'uuid': self.test_data.event_type.uuid}),
+            'periodic_event_details': [details, dict(
+                details, instructor=reverse('instructor-detail', kwargs={'uuid': instructor.uuid}),
+                students=[reverse('student-detail', kwargs={'uuid': student.uuid})],
+            )],
+        }
+        response = self.client.post(reverse('event-list'), event, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AgendaEntry.objects.filter(user=student.user, title='Test Event 2').count(), 4)
+        self.assertEqual(AgendaEntry.objects.filter(user=self.test_data.user1, title='Test Event 2').count(), 4)
+
+    def test_bulk_create_conflicting_assignments(self):
+        """Test if assignments of a list overlapping earlier items are rejected."""
+        self.assignment['date'] = '2021-09-14T00:00:00Z'
+        items = [self.assignment, dict(self.assignment)]
+        response = self.client.post(reverse('assignment-list'), items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertTrue(response.data[1]['non_field_errors'][0].startswith(
+            'Jack Doe has "Test Assignment 2" from 2021-09-14 10:30 to 12:00',
+        ))
+        self.assertFalse(Assignment.objects.filter(title='Test Assignment 2').exists())
+
+        items[1]['start_time'] = '12:00'
+        response = self.client.post(reverse('assignment-list'), items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_update_does_not_conflict_with_itself(self):
+        """Test if updated events and assignments do not conflict with their own occurrences."""
+        response = self.client.patch(
+            reverse('timetable-detail', kwargs={'uuid': self.test_data.timetable.uuid}), {'end_date': '2021-10-31'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(reverse('event-detail', kwargs={'uuid': self.test_data.event.uuid}), {
+            'timetable': reverse('timetable-detail', kwargs={'uuid': self.test_data.timetable.uuid}),
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_timetable_conflicts(self):
+        """Test if the report lists overlapping occurrences of every attending user."""
+        assignment = Assignment.objects.create(
+            title='Overlapping Assignment',
+            timetable=self.test_data.timetable,
+            start_time=time(10, 30),
+            end_time=time(12),
+            instructor=self.test_data.instructor,
+            date=make_aware(datetime(2021, 9, 13)),
+        )
+        response = self.client.get(reverse('timetable-conflicts', kwargs={'uuid': self.test_data.timetable.uuid}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        conflicts = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual(len(conflicts), 2)
+        self.assertEqual({conflict['user'].rsplit('/', 2)[-2] for conflict in conflicts}, {
+            str(self.test_data.user1.uuid), str(self.test_data.user2.uuid),
+        })
+        self.assertEqual(conflicts[0]['occurrence']['title'], 'Test Event')
+        self.assertTrue(conflicts[0]['conflicting_occurrence']['assignment'].endswith(
+            reverse('assignment-detail', kwargs={'uuid': assignment.uuid})
+        ))
+
+
+class FreeSlotTests(APITestCase):
+    """Test module for the free slot search."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('free-slots')
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10)
+        details.save()
+        assignment = self.test_data.assignment
+        assignment.date, assignment.start_time, assignment.end_time = make_aware(datetime(2021, 9, 8)), time(12), \
+            time(14, 10)
+        assignment.save()
+
+        self.params = {
+            'from': '2021-09-06', 'to': '2021-09-08', 'duration': 60, 'day_start': '08:00', 'day_end': '18:00',
+        }
+
+    def get_slots(self, **params):
+        response = self.client.get(self.url, dict(self.params, **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(slot['start'][5:16], slot['end'][11:16]) for slot in response.data]
+
+    def test_free_slots(self):
+        """Test if free periods of instructors are split by their occurrences."""
+        self.assertEqual(self.get_slots(instructors=self.test_data.instructor.uuid), [
+            ('09-06T08:00', '09:00'), ('09-06T11:00', '18:00'), ('09-07T08:00', '18:00'),
+            ('09-08T08:00', '12:00'), ('09-08T14:15', '18:00'),
+        ])
+
+    def test_free_slots_duration_and_resolution(self):
+        """Test if periods shorter than the duration are skipped and partially busy slots are busy."""
+        self.assertEqual(self.get_slots(student_groups=self.test_data.student_group.uuid, duration=210,
+                                        resolution=60), [
+            ('09-06T11:00', '18:00'), ('09-07T08:00', '18:00'), ('09-08T08:00', '12:00'),
+        ])
+
+    def test_free_slots_of_users_without_occurrences(self):
+        """Test if users without occurrences are free during the whole day."""
+        instructor = InstructorProfile.objects.create(user=self.test_data.superuser)
+        self.assertEqual(self.get_slots(instructors=instructor.uuid, day_start='00:00', day_end='23:59',
+                                        **{'from': '2021-09-06', 'to': '2021-09-06'}), [('09-06T00:00', '00:00')])
+
+    def test_free_slots_permissions(self):
+        """Test if the search requires the permission to view event details."""
+        self.client.logout()
+        user = self.test_data.user2
+        self.client.post(self.test_data.login_url, {'email': user.email, 'password': 'test'})
+        response = self.client.get(self.url, dict(self.params, instructors=self.test_data.instructor.uuid))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(Permission.objects.get(codename='view_periodiceventdetails'))
+        self.assertEqual(len(self.get_slots(instructors=self.test_data.instructor.uuid)), 5)
+
+    def test_invalid_free_slot_query(self):
+        """Test if queries without people, with unknown people or invalid times are rejected."""
+        for params in ({}, {'instructors': uuid4()},
+                       {'instructors': self.test_data.instructor.uuid, 'day_start': '12:00', 'day_end': '09:00'},
+                       {'instructors': self.test_data.instructor.uuid, 'resolution': 7}):
+            response = self.client.get(self.url, dict(self.params, **params))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class OccupancyTests(APITestCase):
+    """Test module for occupancy matrices."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('occupancy')
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10, 30)
+        details.save()
+
+        self.params = {'from': '2021-09-01', 'to': '2021-09-30', 'by': 'instructor'}
+
+    def get_results(self, **params):
+        response = self.client.get(self.url, dict(self.params, **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_instructor_occupancy(self):
+        """Test if periodic occurrences are added on every date and bins hold occupied minutes."""
+        results = self.get_results()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['uuid'], str(self.test_data.instructor.uuid))
+        self.assertEqual(results[0]['name'], 'Jill Doe')
+        self.assertEqual(results[0]['total'], 4 * 60 + 90)
+        monday = results[0]['matrix'][0]
+        self.assertEqual(len(monday), 24)
+        self.assertEqual((monday[9], monday[10]), (60, 4 * 60 + 30))
+        self.assertFalse(any(results[0]['matrix'][1]))
+
+    def test_student_group_occupancy(self):
+        """Test if groups are occupied by events of their courses within the range and bins."""
+        results = self.get_results(by='student_group', bin=30, to='2021-09-12')
+        self.assertEqual(results[0]['name'], 'TG4316')
+        self.assertEqual(results[0]['matrix'][0][18:23], [30, 30, 60, 30, 0])
+
+    def test_occupancy_of_selected_subjects(self):
+        """Test if selected subjects without occurrences are included with empty matrices."""
+        course = Course.objects.create(code='TC0000', title='Empty Course')
+        results = self.get_results(by='course', subjects=[course.uuid, self.test_data.course.uuid])
+        self.assertEqual([(result['name'], result['total']) for result in results],
+                         [('TC0000', 0), ('TC4316', 4 * 60 + 90)])
+
+    def test_occupancy_cache_invalidation(self):
+        """Test if cached matrices are computed again after event details change."""
+        self.assertEqual(self.get_results()[0]['total'], 4 * 60 + 90)
+        details = self.test_data.periodic_event_details
+        details.end_time = time(12)
+        details.save()
+        self.assertEqual(self.get_results()[0]['total'], 4 * 120 + 90)
+
+    def test_occupancy_csv(self):
+        """Test if CSV output has a row per subject and weekday."""
+        response = self.client.get(self.url, dict(self.params, format='csv', bin=120))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = list(csv.reader(StringIO(response.content.decode())))
+        self.assertEqual(rows[0][:4], ['uuid', 'name', 'weekday', '00:00'])
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[1][:3], [str(self.test_data.instructor.uuid), 'Jill Doe', 'MO'])
+        self.assertEqual(rows[1][3 + 4:3 + 6], ['60', str(4 * 60 + 30)])
+
+    def test_occupancy_permissions(self):
+        """Test if occupancy requires the permission to view event details."""
+        self.client.logout()
+        user = self.test_data.user2
+        self.client.post(self.test_data.login_url, {'email': user.email, 'password': 'test'})
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(Permission.objects.get(codename='view_periodiceventdetails'))
+        self.assertEqual(len(self.get_results()), 1)
+
+    def test_invalid_occupancy_query(self):
+        """Test if queries without a subject type, with unknown subjects or invalid bins are rejected."""
+        for params in ({'by': ''}, {'subjects': uuid4()}, {'bin': 7}, {'to': '2021-08-01'}):
+            response = self.client.get(self.url, dict(self.params, **params))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class CalendarFeedTests(APITestCase):
+    """Test module for iCalendar feeds."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10)
+        details.save()
+        assignment = self.test_data.assignment
+        assignment.date, assignment.start_time, assignment.end_time = make_aware(datetime(2021, 9, 8)), time(12), \
+            time(14)
+        assignment.description = 'Solve; then submit, please'
+        assignment.save()
+
+        self.token = FeedToken.rotate(self.test_data.user1)
+        self.url = reverse('user-calendar')
+
+    def get_feed(self, url=None, token=None, **headers):
+        return self.client.get(url or self.url, {'token': (token or self.token).key}, **headers)
+
+    def test_user_feed(self):
+        """Test if the feed of a user contains recurring events, single events and assignments."""
+        response = self.get_feed()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        lines = content.split('\r\n')
+
+        self.assertEqual(lines[0], 'BEGIN:VCALENDAR')
+        self.assertEqual(lines[-2:], ['END:VCALENDAR', ''])
+        self.assertEqual(content.count('BEGIN:VEVENT'), 3)
+        self.assertIn(f'UID:{self.test_data.periodic_event_details.uuid}@lms', lines)
+        self.assertIn('DTSTART:20210906T100000Z', lines)
+        self.assertIn('RRULE:FREQ=WEEKLY;INTERVAL=1;BYDAY=MO;UNTIL=20210927T100000Z', lines)
+        self.assertIn('DTSTART:20210906T090000Z', lines)
+        self.assertIn(r'DESCRIPTION:Solve\; then submit\, please', lines)
+        self.assertIn('ORGANIZER;CN="Jill Doe":mailto:jill.doe@test.com', lines)
+
+    def test_even_weeks_rule(self):
+        """Test if even weeks repeat every other week from the first even week of the term."""
+        details = self.test_data.periodic_event_details
+        details.repeat_type = PeriodicTimetableItem.RepeatType.Even
+        details.save()
+        lines = b''.join(self.get_feed().streaming_content).decode().split('\r\n')
+        self.assertIn('DTSTART:20210906T100000Z', lines)
+        self.assertIn('RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO;UNTIL=20210920T100000Z', lines)
+
+    @override_settings(TIME_ZONE='Europe/Kiev')
+    def test_daylight_saving_time(self):
+        """Test if occurrences keep their local time across daylight saving time changes."""
+        timetable = self.test_data.timetable
+        timetable.end_date = date(2021, 11, 10)
+        timetable.save()
+        # Unfold long lines.
+        lines = b''.join(self.get_feed().streaming_content).decode().replace('\r\n ', '').split('\r\n')
+        self.assertFalse(any(line.startswith(('RRULE:', 'DTSTART;TZID')) for line in lines))
+        self.assertIn('DTSTART:20210906T070000Z', lines)
+        rdate = next(line for line in lines if line.startswith('RDATE:'))
+        self.assertIn('20211025T070000Z,20211101T080000Z,20211108T080000Z', rdate)
+
+    def test_feed_validators(self):
+        """Test if feeds are cached by ETag until the underlying rows change."""
+        response = self.get_feed()
+        b''.join(response.streaming_content)
+        etag = response['ETag']
+
+        response = self.get_feed()
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['ETag'], etag)
+        response = self.get_feed(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.test_data.event.title = 'Renamed Event'
+        self.test_data.event.save()
+        response = self.get_feed(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'SUMMARY:Renamed Event', b''.join(response.streaming_content))
+
+    def test_feed_authentication(self):
+        """Test if feeds require a valid feed token rather than a session."""
+        response = self.client.get(self.url, {'token': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.test_data.login_as_superuser(self.client)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_timetable_feed(self):
+        """Test if timetable feeds require permissions to view timetables."""
+        url = reverse('timetable-calendar', kwargs={'uuid': self.test_data.timetable.uuid})
+        response = self.get_feed(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.get_feed(url, FeedToken.rotate(self.test_data.superuser))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content).count(b'BEGIN:VEVENT'), 3)
+
+    def test_feed_token(self):
+        """Test if users can see and rotate their feed token."""
+        self.test_data.login_as_superuser(self.client)
+        response = self.client.get(reverse('feed-token'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        key = response.data['key']
+        self.assertTrue(response.data['calendar'].endswith(f'{self.url}?token={key}'))
+        self.assertEqual(self.client.get(reverse('feed-token')).data['key'], key)
+
+        response = self.client.post(reverse('feed-token'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response.data['key'], key)
+
+    def test_fold(self):
+        """Test if long lines are folded without splitting characters."""
+        line = 'DESCRIPTION:' + 'ї' * 50
+        folded = fold(line).split('\r\n ')
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded))
+        self.assertEqual(''.join(folded), line)
+
+
+class TimetableCloneTests(APITestCase):
+    """Test module for cloning timetables into a new term."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.periodic_event_details
+        details.start_time, details.end_time = time(10), time(11)
+        details.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10)
+        details.save()
+        assignment = self.test_data.assignment
+        assignment.date, assignment.start_time, assignment.end_time = make_aware(datetime(2021, 9, 8)), time(12), \
+            time(14)
+        assignment.save()
+
+    def test_clone_timetable(self):
+        """Test if a timetable is cloned with its events, details, assignments and students."""
+        url = reverse('timetable-clone', kwargs={'uuid': self.test_data.timetable.uuid})
+        response = self.client.post(url, {'start_date': '2022-02-02', 'code': 'TT2022'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['code'], 'TT2022')
+        self.assertEqual(response.data['title'], 'Test Timetable')
+
+        clone = Timetable.objects.get(code='TT2022')
+        self.assertEqual((clone.start_date, clone.end_date), (date(2022, 2, 2), date(2022, 3, 3)))
+        event = clone.events.get()
+        self.assertEqual(event.title, 'Test Event')
+        periodic = event.periodic_event_details.get()
+        self.assertEqual((periodic.weekday, periodic.start_time), (PeriodicTimetableItem.WeekDay.Monday, time(10)))
+        self.assertEqual(list(periodic.students.all()), [self.test_data.student])
+        non_periodic = event.non_periodic_event_details.get()
+        self.assertEqual(non_periodic.date, make_aware(datetime(2022, 2, 7)))
+        self.assertEqual(list(non_periodic.students.all()), [self.test_data.student])
+        assignment = clone.assignments.get()
+        self.assertEqual(assignment.date, make_aware(datetime(2022, 2, 9)))
+        self.assertEqual(assignment.instructor, self.test_data.instructor)
+        self.assertEqual(list(assignment.students.all()), [self.test_data.student])
+        self.assertFalse(assignment.solutions.exists())
+
+        self.assertEqual(self.test_data.timetable.events.count(), 1)
+        self.assertTrue(AgendaEntry.objects.filter(
+            user=self.test_data.user1, assignment=assignment, start=make_aware(datetime(2022, 2, 9, 12)),
+        ).exists())
+        self.assertEqual(AgendaEntry.objects.filter(user=self.test_data.user2, event=event).count(), 5)
+
+    def test_clone_timetable_generates_code(self):
+        """Test if codes of clones are numbered after the original code."""
+        url = reverse('timetable-clone', kwargs={'uuid': self.test_data.timetable.uuid})
+        codes = [
+            self.client.post(url, {'start_date': '2022-02-02'}, format='json').data['code'] for _ in range(2)
+        ]
+        self.assertEqual(codes, ['TT4316-2', 'TT4316-3'])
+
+    def test_clone_timetable_invalid(self):
+        """Test if clones with taken codes or without a start date are rejected."""
+        url = reverse('timetable-clone', kwargs={'uuid': self.test_data.timetable.uuid})
+        response = self.client.post(url, {'start_date': '2022-02-02', 'code': 'TT4316'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('code', response.data)
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Timetable.objects.count(), 1)
+
+    def test_clone_course_timetables(self):
+        """Test if timetables of a course are cloned keeping their relative positions."""
+        Timetable.objects.create(
+            code='TT4317', course=self.test_data.course, start_date=date(2021, 10, 1), end_date=date(2021, 10, 31),
+        )
+        url = reverse('course-clone-timetables', kwargs={'uuid': self.test_data.course.uuid})
+        response = self.client.post(url, {'start_date': '2022-09-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([(timetable['code'], timetable['start_date']) for timetable in response.data], [
+            ('TT4316-2', '2022-09-01'), ('TT4317-2', '2022-10-01'),
+        ])
+        self.assertEqual(self.test_data.course.timetables.count(), 4)
+
+    def test_clone_permissions(self):
+        """Test if clones require permissions to add timetables, events and assignments."""
+        self.client.logout()
+        user = self.test_data.user2
+        user.user_permissions.add(*Permission.objects.filter(codename__in=('view_course', 'add_course')))
+        self.client.post(self.test_data.login_url, {'email': user.email, 'password': 'test'})
+        url = reverse('course-clone-timetables', kwargs={'uuid': self.test_data.course.uuid})
+        response = self.client.post(url, {'start_date': '2022-09-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(*Permission.objects.filter(codename__in=(
+            'view_timetable', 'add_timetable', 'add_event',
+        )))
+        response = self.client.post(url, {'start_date': '2022-09-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        url = reverse('timetable-clone', kwargs={'uuid': self.test_data.timetable.uuid})
+        response = self.client.post(url, {'start_date': '2022-09-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(Permission.objects.get(codename='add_assignment'))
+        response = self.client.post(url, {'start_date': '2022-09-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Timetable.objects.count(), 2)
+
+    def test_clone_command(self):
+        """Test if the management command clones timetables of a course."""
+        out = StringIO()
+        call_command('clone_timetables', course='TC4316', start_date=date(2022, 9, 1), stdout=out)
+        self.assertIn('TT4316-2', out.getvalue())
+        self.assertEqual(Assignment.objects.filter(timetable__code='TT4316-2').count(), 1)
+
+
+@override_settings(SOLVER_WORKERS=2, SOLVER_RESTARTS=2, SOLVER_ROUNDS=2, SOLVER_ITERATIONS=50)
+class SolverJobTests(APITestCase):
+    """Test module for timetable solver jobs."""
+
+    def setUp(self) -> None:
+        self.test_data = TestData()
+        self.test_data.login_as_superuser(self.client)
+        self.url = reverse('solver-job-list')
+
+        timetable = self.test_data.timetable
+        timetable.start_date, timetable.end_date = date(2021, 9, 1), date(2021, 9, 30)
+        timetable.save()
+        details = self.test_data.nonperiodic_event_details
+        details.date, details.start_time, details.end_time = make_aware(datetime(2021, 9, 6)), time(9), time(10)
+        details.save()
+        self.lecture = self.test_data.periodic_event_details
+        self.seminar = PeriodicEventDetails.objects.create(
+            event=self.test_data.event, start_time=time(15), end_time=time(16), instructor=self.test_data.instructor,
+        )
+        self.data = {
+            'timetable': reverse('timetable-detail', kwargs={'uuid': timetable.uuid}),
+            'parameters': {
+                'events': [
+                    {'details': str(self.lecture.uuid), 'duration': 90},
+                    {'details': str(self.seminar.uuid), 'duration': 60, 'biweekly': True},
+                ],
+                'blocked': [{'weekday': 'MO', 'start_time': '08:00', 'end_time': '09:00'}],
+                'weekdays': ['MO'],
+                'day_start': '08:00',
+                'day_end': '12:00',
+            },
+        }
+
+    def solve(self, data=None):
+        response = self.client.post(self.url, data or self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], SolverJob.Status.Pending)
+        job = SolverJob.objects.get(uuid=response.data['uuid'])
+        run_job(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_solve(self):
+        """Test if event details are placed without conflicts, blocked times and busy time of attendees."""
+        job = self.solve()
+        self.assertEqual((job.status, job.progress, job.conflicts), (SolverJob.Status.Finished, 1, 0))
+        lecture, seminar = job.solution
+        self.assertEqual((lecture['details'], lecture['repeat_type']), (str(self.lecture.uuid), 'W'))
+        # The non-periodic details occupy 09:00 to 10:00 of odd weeks.
+        self.assertGreaterEqual(lecture['start_time'], '10:00:00')
+        self.assertIn(seminar['repeat_type'], ('E', 'O'))
+        self.assertGreaterEqual(seminar['start_time'], '09:00:00')
+        self.assertLessEqual(seminar['end_time'], '12:00:00')
+        if seminar['repeat_type'] == 'O' or seminar['start_time'] >= '10:00:00':
+            self.assertTrue(
+                seminar['end_time'] <= lecture['start_time'] or seminar['start_time'] >= lecture['end_time']
+            )
+
+        response = self.client.get(reverse('solver-job-detail', kwargs={'uuid': job.uuid}))
+        self.assertEqual(response.data['solution'], job.solution)
+        self.assertEqual(response.data['parameters']['resolution'], 15)
+
+    def test_apply(self):
+        """Test if a solution is written to event details and their agendas."""
+        job = self.solve()
+        url = reverse('solver-job-apply', kwargs={'uuid': job.uuid})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data['applied_date'])
+
+        self.lecture.refresh_from_db()
+        placement = job.solution[0]
+        self.assertEqual(self.lecture.start_time.isoformat(), placement['start_time'])
+        self.assertEqual(self.lecture.end_time.isoformat(), placement['end_time'])
+        self.assertTrue(AgendaEntry.objects.filter(
+            user=self.test_data.user1, details=self.lecture.uuid,
+            start=make_aware(datetime.combine(date(2021, 9, 6), self.lecture.start_time)),
+        ).exists())
+
+    def test_apply_twice(self):
+        """Test if solutions are applied only once and only to details unchanged since jobs were created."""
+        job = self.solve()
+        url = reverse('solver-job-apply', kwargs={'uuid': job.uuid})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+
+        job = self.solve()
+        self.lecture.refresh_from_db()
+        self.lecture.start_time = time(8)
+        self.lecture.save()
+        response = self.client.post(reverse('solver-job-apply', kwargs={'uuid': job.uuid}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(SolverJob.objects.get(pk=job.pk).applied_date)
+
+    def test_apply_conflicts(self):
+        """Test if solutions overlapping agendas changed since jobs finished are not applied."""
+        job = self.solve()
+        placement = job.solution[0]
+        assignment = self.test_data.assignment
+        assignment.date = make_aware(datetime(2021, 9, 13))
+        assignment.start_time = time.fromisoformat(placement['start_time'])
+        assignment.end_time = time.fromisoformat(placement['end_time'])
+        assignment.save()
+
+        response = self.client.post(reverse('solver-job-apply', kwargs={'uuid': job.uuid}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(assignment.title, str(response.data))
+        self.assertIsNone(SolverJob.objects.get(pk=job.pk).applied_date)
+        self.assertEqual(PeriodicEventDetails.objects.get(pk=self.lecture.pk).updated_at, self.lecture.updated_at)
+
+    def test_apply_permissions(self):
+        """Test if applying solutions requires the permission to change event details."""
+        job = self.solve()
+        self.client.logout()
+        user = self.test_data.user2
+        user.user_permissions.add(*Permission.objects.filter(codename__in=('view_solverjob', 'add_solverjob')))
+        self.client.post(self.test_data.login_url, {'email': user.email, 'password': 'test'})
+        url = reverse('solver-job-apply', kwargs={'uuid': job.uuid})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(Permission.objects.get(codename='change_periodiceventdetails'))
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+
+    def test_restart(self):
+        """Test if failed and stale jobs are restarted and running ones are not."""
+        job = self.solve()
+        SolverJob.objects.filter(pk=job.pk).update(status=SolverJob.Status.Running)
+        url = reverse('solver-job-restart', kwargs={'uuid': job.uuid})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+
+        SolverJob.objects.filter(pk=job.pk).update(updated_date=make_aware(datetime(2021, 9, 1)))
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['status'], response.data['solution']), (SolverJob.Status.Pending, []))
+        job = SolverJob.objects.get(pk=job.pk)
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.conflicts), (SolverJob.Status.Finished, 0))
+
+    def test_no_free_time(self):
+        """Test if jobs fail when event details cannot be placed at all."""
+        self.data['parameters']['day_end'] = '09:30'
+        job = self.solve()
+        self.assertEqual(job.status, SolverJob.Status.Failed)
+        self.assertIn(str(self.lecture.uuid), job.error)
+        response = self.client.post(reverse('solver-job-apply', kwargs={'uuid': job.uuid}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_parameters(self):
+        """Test if unknown event details and empty day windows are rejected."""
+        self.data['parameters']['events'].append({'details': str(uuid4()), 'duration': 60})
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parameters', response.data)
+
+        self.data['parameters'].update(events=self.data['parameters']['events'][:1], day_end='08:00')
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(SolverJob.objects.exists())
@@ -1,85 +1,476 @@
-from django_auto_prefetching import AutoPrefetchViewSetMixin
-from rest_framework import viewsets
+import hashlib
+import re
+from datetime import time, timedelta
 
-from api.common.views import MultiSerializerMixin, UUIDLookupFieldMixin
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Exists, F, IntegerField, OuterRef, Q, Subquery, UUIDField, Value
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import generics, mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.response import Response
+
+from accounts.models import InstructorProfile, StudentGroup, StudentProfile
+from api.common.pagination import CursorOrLimitOffsetPagination
+from api.common.parsers import CSVParser, NDJSONParser
+from api.common.renderers import CSVRenderer
+from api.common.views import BulkModelMixin, CachedResponseMixin, CalendarFeedMixin, ConditionalRequestMixin, \
+    DateRangeMixin, MultiSerializerMixin, QuerysetPlanMixin, StreamingListMixin, UUIDLookupFieldMixin
 from api.education.filters import AssignmentFilter, CourseFilter, EventFilter, GradeFilter, SolutionFilter, \
     TimetableFilter
 from api.education.serializers import (
+    AgendaEntrySerializer,
     AssignmentSerializer,
+    ConflictSerializer,
     EventSerializer,
     CourseSerializer,
+    CourseTimetablesCloneSerializer,
+    DeadlineSerializer,
     EventTypeSerializer,
+    FreeSlotQuerySerializer,
+    FreeSlotSerializer,
     GradeSerializer,
+    GradeUploadSerializer,
+    OccupancyQuerySerializer,
+    OccupancySerializer,
+    OccurrenceSerializer,
     SolutionSerializer,
+    SolverJobSerializer,
+    TimetableCloneSerializer,
     TimetableSerializer,
 )
+from common.cache import generations
+from common.models import FileContentItem, ImageContentItem, TextContentItem, VideoContentItem
+from common.permissions import ApplyDjangoModelPermissions, CloneDjangoModelPermissions, \
+    CustomDjangoModelPermissions, UpsertDjangoModelPermissions
+from education.availability import find_free_slots
+from education.cloning import TimetableCloner
+from education.conflicts import iter_timetable_conflicts
+from education.grading import GradeUpload
+from education.ical import iter_timetable_calendar, iter_user_calendar
+from education.occupancy import compute_occupancy, get_bins
 from education.models import (
+    AgendaEntry,
     Assignment,
+    AssignmentContent,
     Course,
+    CourseContent,
     Event,
     Grade,
+    NonPeriodicEventDetails,
+    PeriodicEventDetails,
     Solution,
+    SolutionContent,
+    SolverJob,
     Timetable,
     EventType,
 )
+from education.occurrences import WEEKDAYS, combine, expand
+from education.solver_jobs import SolverError, apply_solution, is_stale, restart_job, start_job
+
+CONTENT_ITEM_MODELS = (TextContentItem, FileContentItem, ImageContentItem, VideoContentItem,)
+CALENDAR_DEPENDENCIES = (
+    Timetable, Event, EventType, PeriodicEventDetails, NonPeriodicEventDetails, Assignment, Course, StudentGroup,
+    StudentProfile, InstructorProfile, get_user_model(),
+)
+OCCUPANCY_DEPENDENCIES = (
+    Timetable, Event, PeriodicEventDetails, NonPeriodicEventDetails, Course, StudentGroup, InstructorProfile,
+    get_user_model(),
+)
 
 
-class CourseViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin, AutoPrefetchViewSetMixin):
+class CourseViewSet(QuerysetPlanMixin, ConditionalRequestMixin, CachedResponseMixin, StreamingListMixin,
+                    BulkModelMixin, viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = Course.objects.all()
     serializers = {
         'default': CourseSerializer,
+        'clone_timetables': CourseTimetablesCloneSerializer,
     }
+    cache_dependencies = (CourseContent, Timetable, InstructorProfile, StudentGroup,) + CONTENT_ITEM_MODELS
+    last_modified_field = 'updated_at'
     filterset_class = CourseFilter
+    cache_per_user = True
     search_fields = ('code', 'title',)
+    clone_models = (Timetable, Event, Assignment,)
+
+    @action(detail=True, methods=['post'], url_path='clone-timetables',
+            permission_classes=(CloneDjangoModelPermissions,))
+    def clone_timetables(self, request, uuid=None):
+        """Clone all timetables of the course with their events and assignments to a new term."""
+        course = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        clones = TimetableCloner(course.timetables.all(), serializer.validated_data['start_date']).clone()
+        return Response(
+            TimetableSerializer(clones, many=True, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
 
 
-class TimetableViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin, AutoPrefetchViewSetMixin):
+class TimetableViewSet(QuerysetPlanMixin, ConditionalRequestMixin, CachedResponseMixin, StreamingListMixin,
+                       BulkModelMixin, viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = Timetable.objects.all()
     serializers = {
         'default': TimetableSerializer,
+        'conflicts': ConflictSerializer,
+        'clone': TimetableCloneSerializer,
     }
+    cache_dependencies = (Course, Assignment, Event,)
+    last_modified_field = 'updated_at'
     filterset_class = TimetableFilter
+    cache_per_user = True
     search_fields = ('code', 'title',)
+    clone_models = (Event, Assignment,)
+
+    @action(detail=True, methods=['post'], permission_classes=(CloneDjangoModelPermissions,))
+    def clone(self, request, uuid=None):
+        """Clone the timetable with its events and assignments to a term starting at `start_date`."""
+        timetable = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        cloner = TimetableCloner(
+            [timetable], data['start_date'],
+            codes={timetable.pk: data['code']} if 'code' in data else None,
+            titles={timetable.pk: data['title']} if 'title' in data else None,
+        )
+        clone = cloner.clone()[0]
+        return Response(
+            TimetableSerializer(clone, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED,
+        )
 
+    @action(detail=True)
+    def conflicts(self, request, uuid=None):
+        """Stream overlapping occurrences in agendas of instructors and students attending the timetable."""
+        return StreamingHttpResponse(
+            self.render_stream(iter_timetable_conflicts(self.get_object())), content_type='application/json',
+        )
 
-class AssignmentViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
+
+class AssignmentViewSet(QuerysetPlanMixin, ConditionalRequestMixin, StreamingListMixin, BulkModelMixin,
+                        viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = Assignment.objects.all()
     serializers = {
         'default': AssignmentSerializer,
+        'grades': GradeUploadSerializer,
     }
+    cache_dependencies = (
+        Timetable, InstructorProfile, StudentProfile, Solution, AssignmentContent,
+    ) + CONTENT_ITEM_MODELS
     filterset_class = AssignmentFilter
+    cache_per_user = True
     search_fields = ('title',)
+    upsert_model = Grade
+
+    @action(detail=True, methods=['post'], parser_classes=(JSONParser, CSVParser, NDJSONParser),
+            permission_classes=(UpsertDjangoModelPermissions,))
+    def grades(self, request, uuid=None):
+        """
+        Insert or update grades of solutions of the assignment given by
+        solution UUID or student email from a JSON list, CSV or NDJSON, see
+        `education.grading`. Rejected rows are reported without aborting the
+        upload.
+        """
+        assignment = self.get_object()
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of grades.']})
+        instructor = InstructorProfile.objects.filter(user=request.user).first()
+        result = GradeUpload(assignment, instructor).run(request.data)
+        accepted = result['created'] + result['updated'] + result['unchanged']
+        response_status = status.HTTP_400_BAD_REQUEST if result['rejected'] and not accepted else status.HTTP_200_OK
+        return Response(self.get_serializer(result).data, status=response_status)
 
 
-class SolutionViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
+class SolutionViewSet(QuerysetPlanMixin, ConditionalRequestMixin, StreamingListMixin, BulkModelMixin,
+                      viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = Solution.objects.all()
     serializers = {
         'default': SolutionSerializer,
     }
+    cache_dependencies = (Assignment, StudentProfile, Grade, SolutionContent,) + CONTENT_ITEM_MODELS
+    pagination_class = CursorOrLimitOffsetPagination
     filterset_class = SolutionFilter
+    cache_per_user = True
 
 
-class GradeViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
+class GradeViewSet(QuerysetPlanMixin, ConditionalRequestMixin, StreamingListMixin, BulkModelMixin,
+                   viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = Grade.objects.all()
     serializers = {
         'default': GradeSerializer,
     }
+    cache_dependencies = (Solution, InstructorProfile,)
+    pagination_class = CursorOrLimitOffsetPagination
     filterset_class = GradeFilter
+    cache_per_user = True
 
 
-class EventViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin, AutoPrefetchViewSetMixin):
+class EventViewSet(QuerysetPlanMixin, ConditionalRequestMixin, CachedResponseMixin, StreamingListMixin,
+                   DateRangeMixin, BulkModelMixin, viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = Event.objects.all()
     serializers = {
         'default': EventSerializer,
+        'occurrences': OccurrenceSerializer,
     }
+    cache_dependencies = (
+        EventType, Timetable, PeriodicEventDetails, NonPeriodicEventDetails, InstructorProfile, StudentProfile,
+    )
+    last_modified_field = 'updated_at'
     filterset_class = EventFilter
+    cache_per_user = True
     search_fields = ('title',)
 
+    @action(detail=False)
+    def occurrences(self, request):
+        """Stream dated occurrences of the filtered events between `from` and `to` dates sorted by start."""
+        date_from, date_to = self.get_date_range()
+        events = self.filter_queryset(self.get_queryset()).values('pk')
+        return StreamingHttpResponse(
+            self.render_stream(expand(events, date_from, date_to)), content_type='application/json',
+        )
+
 
-class EventTypeViewSet(viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin, AutoPrefetchViewSetMixin):
+class EventTypeViewSet(QuerysetPlanMixin, ConditionalRequestMixin, CachedResponseMixin, StreamingListMixin,
+                       BulkModelMixin, viewsets.ModelViewSet, MultiSerializerMixin, UUIDLookupFieldMixin):
     queryset = EventType.objects.all()
     serializers = {
         'default': EventTypeSerializer,
     }
     filterset_fields = ('title',)
     search_fields = ('title',)
+
+
+class SolverJobViewSet(QuerysetPlanMixin, UUIDLookupFieldMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet,
+                      mixins.CreateModelMixin):
+    queryset = SolverJob.objects.all()
+    serializer_class = SolverJobSerializer
+    filterset_fields = ('status', 'created_date', 'created_by',)
+    upsert_model = PeriodicEventDetails
+
+    def perform_create(self, serializer):
+        start_job(serializer.save(created_by=self.request.user))
+
+    @action(detail=True, methods=['post'],
+            permission_classes=(CustomDjangoModelPermissions, ApplyDjangoModelPermissions))
+    def apply(self, request, uuid=None):
+        """
+        Write the best solution of a finished job to its periodic event details
+        unless the job is applied, the details changed since it was created or
+        the solution conflicts with current agendas.
+        """
+        job = self.get_object()
+        with transaction.atomic():
+            # Concurrent requests apply the solution of a job one at a time.
+            job = SolverJob.objects.select_for_update().get(pk=job.pk)
+            if job.status != SolverJob.Status.Finished or job.conflicts:
+                raise ValidationError('Only solutions of finished jobs without conflicts can be applied.')
+            if job.applied_date is not None:
+                raise ValidationError('The solution of the job is already applied.')
+            changed = PeriodicEventDetails.objects.filter(
+                event__timetable=job.timetable_id, uuid__in=[placement['details'] for placement in job.solution],
+                updated_at__gt=job.created_date,
+            )
+            if changed.exists():
+                raise ValidationError('Event details of the job changed since it was created.')
+            try:
+                apply_solution(job)
+            except SolverError as error:
+                raise ValidationError(str(error))
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=['post'])
+    def restart(self, request, uuid=None):
+        """Run a failed job, or a stale one lost by a stopped worker, again."""
+        job = self.get_object()
+        if job.status != SolverJob.Status.Failed and not is_stale(job):
+            raise ValidationError('Only failed or stale jobs can be restarted.')
+        restart_job(job)
+        return Response(self.get_serializer(job).data)
+
+
+class AgendaView(DateRangeMixin, generics.ListAPIView):
+    """List agenda entries of the current user starting between `from` and `to` dates sorted by start."""
+    serializer_class = AgendaEntrySerializer
+    permission_classes = (IsAuthenticated,)
+    filter_backends = ()
+
+    def get_queryset(self):
+        date_from, date_to = self.get_date_range()
+        return AgendaEntry.objects.filter(
+            user=self.request.user,
+            start__gte=combine(date_from, time.min),
+            start__lt=combine(date_to + timedelta(days=1), time.min),
+        ).order_by('start', 'pk').values(
+            'kind', 'title', 'start', 'end', 'details',
+            event_uuid=F('event__uuid'), assignment_uuid=F('assignment__uuid'),
+        )
+
+
+class DeadlinesView(generics.ListAPIView):
+    """
+    List assignments of the current user due within a period from now, e.g.
+    `within=12h`, `within=7d` or `within=2w`, sorted by deadline.
+
+    Assignments are due at their end time. Students get assignments they
+    were added to and assignments of courses of their groups, with their
+    submission status annotated in the same query, instructors get
+    assignments they instruct.
+    """
+    serializer_class = DeadlineSerializer
+    permission_classes = (IsAuthenticated,)
+    filter_backends = ()
+    within_pattern = re.compile(r'^(\d+)([hdw])$')
+    within_units = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+    within_default = '7d'
+    within_max = timedelta(days=366)
+
+    def get_within(self):
+        match = self.within_pattern.match(self.request.query_params.get('within', self.within_default))
+        if match is None:
+            raise ValidationError({'within': ['Enter a number of hours, days or weeks, e.g. `7d`.']})
+        within = timedelta(**{self.within_units[match.group(2)]: int(match.group(1))})
+        if within > self.within_max:
+            raise ValidationError({'within': [f'Ensure the period does not exceed {self.within_max.days} days.']})
+        return within
+
+    def get_queryset(self):
+        now = timezone.localtime()
+        limit = now + self.get_within()
+        user = self.request.user
+        student = StudentProfile.objects.filter(user=user).first()
+
+        # Deadlines are local dates at end times, so the range is selected by
+        # the date and end time of the deadline index.
+        queryset = Assignment.objects.filter(
+            date__gte=combine(now.date(), time.min), date__lt=combine(limit.date() + timedelta(days=1), time.min),
+        ).exclude(
+            date__lt=combine(now.date() + timedelta(days=1), time.min), end_time__lt=now.time(),
+        ).exclude(
+            date__gte=combine(limit.date(), time.min), end_time__gt=limit.time(),
+        )
+
+        audience = Q(instructor__user=user)
+        status = {
+            'submitted': Value(None, output_field=BooleanField()), 'graded': Value(None, output_field=BooleanField()),
+            'solution_uuid': Value(None, output_field=UUIDField()),
+            'grade_value': Value(None, output_field=IntegerField()),
+        }
+        if student is not None:
+            audience |= Q(pk__in=Assignment.students.through.objects.filter(studentprofile=student).values(
+                'assignment')) | Q(timetable__course__in=Course.objects.filter(student_groups__students=student))
+            solutions = Solution.objects.filter(assignment=OuterRef('pk'), student=student)
+            grades = Grade.objects.filter(solution__assignment=OuterRef('pk'), solution__student=student)
+            status = {
+                'submitted': Exists(solutions), 'graded': Exists(grades),
+                'solution_uuid': Subquery(solutions.order_by('-created_at').values('uuid')[:1]),
+                'grade_value': Subquery(grades.order_by('-created_at').values('value')[:1]),
+            }
+
+        return queryset.filter(audience).order_by('date', 'end_time', 'pk').values(
+            'uuid', 'title', 'date', 'end_time', timetable_uuid=F('timetable__uuid'), **status,
+        )
+
+
+class FreeSlotsView(DateRangeMixin, generics.GenericAPIView):
+    """
+    List periods between `from` and `to` dates of at least `duration` minutes
+    when all selected instructors and students of selected student groups
+    are free. The search requires the permission to view periodic event
+    details.
+    """
+    queryset = PeriodicEventDetails.objects.none()
+    serializer_class = FreeSlotSerializer
+    filter_backends = ()
+    pagination_class = None
+
+    def get(self, request):
+        date_from, date_to = self.get_date_range()
+        query = FreeSlotQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        slots = find_free_slots(
+            params.get('instructors', []) + params.get('student_groups', []),
+            date_from, date_to, params['duration'], params['resolution'],
+            params.get('day_start'), params.get('day_end'),
+        )
+        serializer = self.get_serializer([{'start': start, 'end': end} for start, end in slots], many=True)
+        return Response(serializer.data)
+
+
+class OccupancyView(DateRangeMixin, generics.GenericAPIView):
+    """
+    Occupied minutes by weekday and time bin of instructors, student groups or
+    courses between `from` and `to` dates, as JSON or as CSV with a row per
+    subject and weekday.
+
+    Matrices are cached under the generations of models of events, so they
+    are computed again after any change of event details. Occupancy requires
+    the permission to view periodic event details.
+    """
+    queryset = PeriodicEventDetails.objects.none()
+    serializer_class = OccupancySerializer
+    renderer_classes = (JSONRenderer, BrowsableAPIRenderer, CSVRenderer)
+    filter_backends = ()
+    pagination_class = None
+    cache_key_prefix = 'occupancy'
+
+    def get(self, request):
+        date_from, date_to = self.get_date_range()
+        query = OccupancyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        results = self.get_results(date_from, date_to, params['by'], params['bin'], params.get('subjects'))
+
+        bins = get_bins(params['bin'])
+        if request.accepted_renderer.format == 'csv':
+            rows = [('uuid', 'name', 'weekday', *bins)]
+            for result in results:
+                rows.extend((result['uuid'], result['name'], weekday, *row)
+                            for weekday, row in zip(WEEKDAYS, result['matrix']))
+            return Response(rows, content_type='text/csv; charset=utf-8')
+        return Response({
+            'by': params['by'], 'from': date_from, 'to': date_to, 'bin': params['bin'],
+            'weekdays': list(WEEKDAYS), 'bins': bins,
+            'results': self.get_serializer(results, many=True).data,
+        })
+
+    def get_results(self, date_from, date_to, by, bin_size, subjects):
+        generation = ','.join(map(str, generations.get(OCCUPANCY_DEPENDENCIES)))
+        signature = f'{by}|{date_from}|{date_to}|{bin_size}|{",".join(map(str, subjects or ()))}|{generation}'
+        key = f'{self.cache_key_prefix}:{hashlib.md5(signature.encode()).hexdigest()}'
+        results = cache.get(key)
+        if results is None:
+            results = compute_occupancy(by, date_from, date_to, bin_size, subjects)
+            cache.set(key, results, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return results
+
+
+class TimetableCalendarView(CalendarFeedMixin, generics.GenericAPIView):
+    """iCalendar feed of all events and assignments of a timetable, authenticated with a feed token."""
+    queryset = Timetable.objects.all()
+    lookup_field = 'uuid'
+    filter_backends = ()
+    feed_dependencies = CALENDAR_DEPENDENCIES
+    schema = None
+
+    def get(self, request, uuid):
+        timetable = self.get_object()
+        return self.feed_response(f'timetable:{timetable.pk}', lambda: iter_timetable_calendar(timetable))
+
+
+class UserCalendarView(CalendarFeedMixin, generics.GenericAPIView):
+    """iCalendar feed of the agenda of the current user, authenticated with a feed token."""
+    permission_classes = (IsAuthenticated,)
+    feed_dependencies = CALENDAR_DEPENDENCIES
+    schema = None
+
+    def get(self, request):
+        return self.feed_response(f'user:{request.user.pk}', lambda: iter_user_calendar(request.user))
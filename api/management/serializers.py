@@ -1,9 +1,8 @@
 from django.contrib.auth import get_user_model
 from generic_relations.relations import GenericRelatedField
-from rest_framework import serializers
 
 from accounts.models import StudentGroup
-from api.common.serializers import UUIDHyperlinkedRelatedField
+from api.common.serializers import HyperlinkedModelSerializer, UUIDHyperlinkedRelatedField
 from education.models import (
     Course,
     Event,
@@ -13,7 +12,7 @@ from education.models import (
 from management.models import Request, Response
 
 
-class RequestSerializer(serializers.HyperlinkedModelSerializer):
+class RequestSerializer(HyperlinkedModelSerializer):
     created_by = UUIDHyperlinkedRelatedField(
         view_name='user-detail',
         queryset=get_user_model().objects.all(),
@@ -54,7 +53,7 @@ class RequestSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
-class ResponseSerializer(serializers.HyperlinkedModelSerializer):
+class ResponseSerializer(HyperlinkedModelSerializer):
     created_by = UUIDHyperlinkedRelatedField(
         view_name='user-detail',
         queryset=get_user_model().objects.all(),
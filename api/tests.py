@@ -1,7 +1,30 @@
+import json
+import os
+from pathlib import Path
+from unittest.mock import patch
+from uuid import uuid4
+
 from django.contrib.auth import get_user_model
-from rest_framework import status
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers, status
+from rest_framework.request import Request
 from rest_framework.reverse import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from accounts.models import StudentGroup
+from api.common.endpoints import get_endpoints
+from api.common.serializers import HyperlinkedIdentityField, HyperlinkedRelatedField, UUIDHyperlinkedRelatedField
+from api.urls_v1 import router
+from common import bulk
+from common.metrics import metrics
+from education.models import Course, EventType
+from education.synthetic import InstitutionGenerator
+from management.models import Request as PermissionRequest, Response as PermissionResponse
 
 User = get_user_model()
 
@@ -55,3 +78,204 @@ class UserAuthTests(APITestCase):
 
         response = self.client.post(self.logout_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PrecompiledUrlTests(APITestCase):
+    """Test module for hyperlinks built from precompiled URL templates."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.course = Course.objects.create(code='TC4316', title='Test Course')
+        self.event_type = EventType.objects.create(title='Test Event Type')
+        self.group = Group.objects.create(name='Test Group')
+
+    def get_request(self, path='/api/v1/', **extra):
+        return Request(self.factory.get(path, **extra))
+
+    def assert_same_url(self, field, obj, view_name, lookup_value, request, format=None):
+        field.bind('url', serializers.Serializer(context={'request': request, 'format': format}))
+        expected = reverse(view_name, kwargs={
+            field.lookup_url_kwarg: lookup_value,
+            **({'format': format} if format else {}),
+        }, request=request)
+        self.assertEqual(str(field.to_representation(obj)), expected)
+
+    def test_uuid_urls_match_reverse(self):
+        """Test if UUID hyperlinks are identical to reversed URLs."""
+        request = self.get_request()
+        for view_name, obj in (('course-detail', self.course), ('event-type-detail', self.event_type)):
+            field = UUIDHyperlinkedRelatedField(view_name=view_name, read_only=True)
+            self.assert_same_url(field, obj, view_name, obj.uuid, request)
+
+    def test_identity_and_pk_urls_match_reverse(self):
+        """Test if identity and primary key hyperlinks are identical to reversed URLs."""
+        request = self.get_request()
+        identity_field = HyperlinkedIdentityField(view_name='course-detail', lookup_field='uuid')
+        self.assert_same_url(identity_field, self.course, 'course-detail', self.course.uuid, request)
+        pk_field = HyperlinkedRelatedField(view_name='group-detail', read_only=True)
+        self.assert_same_url(pk_field, self.group, 'group-detail', self.group.pk, request)
+
+    def test_urls_match_reverse_with_format(self):
+        """Test if hyperlinks keep format suffixes and format query parameters."""
+        field = UUIDHyperlinkedRelatedField(view_name='course-detail', read_only=True)
+        self.assert_same_url(field, self.course, 'course-detail', self.course.uuid, self.get_request(), 'json')
+
+        field = UUIDHyperlinkedRelatedField(view_name='course-detail', read_only=True)
+        request = self.get_request(data={'format': 'json'})
+        self.assert_same_url(field, self.course, 'course-detail', self.course.uuid, request)
+
+    def test_urls_match_reverse_for_other_hosts(self):
+        """Test if hyperlinks use the host of each request."""
+        for host in ('testserver', 'example.com'):
+            field = UUIDHyperlinkedRelatedField(view_name='course-detail', read_only=True)
+            request = self.get_request(HTTP_HOST=host)
+            self.assert_same_url(field, self.course, 'course-detail', self.course.uuid, request)
+
+
+@override_settings(METRICS_TOKEN='metrics-token', METRICS_SAMPLE_RATE=1.0)
+class MetricsTests(APITestCase):
+    """Test module for request metrics."""
+
+    def setUp(self):
+        metrics.clear()
+        self.superuser = User.objects.create_superuser(full_name='John Doe', email='superuser@test.com', password='test')
+        self.metrics_url = reverse('metrics')
+
+    def get_metrics(self):
+        response = self.client.get(self.metrics_url, HTTP_AUTHORIZATION='Bearer metrics-token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_metrics_require_token_or_superuser(self):
+        """Test if metrics are only served to the metrics token and superusers."""
+        response = self.client.get(self.metrics_url)
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        response = self.client.get(self.metrics_url, HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        self.client.force_authenticate(self.superuser)
+        response = self.client.get(self.metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_request_metrics(self):
+        """Test if requests are recorded per viewset action."""
+        self.client.force_authenticate(self.superuser)
+        self.client.get(reverse('course-list'))
+        self.client.get(reverse('course-detail', kwargs={'uuid': uuid4()}))
+        self.client.force_authenticate(None)
+
+        content = self.get_metrics()
+        labels = 'view="CourseViewSet",action="list"'
+        self.assertIn(f'lms_http_requests_total{{{labels},status="200"}} 1', content)
+        self.assertIn(f'lms_http_request_duration_seconds_count{{{labels}}} 1', content)
+        self.assertIn(f'lms_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', content)
+        self.assertIn(f'lms_db_queries_per_request_count{{{labels}}} 1', content)
+        self.assertIn(f'lms_http_response_size_bytes_count{{{labels}}} 1', content)
+        self.assertIn('lms_http_requests_total{view="CourseViewSet",action="retrieve",status="404"} 1', content)
+        self.assertIn('# TYPE lms_db_query_duration_seconds_total counter', content)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sample_rate(self):
+        """Test if requests are not recorded outside of the sample."""
+        self.client.force_authenticate(self.superuser)
+        self.client.get(reverse('course-list'))
+        self.assertNotIn('CourseViewSet', metrics.render())
+
+    @override_settings(METRICS_SAMPLE_RATE=0.25)
+    def test_sampled_counts_are_scaled(self):
+        """Test if counts of sampled requests are scaled by the inverse of the sample rate."""
+        self.client.force_authenticate(self.superuser)
+        with patch('common.middleware.random.random', return_value=0):
+            self.client.get(reverse('course-list'))
+        content = metrics.render()
+        labels = 'view="CourseViewSet",action="list"'
+        self.assertIn(f'lms_http_requests_total{{{labels},status="200"}} 4', content)
+        self.assertIn(f'lms_http_request_duration_seconds_count{{{labels}}} 4', content)
+
+    def test_stale_snapshots_are_folded(self):
+        """Test if snapshots of idle workers are folded into the total once and counters do not decrease."""
+        self.client.force_authenticate(self.superuser)
+        self.client.get(reverse('course-list'))
+        sample = 'lms_http_requests_total{view="CourseViewSet",action="list",status="200"}'
+        self.assertIn(f'{sample} 1', metrics.render())
+        slot = metrics.slot
+
+        key = metrics.make_key(slot)
+        snapshot = cache.get(key)
+        snapshot['published'] -= metrics.snapshot_timeout + 1
+        cache.set(key, snapshot)
+        metrics.fold()
+        self.assertIsNone(cache.get(key))
+        self.assertGreater(cache.get(metrics.first_slot_key), slot)
+        self.assertIn(f'{sample} 1', metrics.render())
+        self.client.get(reverse('course-list'))
+        self.assertIn(f'{sample} 2', metrics.render())
+        self.assertNotEqual(metrics.slot, slot)
+        self.assertIn(f'{sample} 2', metrics.render())
+
+
+class SmallInstitutionGenerator(InstitutionGenerator):
+    instructors = 4
+    student_groups = 3
+    students_per_group = 5
+    courses = 3
+    events_per_timetable = 3
+    assignments_per_timetable = 2
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Test module for query counts of every v1 endpoint.
+
+    Budgets are stored in `query_budgets.json`, run the tests with the
+    `UPDATE_QUERY_BUDGETS` environment variable set to rewrite them.
+    """
+    budgets_path = Path(__file__).resolve().parent / 'query_budgets.json'
+
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(full_name='John Doe', email='superuser@test.com', password='test')
+        self.client.force_authenticate(self.superuser)
+
+    def seed_permission_requests(self, scale, requests_per_scale=5):
+        """Create requests of users for courses and student groups, every other one with a response."""
+        objects = [*Course.objects.order_by('pk'), *StudentGroup.objects.order_by('pk')]
+        users = User.objects.filter(is_superuser=False, request__isnull=True).order_by('pk')
+        requests = bulk.bulk_create(PermissionRequest, [
+            PermissionRequest(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk, created_by=user)
+            for user, obj in zip(users[:scale * requests_per_scale], reversed(objects))
+        ])
+        PermissionResponse.objects.bulk_create(
+            PermissionResponse(related_request=request, status=PermissionResponse.RequestStatus.Approved,
+                               created_by=self.superuser)
+            for request in requests[::2]
+        )
+
+    def count_queries(self):
+        counts = {}
+        for name, method, url, data in get_endpoints(router):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK, f'{method.upper()} {url}')
+            counts[f'{method.upper()} {name}'] = len(queries)
+        return counts
+
+    def test_query_counts_do_not_grow(self):
+        """Test if query counts of every endpoint stay within budget and do not grow with the data size."""
+        SmallInstitutionGenerator(scale=1, seed=1).generate()
+        self.seed_permission_requests(1)
+        counts = self.count_queries()
+        SmallInstitutionGenerator(scale=9, seed=2).generate()
+        self.seed_permission_requests(9)
+        scaled_counts = self.count_queries()
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            self.budgets_path.write_text(json.dumps(scaled_counts, indent=2, sort_keys=True) + '\n')
+        budgets = json.loads(self.budgets_path.read_text())
+
+        for endpoint, count in scaled_counts.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(count, counts[endpoint], 'query count grows with the data size')
+                self.assertIn(endpoint, budgets, 'query budget is missing')
+                self.assertLessEqual(count, budgets[endpoint], 'query budget is exceeded')
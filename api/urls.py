@@ -11,13 +11,31 @@ from rest_framework_simplejwt.views import (
 )
 
 from api.urls_v1 import router as api_v1
-from api.views import ApiRootView
+from api.accounts.views import FeedTokenView
+from api.education.views import (
+    AgendaView,
+    DeadlinesView,
+    FreeSlotsView,
+    OccupancyView,
+    TimetableCalendarView,
+    UserCalendarView,
+)
+from api.views import ApiRootView, MetricsView
 
 urlpatterns = [
     path('', ApiRootView.as_view(), name='api_root'),
 
+    path('v1/me/agenda/', AgendaView.as_view(), name='agenda'),
+    path('v1/me/deadlines/', DeadlinesView.as_view(), name='deadlines'),
+    path('v1/me/calendar/', UserCalendarView.as_view(), name='user-calendar'),
+    path('v1/me/feed-token/', FeedTokenView.as_view(), name='feed-token'),
+    path('v1/free-slots/', FreeSlotsView.as_view(), name='free-slots'),
+    path('v1/occupancy/', OccupancyView.as_view(), name='occupancy'),
+    path('v1/timetables/<uuid:uuid>/calendar/', TimetableCalendarView.as_view(), name='timetable-calendar'),
     path('v1/', include(api_v1.urls)),
 
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+
     path('auth/', include([
         path('', include('dj_rest_auth.urls'), name='dj_rest_auth'),
         path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
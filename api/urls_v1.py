@@ -1,5 +1,3 @@
-from rest_framework.routers import DefaultRouter
-
 from api.accounts.views import (
     UserViewSet,
     GroupViewSet,
@@ -8,6 +6,7 @@ from api.accounts.views import (
     InstructorProfileViewSet,
     StudentGroupViewSet,
 )
+from api.common.routers import BulkRouter
 from api.education.views import (
     AssignmentViewSet,
     CourseViewSet,
@@ -16,10 +15,11 @@ from api.education.views import (
     TimetableViewSet,
     EventTypeViewSet,
     EventViewSet,
+    SolverJobViewSet,
 )
 from api.management.views import RequestViewSet, ResponseViewSet
 
-router = DefaultRouter()
+router = BulkRouter()
 router.get_api_root_view().cls.__name__ = 'Api v1'
 router.get_api_root_view().cls.__doc__ = ''
 
@@ -39,6 +39,7 @@ router.register('grades', GradeViewSet, basename='grade')
 
 router.register('events', EventViewSet, basename='event')
 router.register('event-types', EventTypeViewSet, basename='event-type')
+router.register('solver-jobs', SolverJobViewSet, basename='solver-job')
 
 router.register('requests', RequestViewSet, basename='request')
 router.register('responses', ResponseViewSet, basename='response')
@@ -1,9 +1,14 @@
 from rest_framework import permissions
-
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
+from api.common.renderers import PrometheusRenderer
+from common.authentication import MetricsTokenAuthentication
+from common.metrics import metrics
+from common.permissions import MetricsPermission
+
 
 class ApiRootView(APIView):
     permission_classes = (permissions.AllowAny,)
@@ -11,6 +16,11 @@ class ApiRootView(APIView):
     def get(self, request):
         return Response({
             'api-v1': request.build_absolute_uri('/api/v1/'),
+            'agenda': reverse('agenda', request=request),
+            'deadlines': reverse('deadlines', request=request),
+            'free-slots': reverse('free-slots', request=request),
+            'occupancy': reverse('occupancy', request=request),
+            'feed-token': reverse('feed-token', request=request),
 
             'login': reverse('rest_login', request=request),
             'logout': reverse('rest_logout', request=request),
@@ -25,4 +35,17 @@ class ApiRootView(APIView):
             'api-schema': reverse('schema', request=request),
             'swagger': reverse('swagger', request=request),
             'redoc': reverse('redoc', request=request),
+
+            'metrics': reverse('metrics', request=request),
         })
+
+
+class MetricsView(APIView):
+    """Request metrics of all workers in the Prometheus text format."""
+    authentication_classes = (MetricsTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES)
+    permission_classes = (MetricsPermission,)
+    renderer_classes = (PrometheusRenderer,)
+    schema = None
+
+    def get(self, request):
+        return Response(metrics.render(), content_type=PrometheusRenderer.content_type)
@@ -0,0 +1,238 @@
+"""
+Benchmark of every v1 list, detail and write endpoint over a synthetic
+institution, see `education.synthetic.InstitutionGenerator`.
+
+Requests are sent in-process through the whole middleware stack as a
+superuser. Caches are cleared before every request unless `--warm` is
+given. Updates are empty partial updates, so they validate, save and
+render an object without changing it. Creates post the representation of
+the object of a detail route without optional nested objects, with
+prefixed values of unique fields and a placeholder for write-only
+fields, and the created objects are deleted again to measure deletes.
+Payloads of profiles and grades link users and solutions of their own,
+assignments are moved to days without other occurrences, see
+`relate_payloads`. The benchmark fails when any request is rejected. The
+report is printed as JSON.
+
+The benchmark runs against a temporary test database.
+
+Usage:
+    python -m benchmarks.api [--scale 1] [--repeat 20] [--warm]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils.timezone import make_aware  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment  # noqa: E402
+from rest_framework import serializers  # noqa: E402
+from rest_framework.reverse import reverse  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from rest_framework.validators import UniqueValidator  # noqa: E402
+
+from api.common.endpoints import get_endpoints  # noqa: E402
+from api.urls_v1 import router  # noqa: E402
+from common import bulk  # noqa: E402
+from education.models import Solution  # noqa: E402
+from education.synthetic import InstitutionGenerator  # noqa: E402
+
+
+PLACEHOLDER = 'benchmark'
+# Generated terms end long before, so assignments on these days conflict with nothing.
+FREE_DAY = datetime(2100, 1, 1)
+
+
+def request(client, method, url, data, warm):
+    if not warm:
+        cache.clear()
+    response = getattr(client, method)(url, data, format='json')
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method.upper()} {url} returned {response.status_code}: {response.content[:1000]}')
+    return response
+
+
+def measure(send, repeat):
+    """
+    Args:
+        send: function sending a request and returning its response, called `repeat` times and once more to
+            count queries and memory
+    """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = send()
+        durations.append(time.perf_counter() - started)
+
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            send()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'p50_ms': round(statistics.median(durations) * 1000, 2),
+        'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 2),
+        'queries': len(queries),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+        'response_bytes': len(response.content),
+    }
+
+
+def make_payloads(serializer, representation, count):
+    """
+    Returns: list of `count` create payloads built from the representation of an object
+    """
+    payloads = []
+    for number in range(count):
+        payload = dict(representation)
+        for name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer) and not field.required:
+                # Nested objects repeat schedules of the original object or carry generic relations.
+                payload.pop(name, None)
+            elif field.write_only and field.required and isinstance(field, serializers.CharField):
+                payload[name] = PLACEHOLDER
+            elif any(isinstance(validator, UniqueValidator) for validator in field.validators):
+                # Prefixes keep domains of emails and stay within the maximum length.
+                prefix, value = f'{number}-', str(payload[name])
+                max_length = getattr(field, 'max_length', None) or len(prefix) + len(value)
+                payload[name] = prefix + value[max(0, len(prefix) + len(value) - max_length):]
+        payloads.append(payload)
+    return payloads
+
+
+def get_uuid(url):
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def relate_payloads(basename, payloads):
+    """
+    Link payloads of routes with unique relations to objects of their own
+    and move assignments to free days, so their creates are valid.
+
+    Returns: list of created related objects
+    """
+    if basename in ('student', 'instructor'):
+        users = []
+        for number in range(len(payloads)):
+            user = get_user_model()(email=f'{basename}{number}@benchmark.com', full_name=PLACEHOLDER)
+            user.set_unusable_password()
+            users.append(user)
+        users = bulk.bulk_create(get_user_model(), users)
+        for payload, user in zip(payloads, users):
+            payload['user'] = reverse('user-detail', kwargs={'uuid': user.uuid})
+        return users
+    if basename == 'grade':
+        solution = Solution.objects.get(uuid=get_uuid(payloads[0]['solution']))
+        solutions = bulk.bulk_create(Solution, [
+            Solution(assignment_id=solution.assignment_id, student_id=solution.student_id) for _ in payloads
+        ])
+        for payload, solution in zip(payloads, solutions):
+            payload['solution'] = reverse('solution-detail', kwargs={'uuid': solution.uuid})
+        return solutions
+    if basename == 'assignment':
+        for number, payload in enumerate(payloads):
+            payload['date'] = make_aware(FREE_DAY + timedelta(days=number)).isoformat()
+    return []
+
+
+def measure_create_delete(client, basename, viewset, detail_url, repeat, warm):
+    """
+    Create objects like the object of a detail route and delete them again.
+
+    Returns: list of results of the create and the delete route
+    """
+    list_url = reverse(f'{basename}-list')
+    view = viewset(action='create', request=None, format_kwarg=None)
+    payloads = make_payloads(view.get_serializer(), client.get(detail_url, format='json').json(), repeat + 1)
+    related = relate_payloads(basename, payloads)
+
+    created = []
+
+    def create():
+        response = request(client, 'post', list_url, payloads[len(created)], warm)
+        created.append(response.data['url'])
+        return response
+
+    def delete():
+        return request(client, 'delete', created.pop(), None, warm)
+
+    results = [
+        {'endpoint': f'{basename}-list', 'method': 'POST', **measure(create, repeat)},
+        {'endpoint': f'{basename}-detail', 'method': 'DELETE', **measure(delete, repeat)},
+    ]
+    if related:
+        type(related[0]).objects.filter(pk__in=[obj.pk for obj in related]).delete()
+    return results
+
+
+def run(scale, repeat, warm):
+    started = time.perf_counter()
+    counts = InstitutionGenerator(scale=scale, seed=scale).generate()
+    generated_in = time.perf_counter() - started
+
+    superuser = get_user_model().objects.create_superuser(
+        full_name='Benchmark', email='benchmark@example.com', password='benchmark',
+    )
+    client = APIClient()
+    client.force_authenticate(superuser)
+
+    viewsets = {basename: viewset for _, viewset, basename in router.registry}
+    results = []
+    for name, method, url, data in get_endpoints(router):
+        results.append({
+            'endpoint': name,
+            'method': method.upper(),
+            **measure(lambda: request(client, method, url, data, warm), repeat),
+        })
+        basename = name[:-len('-detail')]
+        viewset = viewsets.get(basename)
+        if method == 'get' and name.endswith('-detail') and hasattr(viewset, 'create') \
+                and hasattr(viewset, 'destroy'):
+            results.extend(measure_create_delete(client, basename, viewset, url, repeat, warm))
+
+    return {
+        'scale': scale,
+        'repeat': repeat,
+        'warm': warm,
+        'rows': sum(counts.values()),
+        'generated_in_s': round(generated_in, 2),
+        'endpoints': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warm', action='store_true', help='Keep caches between requests.')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        report = run(args.scale, args.repeat, args.warm)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark of limit/offset and cursor pagination over seeded solutions.
+
+The benchmark runs against a temporary test database.
+
+Usage:
+    python -m benchmarks.pagination [solutions] [page_size]
+"""
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+from rest_framework.pagination import LimitOffsetPagination  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from accounts.models import CustomUser, StudentProfile  # noqa: E402
+from api.common.pagination import CursorPagination  # noqa: E402
+from api.education.views import SolutionViewSet  # noqa: E402
+from education.models import Assignment, Course, Solution, Timetable  # noqa: E402
+
+BATCH_SIZE = 10000
+DEPTHS = (0, 0.25, 0.5, 0.75, 0.99)
+
+
+def seed(solutions):
+    user = CustomUser.objects.create_user(full_name='Student', email='student@test.com', password='test')
+    student = StudentProfile.objects.create(user=user)
+    course = Course.objects.create(code='BENCH', title='Benchmark')
+    timetable = Timetable.objects.create(
+        code='BENCH', course=course, start_date='2021-09-01', end_date='2021-12-31',
+    )
+    assignment = Assignment.objects.create(
+        title='Benchmark', timetable=timetable, start_time='10:00', end_time='11:00',
+        date='2021-09-01T10:00:00Z',
+    )
+    for start in range(0, solutions, BATCH_SIZE):
+        Solution.objects.bulk_create(
+            Solution(assignment=assignment, student=student)
+            for _ in range(min(BATCH_SIZE, solutions - start))
+        )
+
+
+def paginate(paginator, url):
+    request = Request(APIRequestFactory().get(url))
+    view = SolutionViewSet(request=request, format_kwarg=None)
+    started = time.perf_counter()
+    paginator.paginate_queryset(Solution.objects.all(), request, view)
+    return time.perf_counter() - started, paginator
+
+
+def run(solutions, page_size):
+    print(f'{"depth":>8} {"offset, ms":>12} {"cursor, ms":>12}')
+    depths = {int(solutions * depth) // page_size for depth in DEPTHS}
+    cursor_times = {}
+    url = f'/?cursor=&limit={page_size}'
+    started = time.perf_counter()
+    for page in range(solutions // page_size):
+        elapsed, paginator = paginate(CursorPagination(), url)
+        if page in depths:
+            cursor_times[page] = elapsed
+        url = paginator.get_next_link()
+    total = time.perf_counter() - started
+
+    for page in sorted(depths):
+        offset_time, _ = paginate(LimitOffsetPagination(), f'/?limit={page_size}&offset={page * page_size}')
+        print(f'{page * page_size:>8} {offset_time * 1000:>12.2f} {cursor_times[page] * 1000:>12.2f}')
+    print(f'walked {solutions // page_size} cursor pages in {total:.1f}s')
+
+
+def main(solutions=1000000, page_size=100):
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(solutions)
+        run(solutions, page_size)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
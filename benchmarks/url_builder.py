@@ -0,0 +1,74 @@
+"""
+Microbenchmark for hyperlink generation of UUID related fields.
+
+Usage:
+    python -m benchmarks.url_builder [iterations]
+"""
+import os
+import sys
+import timeit
+import uuid
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from rest_framework import serializers  # noqa: E402
+from rest_framework.relations import HyperlinkedRelatedField  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from api.common.serializers import UUIDHyperlinkedRelatedField  # noqa: E402
+
+VIEW_NAMES = (
+    'course-detail', 'timetable-detail', 'instructor-detail',
+    'student-group-detail', 'event-detail',
+)
+
+
+class Item:
+    def __init__(self):
+        self.pk = 1
+        self.uuid = uuid.uuid4()
+
+
+class ReverseUUIDHyperlinkedRelatedField(HyperlinkedRelatedField):
+    lookup_field = 'uuid'
+
+
+def make_fields(field_class, request):
+    parent = serializers.Serializer(context={'request': request})
+    fields = []
+    for view_name in VIEW_NAMES:
+        field = field_class(view_name=view_name, read_only=True)
+        field.bind(view_name, parent)
+        fields.append(field)
+    return fields
+
+
+def run(fields, items):
+    for field in fields:
+        for item in items:
+            field.to_representation(item)
+
+
+def main(iterations=20):
+    request = Request(APIRequestFactory().get('/api/v1/courses/'))
+    items = [Item() for _ in range(100)]
+    results = {}
+    for name, field_class in (
+        ('reverse', ReverseUUIDHyperlinkedRelatedField),
+        ('precompiled', UUIDHyperlinkedRelatedField),
+    ):
+        fields = make_fields(field_class, request)
+        run(fields, items)
+        seconds = min(timeit.repeat(lambda: run(fields, items), number=iterations, repeat=5))
+        urls = iterations * len(fields) * len(items)
+        results[name] = seconds / urls * 1e6
+        print(f'{name:>12}: {results[name]:.2f} us per URL')
+    print(f'{"speedup":>12}: {results["reverse"] / results["precompiled"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
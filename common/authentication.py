@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from rest_framework import authentication, exceptions
+
+from accounts.models import FeedToken
+
+
+class MetricsTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate metrics scrapers presenting `METRICS_TOKEN` as a bearer token."""
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        auth = authentication.get_authorization_header(request).split()
+        if not token or len(auth) != 2 or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if not constant_time_compare(auth[1], token.encode()):
+            return None
+        return AnonymousUser(), token
+
+
+class FeedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticate calendar applications presenting a feed token in the `token`
+    query parameter, since they cannot send authorization headers.
+    """
+    query_param = 'token'
+
+    def authenticate(self, request):
+        key = request.query_params.get(self.query_param)
+        if not key:
+            return None
+        token = FeedToken.objects.select_related('user').filter(key=key).first()
+        if token is None or not token.user.is_active:
+            raise exceptions.AuthenticationFailed('Invalid feed token.')
+        return token.user, token
@@ -0,0 +1,36 @@
+from django.db import connection
+
+PK_LOOKUP_BATCH_SIZE = 500
+
+
+def bulk_create(model, objs, batch_size=1000):
+    """
+    Insert objects in batches and return them with primary keys set.
+
+    Bulk inserts do not send model signals. Primary keys are loaded by UUID
+    on databases which cannot return them from bulk inserts.
+    """
+    objs = model.objects.bulk_create(objs, batch_size=batch_size)
+    if not objs or connection.features.can_return_rows_from_bulk_insert or not hasattr(model, 'uuid'):
+        return objs
+
+    pks = {}
+    for start in range(0, len(objs), PK_LOOKUP_BATCH_SIZE):
+        uuids = [obj.uuid for obj in objs[start:start + PK_LOOKUP_BATCH_SIZE]]
+        pks.update(model.objects.filter(uuid__in=uuids).values_list('uuid', 'pk'))
+    for obj in objs:
+        obj.pk = pks[obj.uuid]
+    return objs
+
+
+def bulk_add(field, pairs, batch_size=1000):
+    """
+    Insert many-to-many rows of `field` for pairs of source and target primary keys.
+
+    Returns: list of created through model instances
+    """
+    through = field.remote_field.through
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    return through.objects.bulk_create([
+        through(**{f'{source}_id': source_pk, f'{target}_id': target_pk}) for source_pk, target_pk in pairs
+    ], batch_size=batch_size)
@@ -0,0 +1,83 @@
+import time
+
+from django.core.cache import cache
+
+
+def make_seed():
+    """
+    Returns: starting value of a counter kept in the cache
+
+    Counters share the cache with the entries keyed by them, so they may be
+    evicted. Restarting them from the current time instead of a constant
+    never brings back a value used by older entries.
+    """
+    return time.time_ns()
+
+
+class GenerationCache:
+    """
+    Per-model generation counters and modification times.
+
+    Every change of a tracked model bumps its generation, so cache entries
+    whose keys include the generation become unreachable. Missing
+    generations start from `make_seed()`.
+    """
+    key_prefix = 'generation'
+    modified_key_prefix = 'modified'
+
+    def make_key(self, model):
+        return f'{self.key_prefix}:{model._meta.label_lower}'
+
+    def make_modified_key(self, model):
+        return f'{self.modified_key_prefix}:{model._meta.label_lower}'
+
+    def get(self, models):
+        """
+        Get current generations of models in a single cache round trip.
+        Args:
+            models: iterable of model classes
+
+        Returns: tuple of generations in the order of models
+        """
+        return self.get_state(models)[0]
+
+    def get_state(self, models):
+        """
+        Get current generations and the last modification time of models
+        in a single cache round trip.
+        Args:
+            models: iterable of model classes
+
+        Returns: tuple of generations in the order of models and the last
+        modification timestamp
+        """
+        models = tuple(models)
+        keys = [self.make_key(model) for model in models]
+        modified_keys = [self.make_modified_key(model) for model in models]
+        values = cache.get_many(keys + modified_keys)
+
+        for key in keys:
+            if key not in values:
+                seed = make_seed()
+                cache.add(key, seed, timeout=None)
+                values[key] = cache.get(key, seed)
+        modified = []
+        for key in modified_keys:
+            if key not in values:
+                # The modification time is unknown, so assume the model was
+                # modified right now.
+                cache.add(key, time.time(), timeout=None)
+                values[key] = cache.get(key)
+            modified.append(values[key])
+        return tuple(values[key] for key in keys), max(modified, default=None)
+
+    def bump(self, model):
+        key = self.make_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, make_seed(), timeout=None)
+        cache.set(self.make_modified_key(model), time.time(), timeout=None)
+
+
+generations = GenerationCache()
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency in seconds.'),
+    'http_requests_total': ('counter', 'Requests by response status code.'),
+    'http_response_size_bytes': ('histogram', 'Response body size in bytes.'),
+    'db_queries_per_request': ('histogram', 'SQL queries per request.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent running SQL queries in seconds.'),
+}
+
+
+class MetricsRegistry:
+    """
+    Request metrics aggregated in-process and shared between worker processes.
+
+    Every process accumulates counters locally and periodically publishes a
+    snapshot of them to the cache under its own slot, so the metrics of all
+    workers can be summed by whichever process renders them. Snapshots not
+    published for `METRICS_SNAPSHOT_TIMEOUT` seconds, e.g. of stopped
+    workers, are folded into a persistent total when metrics are rendered
+    and their slots are released, so counters never decrease. A process
+    whose snapshot was folded publishes what it recorded since in a new slot.
+    Snapshots expire twice as late, so they are folded before they expire
+    as long as metrics are scraped.
+
+    Only a `METRICS_SAMPLE_RATE` share of requests is recorded, so counts
+    and sums are scaled by the inverse of the rate and are estimates.
+    """
+    key_prefix = 'metrics'
+    prefix = 'lms_'
+    fold_lock_timeout = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.values = defaultdict(float)
+        self.published = {}
+        self.slot = None
+        self.published_at = time.monotonic()
+
+    @property
+    def sample_rate(self):
+        return getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+
+    @property
+    def publish_interval(self):
+        return getattr(settings, 'METRICS_PUBLISH_INTERVAL', 10)
+
+    @property
+    def snapshot_timeout(self):
+        return getattr(settings, 'METRICS_SNAPSHOT_TIMEOUT', 3600)
+
+    @property
+    def slots_key(self):
+        return f'{self.key_prefix}:slots'
+
+    @property
+    def first_slot_key(self):
+        return f'{self.key_prefix}:first-slot'
+
+    @property
+    def total_key(self):
+        return f'{self.key_prefix}:total'
+
+    @property
+    def fold_lock_key(self):
+        return f'{self.key_prefix}:fold-lock'
+
+    def make_key(self, slot):
+        return f'{self.key_prefix}:worker:{slot}'
+
+    def observe_request(self, view, action, status_code, duration, queries, query_duration, size=None):
+        """Record a finished request of a view action."""
+        labels = (('view', view), ('action', action))
+        # Every recorded request stands for the requests outside of the sample.
+        weight = 1 / (self.sample_rate or 1)
+        with self._lock:
+            if self.pid != os.getpid():
+                # The registry was inherited from the parent process.
+                self._reset()
+            self._observe('http_request_duration_seconds', labels, duration, LATENCY_BUCKETS, weight)
+            self._observe('db_queries_per_request', labels, queries, QUERY_COUNT_BUCKETS, weight)
+            if size is not None:
+                self._observe('http_response_size_bytes', labels, size, SIZE_BUCKETS, weight)
+            self.values['http_requests_total', labels + (('status', str(status_code)),)] += weight
+            self.values['db_query_duration_seconds_total', labels] += query_duration * weight
+
+            if time.monotonic() - self.published_at >= self.publish_interval:
+                self._publish()
+
+    def _observe(self, name, labels, value, buckets, weight):
+        for bound in buckets:
+            if value <= bound:
+                self.values[f'{name}_bucket', labels + (('le', str(bound)),)] += weight
+        self.values[f'{name}_bucket', labels + (('le', '+Inf'),)] += weight
+        self.values[f'{name}_sum', labels] += value * weight
+        self.values[f'{name}_count', labels] += weight
+
+    def _publish(self):
+        if self.slot is not None:
+            key = self.make_key(self.slot)
+            state = cache.get_many([key, self.first_slot_key])
+            if key not in state or self.slot < state.get(self.first_slot_key, 1):
+                # The last snapshot was folded into the total.
+                self.values = defaultdict(float, {
+                    sample: value - self.published.get(sample, 0) for sample, value in self.values.items()
+                    if value != self.published.get(sample, 0)
+                })
+                self.slot = None
+        if self.slot is None:
+            try:
+                self.slot = cache.incr(self.slots_key)
+            except ValueError:
+                cache.add(self.slots_key, 0, timeout=None)
+                self.slot = cache.incr(self.slots_key)
+        self.published = dict(self.values)
+        snapshot = {'published': time.time(), 'values': self.published}
+        cache.set(self.make_key(self.slot), snapshot, self.snapshot_timeout * 2)
+        self.published_at = time.monotonic()
+
+    def publish(self):
+        """Publish the snapshot of this process to the cache."""
+        with self._lock:
+            self._publish()
+
+    def collect(self):
+        """
+        Sum snapshots of all worker processes.
+
+        Returns: dictionary of sample values keyed by sample name and labels
+        """
+        self.publish()
+        self.fold()
+        snapshots, _ = self.get_snapshots()
+        values = defaultdict(float, snapshots.pop(self.total_key, {}))
+        for snapshot in snapshots.values():
+            for sample, value in snapshot['values'].items():
+                values[sample] += value
+        return values
+
+    def get_snapshots(self):
+        """
+        Returns: dictionary of snapshots of slots in use by key, with the total
+        under `total_key` if any, and the last taken slot
+        """
+        state = cache.get_many([self.first_slot_key, self.slots_key])
+        first, last = state.get(self.first_slot_key, 1), state.get(self.slots_key, 0)
+        keys = [self.make_key(slot) for slot in range(first, last + 1)]
+        return cache.get_many(keys + [self.total_key]), last
+
+    def fold(self):
+        """
+        Add snapshots not published for `METRICS_SNAPSHOT_TIMEOUT` seconds to
+        the total and release their slots, unless another process is folding.
+        """
+        if not cache.add(self.fold_lock_key, True, self.fold_lock_timeout):
+            return
+        try:
+            snapshots, last = self.get_snapshots()
+            total = defaultdict(float, snapshots.pop(self.total_key, {}))
+            deadline = time.time() - self.snapshot_timeout
+            stale = [key for key, snapshot in snapshots.items() if snapshot['published'] < deadline]
+            if not stale:
+                return
+            for key in stale:
+                for sample, value in snapshots.pop(key)['values'].items():
+                    total[sample] += value
+            cache.set(self.total_key, dict(total), timeout=None)
+            cache.delete_many(stale)
+            # Slots before the first one in use are never read again.
+            first = min((int(key.rsplit(':', 1)[1]) for key in snapshots), default=last + 1)
+            cache.set(self.first_slot_key, first, timeout=None)
+        finally:
+            cache.delete(self.fold_lock_key)
+
+    def clear(self):
+        """Remove the metrics of all processes."""
+        snapshots, _ = self.get_snapshots()
+        cache.delete_many(list(snapshots) + [self.total_key, self.first_slot_key])
+        with self._lock:
+            self.values.clear()
+            self.published = {}
+            self.slot = None
+
+    def render(self):
+        """Render metrics of all worker processes in the Prometheus text format."""
+        samples = defaultdict(list)
+        for (name, labels), value in self.collect().items():
+            samples[name].append((labels, value))
+
+        lines = []
+        for metric, (metric_type, description) in METRICS.items():
+            if metric_type == 'histogram':
+                names = [f'{metric}_{suffix}' for suffix in ('bucket', 'sum', 'count')]
+            else:
+                names = [metric]
+            if not any(name in samples for name in names):
+                continue
+            lines.append(f'# HELP {self.prefix}{metric} {description}')
+            lines.append(f'# TYPE {self.prefix}{metric} {metric_type}')
+            for name in names:
+                for labels, value in sorted(samples[name], key=sort_key):
+                    lines.append(f'{self.prefix}{name}{{{format_labels(labels)}}} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def sort_key(sample):
+    labels, _ = sample
+    return tuple(float('inf') if value == '+Inf' else _number(value) for _, value in labels)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def format_labels(labels):
+    return ','.join(
+        '%s="%s"' % (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+
+
+def format_value(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,70 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from common.metrics import metrics
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries and their duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL queries, response size and status code of a sample
+    of requests per view and action, see `common.metrics`.
+
+    `METRICS_SAMPLE_RATE` sets the share of requests which are measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= metrics.sample_rate:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, action = getattr(request, '_metrics_route', ('unresolved', ''))
+        size = None if response.streaming else len(response.content)
+        metrics.observe_request(view, action, response.status_code, duration, counter.count, counter.duration, size)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_route = get_route(request, view_func)
+
+
+def get_route(request, view_func):
+    """
+    Name the view and action handling the request, e.g. viewset class
+    and action name for viewsets or URL name for other views.
+
+    Returns: tuple of view and action names
+    """
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return request.resolver_match.view_name, request.method.lower()
+
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(request.method.lower(), request.method.lower())
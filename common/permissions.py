@@ -1,15 +1,169 @@
-import copy
+import threading
 
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import permissions
 
+from common.authentication import MetricsTokenAuthentication
+from common.cache import make_seed
 
-class CustomDjangoModelPermissions(permissions.DjangoModelPermissions):
-    def __init__(self):
-        self.perms_map = copy.deepcopy(self.perms_map)
-        self.perms_map['GET'] = ['%(app_label)s.view_%(model_name)s']
 
+class PermissionCache:
+    """
+    Cross-request cache of user model permissions.
+
+    Entries are keyed by user and a global permissions version, so bumping
+    the version invalidates every cached entry at once. A missing version
+    starts from `common.cache.make_seed()`.
+    """
+    key_prefix = 'permissions'
 
-class CustomDjangoObjectPermissions(permissions.DjangoObjectPermissions):
     def __init__(self):
-        self.perms_map = copy.deepcopy(self.perms_map)
-        self.perms_map['GET'] = ['%(app_label)s.view_%(model_name)s']
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+    @property
+    def version_key(self):
+        return f'{self.key_prefix}:version'
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            seed = make_seed()
+            cache.add(self.version_key, seed, timeout=None)
+            version = cache.get(self.version_key, seed)
+        return version
+
+    def bump_version(self):
+        """Invalidate all cached permissions."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, make_seed(), timeout=None)
+
+    def make_key(self, user):
+        return f'{self.key_prefix}:{self.get_version()}:{user.pk}'
+
+    def load(self, user):
+        """
+        Populate the permission cache of the user instance.
+        Args:
+            user: authenticated user
+
+        Returns: set of user permissions in "<app_label>.<codename>" format
+        """
+        if hasattr(user, '_perm_cache'):
+            return user._perm_cache
+
+        key = self.make_key(user)
+        perms = cache.get(key)
+        if perms is None:
+            self._count('misses')
+            perms = user.get_all_permissions()
+            cache.set(key, perms, self.timeout)
+        else:
+            self._count('hits')
+        user._perm_cache = perms
+        return perms
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+permission_cache = PermissionCache()
+
+
+class CachedPermissionsMixin:
+    """Load user permissions from the permission cache instead of the database."""
+
+    def has_permission(self, request, view):
+        user = request.user
+        if user and user.is_authenticated and user.is_active and not user.is_superuser:
+            permission_cache.load(user)
+        return super().has_permission(request, view)
+
+
+class CustomDjangoModelPermissions(CachedPermissionsMixin, permissions.DjangoModelPermissions):
+    perms_map = {
+        **permissions.DjangoModelPermissions.perms_map,
+        'GET': ['%(app_label)s.view_%(model_name)s'],
+    }
+
+
+class RelationDjangoModelPermissions(CustomDjangoModelPermissions):
+    """Require the change permission for all writes of actions editing relations of an object."""
+    perms_map = {
+        **CustomDjangoModelPermissions.perms_map,
+        'POST': ['%(app_label)s.change_%(model_name)s'],
+        'PUT': ['%(app_label)s.change_%(model_name)s'],
+        'DELETE': ['%(app_label)s.change_%(model_name)s'],
+    }
+
+
+class UpsertDjangoModelPermissions(CustomDjangoModelPermissions):
+    """
+    Require the add and change permissions of the `upsert_model` of a view
+    for actions which insert or update rows of a related model.
+    """
+    perms_map = {
+        **CustomDjangoModelPermissions.perms_map,
+        'POST': ['%(app_label)s.add_%(model_name)s', '%(app_label)s.change_%(model_name)s'],
+    }
+
+    def _queryset(self, view):
+        return view.upsert_model._default_manager.none()
+
+
+class CloneDjangoModelPermissions(CustomDjangoModelPermissions):
+    """
+    Require the permissions of the view model and the add permissions of
+    the `clone_models` of a view for actions which copy rows of them.
+    """
+
+    def has_permission(self, request, view):
+        if not super().has_permission(request, view):
+            return False
+        perms = [perm for model in view.clone_models for perm in self.get_required_permissions('POST', model)]
+        return request.user.has_perms(perms)
+
+
+class ApplyDjangoModelPermissions(UpsertDjangoModelPermissions):
+    """
+    Require the change permission of the `upsert_model` of a view for
+    actions which write their results to existing rows of a related model.
+    """
+    perms_map = {
+        **CustomDjangoModelPermissions.perms_map,
+        'POST': ['%(app_label)s.change_%(model_name)s'],
+    }
+
+
+class CustomDjangoObjectPermissions(CachedPermissionsMixin, permissions.DjangoObjectPermissions):
+    perms_map = {
+        **permissions.DjangoObjectPermissions.perms_map,
+        'GET': ['%(app_label)s.view_%(model_name)s'],
+    }
+
+
+class MetricsPermission(permissions.BasePermission):
+    """Allow superusers and scrapers authenticated with the metrics token."""
+
+    def has_permission(self, request, view):
+        if isinstance(request.successful_authenticator, MetricsTokenAuthentication):
+            return True
+        return bool(request.user and request.user.is_superuser)
@@ -0,0 +1,71 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from common.cache import generations
+from common.permissions import permission_cache
+
+GENERATION_TRACKED_APPS = ('accounts', 'auth', 'common', 'education', 'management')
+# Derived models which are rebuilt in bulk, delete signals would prevent fast deletes.
+GENERATION_EXCLUDED_MODELS = ('education.AgendaEntry',)
+
+User = get_user_model()
+
+# Sent once after bulk inserts or updates of objects of the sender model,
+# which do not send `post_save` and `m2m_changed`, with the list of saved
+# `objects`, whether they were `created` and the set of names of written
+# `fields`, including many-to-many fields.
+bulk_saved = Signal()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_permissions_on_m2m_change(action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        permission_cache.bump_version()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=User)
+def invalidate_permissions_on_delete(**kwargs):
+    permission_cache.bump_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_permissions_on_user_create(created, **kwargs):
+    # Primary keys of deleted users may be reused by the database.
+    if created:
+        permission_cache.bump_version()
+
+
+@receiver(bulk_saved, sender=Group)
+@receiver(bulk_saved, sender=User)
+def invalidate_permissions_on_bulk_save(**kwargs):
+    permission_cache.bump_version()
+
+
+def bump_generation(sender, **kwargs):
+    generations.bump(sender)
+
+
+def bump_m2m_generation(sender, action, instance, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        generations.bump(sender)
+        generations.bump(type(instance))
+        generations.bump(model)
+
+
+def connect_generation_receivers():
+    """Bump model generations on every change of models in tracked apps."""
+    for app_label in GENERATION_TRACKED_APPS:
+        for model in apps.get_app_config(app_label).get_models():
+            if model._meta.label in GENERATION_EXCLUDED_MODELS:
+                continue
+            post_save.connect(bump_generation, sender=model)
+            post_delete.connect(bump_generation, sender=model)
+            for field in model._meta.local_many_to_many:
+                m2m_changed.connect(bump_m2m_generation, sender=field.remote_field.through)
@@ -0,0 +1,45 @@
+"""
+Readers of tabular uploads.
+
+Both readers return lists of dictionaries by column name, so imports handle
+CSV with a header row and newline delimited JSON objects alike. Empty CSV
+cells and blank NDJSON lines are skipped.
+"""
+import csv
+import json
+
+
+def read_csv(lines):
+    """
+    Args:
+        lines: iterable of text lines, the first one is the header
+
+    Returns: list of rows without empty cells
+    """
+    return [
+        {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+        for row in csv.DictReader(lines)
+    ]
+
+
+def read_ndjson(lines):
+    """
+    Args:
+        lines: iterable of text lines holding a JSON object each
+
+    Returns: list of rows
+
+    Raises: ValueError with the line number of an invalid line
+    """
+    rows = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f'Line {number}: {error}.')
+        if not isinstance(row, dict):
+            raise ValueError(f'Line {number}: expected an object.')
+        rows.append(row)
+    return rows
@@ -38,6 +38,7 @@ ALLOWED_HOSTS = env('ALLOWED_HOSTS', default='*').split()
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 MIDDLEWARE = [
+    'common.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
@@ -105,6 +106,15 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default='sqlite:///db.sqlite3')
 }
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=300)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -167,6 +177,23 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
 }
 
+PERMISSION_CACHE_TIMEOUT = env.int('PERMISSION_CACHE_TIMEOUT', default=300)
+
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', default=1.0)
+METRICS_PUBLISH_INTERVAL = env.int('METRICS_PUBLISH_INTERVAL', default=10)
+METRICS_SNAPSHOT_TIMEOUT = env.int('METRICS_SNAPSHOT_TIMEOUT', default=3600)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+SOLVER_WORKERS = env.int('SOLVER_WORKERS', default=None)
+SOLVER_RESTARTS = env.int('SOLVER_RESTARTS', default=4)
+SOLVER_ROUNDS = env.int('SOLVER_ROUNDS', default=10)
+SOLVER_ITERATIONS = env.int('SOLVER_ITERATIONS', default=500)
+SOLVER_STALE_TIMEOUT = env.int('SOLVER_STALE_TIMEOUT', default=600)
+
+IMPORT_WORKERS = env.int('IMPORT_WORKERS', default=None)
+IMPORT_MAX_ROWS = env.int('IMPORT_MAX_ROWS', default=10000)
+BULK_MAX_ITEMS = env.int('BULK_MAX_ITEMS', default=1000)
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 SITE_ID = 1
 
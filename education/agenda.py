@@ -0,0 +1,177 @@
+"""
+Materialized agendas of students and instructors.
+
+Every occurrence of an event and every assignment is stored once per user
+who attends it: the instructor of the event details or assignment and its
+students, or the students of groups enrolled in the course when it lists no
+students, as parallel sections of a course list their students. Entries are
+rebuilt per event or assignment, optionally only for some users, whenever
+one of these relations changes, see `education.signals`.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import StudentProfile
+from education.models import AgendaEntry, Assignment, Event, NonPeriodicEventDetails, PeriodicEventDetails
+from education.occurrences import combine, iter_dates
+
+BATCH_SIZE = 1000
+
+
+def get_course_users(course_ids):
+    """
+    Returns: dictionary of user identifiers of enrolled students by course
+    """
+    users = defaultdict(set)
+    rows = StudentProfile.objects.filter(student_groups__joined_courses__in=course_ids).values_list(
+        'student_groups__joined_courses', 'user_id',
+    )
+    for course_id, user_id in rows:
+        users[course_id].add(user_id)
+    return users
+
+
+def get_student_users(field, ids):
+    """
+    Returns: dictionary of user identifiers of students of a many-to-many
+    field by related object
+    """
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    users = defaultdict(set)
+    rows = through.objects.filter(**{f'{source}__in': ids}).values_list(source, 'studentprofile__user_id')
+    for pk, user_id in rows:
+        users[pk].add(user_id)
+    return users
+
+
+def get_audience(course_users, students, instructor_user_id, user_ids):
+    users = set(students or course_users)
+    if instructor_user_id is not None:
+        users.add(instructor_user_id)
+    if user_ids is not None:
+        users &= user_ids
+    return users
+
+
+def iter_event_entries(event_ids, user_ids=None):
+    events = {
+        pk: (title, course_id, start_date, end_date)
+        for pk, title, course_id, start_date, end_date in Event.objects.filter(pk__in=event_ids).values_list(
+            'pk', 'title', 'timetable__course_id', 'timetable__start_date', 'timetable__end_date',
+        )
+    }
+    course_users = get_course_users({course_id for _, course_id, _, _ in events.values()})
+
+    for model in (PeriodicEventDetails, NonPeriodicEventDetails):
+        periodic = model is PeriodicEventDetails
+        extra_fields = ('weekday', 'repeat_type') if periodic else ('date',)
+        rows = model.objects.filter(event__in=list(events)).values_list(
+            'pk', 'uuid', 'event_id', 'start_time', 'end_time', 'instructor__user_id', *extra_fields,
+        )
+        students = get_student_users(model.students.field, [row[0] for row in rows])
+
+        for pk, uuid, event_id, start_time, end_time, instructor_user_id, *extra in rows:
+            title, course_id, start_date, end_date = events[event_id]
+            users = get_audience(course_users[course_id], students[pk], instructor_user_id, user_ids)
+            if periodic:
+                days = iter_dates(*extra, start_date, end_date, start_date, end_date)
+            else:
+                days = (timezone.localtime(extra[0]).date(),)
+            for day in days:
+                start, end = combine(day, start_time), combine(day, end_time)
+                for user_id in users:
+                    yield AgendaEntry(
+                        user_id=user_id, kind=AgendaEntry.Kind.Event, event_id=event_id, details=uuid,
+                        title=title, start=start, end=end,
+                    )
+
+
+def iter_assignment_entries(assignment_ids, user_ids=None):
+    rows = Assignment.objects.filter(pk__in=assignment_ids).values_list(
+        'pk', 'title', 'timetable__course_id', 'date', 'start_time', 'end_time', 'instructor__user_id',
+    )
+    course_users = get_course_users({row[2] for row in rows})
+    students = get_student_users(Assignment.students.field, [row[0] for row in rows])
+
+    for pk, title, course_id, date, start_time, end_time, instructor_user_id in rows:
+        day = timezone.localtime(date).date()
+        start, end = combine(day, start_time), combine(day, end_time)
+        for user_id in get_audience(course_users[course_id], students[pk], instructor_user_id, user_ids):
+            yield AgendaEntry(
+                user_id=user_id, kind=AgendaEntry.Kind.Assignment, assignment_id=pk,
+                title=title, start=start, end=end,
+            )
+
+
+@transaction.atomic
+def refresh_events(event_ids, user_ids=None):
+    """
+    Rebuild agenda entries of events.
+    Args:
+        event_ids: iterable of event identifiers
+        user_ids: optional iterable of user identifiers to rebuild only
+    """
+    event_ids = list(event_ids)
+    user_ids = None if user_ids is None else set(user_ids)
+    entries = AgendaEntry.objects.filter(event__in=event_ids)
+    if user_ids is not None:
+        entries = entries.filter(user__in=user_ids)
+    entries.delete()
+    AgendaEntry.objects.bulk_create(iter_event_entries(event_ids, user_ids), batch_size=BATCH_SIZE)
+
+
+@transaction.atomic
+def refresh_assignments(assignment_ids, user_ids=None):
+    """
+    Rebuild agenda entries of assignments.
+    Args:
+        assignment_ids: iterable of assignment identifiers
+        user_ids: optional iterable of user identifiers to rebuild only
+    """
+    assignment_ids = list(assignment_ids)
+    user_ids = None if user_ids is None else set(user_ids)
+    entries = AgendaEntry.objects.filter(assignment__in=assignment_ids)
+    if user_ids is not None:
+        entries = entries.filter(user__in=user_ids)
+    entries.delete()
+    AgendaEntry.objects.bulk_create(iter_assignment_entries(assignment_ids, user_ids), batch_size=BATCH_SIZE)
+
+
+def refresh_courses(course_ids, user_ids=None):
+    """Rebuild agenda entries of all events and assignments of courses."""
+    refresh_events(Event.objects.filter(timetable__course__in=course_ids).values_list('pk', flat=True), user_ids)
+    refresh_assignments(
+        Assignment.objects.filter(timetable__course__in=course_ids).values_list('pk', flat=True), user_ids,
+    )
+
+
+@transaction.atomic
+def refresh_user(user_id):
+    """Rebuild the whole agenda of a user."""
+    AgendaEntry.objects.filter(user=user_id).delete()
+    attends = Q(timetable__course__student_groups__students__user=user_id)
+    events = Event.objects.filter(
+        attends
+        | Q(periodic_event_details__students__user=user_id)
+        | Q(periodic_event_details__instructor__user=user_id)
+        | Q(non_periodic_event_details__students__user=user_id)
+        | Q(non_periodic_event_details__instructor__user=user_id)
+    ).values_list('pk', flat=True).distinct()
+    assignments = Assignment.objects.filter(
+        attends | Q(students__user=user_id) | Q(instructor__user=user_id)
+    ).values_list('pk', flat=True).distinct()
+    refresh_events(events, [user_id])
+    refresh_assignments(assignments, [user_id])
+
+
+def rebuild():
+    """Rebuild agendas of all users."""
+    AgendaEntry.objects.all().delete()
+    for model, refresh in ((Event, refresh_events), (Assignment, refresh_assignments)):
+        ids = list(model.objects.values_list('pk', flat=True))
+        for start in range(0, len(ids), BATCH_SIZE):
+            refresh(ids[start:start + BATCH_SIZE])
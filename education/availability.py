@@ -0,0 +1,133 @@
+"""
+Search of common free time of instructors and students.
+
+Busy time is read from agenda entries (see `education.agenda`), which hold
+expanded occurrences of events and assignments. Every day of the searched
+range is a bitmap with a bit per slot of `resolution` minutes, stored as a
+Python integer, so whole days are combined with single bitwise operations:
+intervals are OR-ed into busy bitmaps, which are inverted and AND-ed with a
+mask of working hours, and runs of free slots long enough for the requested
+duration are found with a few shifted ANDs.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.utils import timezone
+
+from education.models import AgendaEntry
+from education.occurrences import combine
+
+MINUTES_PER_DAY = 24 * 60
+USERS_PER_QUERY = 500
+
+
+class DayBitmaps:
+    """Bitmaps of busy slots by day of a date range."""
+
+    def __init__(self, date_from, date_to, resolution):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.resolution = resolution
+        self.slots_per_day = MINUTES_PER_DAY // resolution
+        self.days = defaultdict(int)
+
+    def add(self, start, end):
+        """Mark slots overlapping the interval from start to end as busy."""
+        start, end = timezone.localtime(start), timezone.localtime(end)
+        day = max(start.date(), self.date_from)
+        last_day = min(end.date(), self.date_to)
+        while day <= last_day:
+            first = self.get_slot(start) if day == start.date() else 0
+            # Slots partially covered by the end of the interval are busy.
+            last = self.get_end_slot(end) if day == end.date() else self.slots_per_day
+            if last > first:
+                self.days[day] |= ((1 << (last - first)) - 1) << first
+            day += timedelta(days=1)
+
+    def get_time(self, day, slot):
+        """
+        Returns: aware datetime of the start of a slot of a day
+        """
+        days, minutes = divmod(slot * self.resolution, MINUTES_PER_DAY)
+        return combine(day + timedelta(days=days), time(minutes // 60, minutes % 60))
+
+    def get_slot(self, value):
+        return (value.hour * 60 + value.minute) // self.resolution
+
+    def get_end_slot(self, value):
+        minutes = value.hour * 60 + value.minute + (value.second > 0 or value.microsecond > 0)
+        return -(-minutes // self.resolution)
+
+    def get_mask(self, day_start, day_end):
+        """
+        Returns: bitmap of slots between two times of a day
+        """
+        first = self.get_slot(day_start)
+        last = self.slots_per_day if day_end is None else self.get_end_slot(day_end)
+        return ((1 << max(last - first, 0)) - 1) << first
+
+    def iter_free(self, length, mask):
+        """
+        Find runs of at least `length` free slots within the mask.
+
+        Returns: iterator of tuples of a day, the first slot and the number
+        of slots of every run
+        """
+        day = self.date_from
+        while day <= self.date_to:
+            free = ~self.days.get(day, 0) & mask
+            # Bit i of `fits` is set when slots i to i + length - 1 are free.
+            fits, covered = free, 1
+            while covered < length and fits:
+                shift = min(covered, length - covered)
+                fits &= fits >> shift
+                covered += shift
+            while fits:
+                first = (fits & -fits).bit_length() - 1
+                run = fits >> first
+                count = (~run & (run + 1)).bit_length() - 1
+                yield day, first, count + length - 1
+                fits &= ~(((1 << count) - 1) << first)
+            day += timedelta(days=1)
+
+
+def get_busy_bitmaps(user_ids, date_from, date_to, resolution):
+    """
+    Collect busy time of users between two dates, both inclusive.
+
+    Users attending the same occurrence share its interval, so intervals
+    are deduplicated by the database before they are added to bitmaps.
+    Returns: `DayBitmaps` of the union of busy time of all users
+    """
+    bitmaps = DayBitmaps(date_from, date_to, resolution)
+    range_start = combine(date_from, time.min)
+    range_end = combine(date_to + timedelta(days=1), time.min)
+    intervals = set()
+    for start in range(0, len(user_ids), USERS_PER_QUERY):
+        intervals.update(AgendaEntry.objects.filter(
+            user__in=user_ids[start:start + USERS_PER_QUERY], start__lt=range_end, end__gt=range_start,
+        ).values_list('start', 'end').distinct())
+    for start, end in intervals:
+        bitmaps.add(start, end)
+    return bitmaps
+
+
+def find_free_slots(user_ids, date_from, date_to, duration, resolution=15, day_start=None, day_end=None):
+    """
+    Find time when all users are free.
+    Args:
+        user_ids: list of user identifiers
+        date_from: first date of the range
+        date_to: last date of the range
+        duration: minimal length of a free slot in minutes
+        resolution: length of a bitmap slot in minutes, a divisor of a day
+        day_start: optional time of a day free slots start at
+        day_end: optional time of a day free slots end at
+
+    Returns: iterator of tuples of the start and the end of maximal free periods
+    """
+    bitmaps = get_busy_bitmaps(sorted(set(user_ids)), date_from, date_to, resolution)
+    mask = bitmaps.get_mask(day_start or time.min, day_end)
+    length = max(-(-duration // resolution), 1)
+    for day, first, count in bitmaps.iter_free(length, mask):
+        yield bitmaps.get_time(day, first), bitmaps.get_time(day, first + count)
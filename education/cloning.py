@@ -0,0 +1,153 @@
+"""
+Cloning of timetables into a new term.
+
+Clones copy events with their periodic and non-periodic details and
+assignments, including students of all of them. Periodic details repeat on
+the same weekdays within the new term, dates of non-periodic details and
+assignments are shifted by the offset of the term. Timetables cloned
+together keep their relative positions. All rows are written with bulk
+inserts in a single transaction, which do not send model signals, so
+agendas of the clones are built and generations are bumped at the end.
+Solutions, grades and contents belong to the original term and are not
+copied.
+"""
+import re
+from datetime import timedelta
+from itertools import count
+
+from django.db import transaction
+from django.utils import timezone
+
+from common import bulk
+from common.cache import generations
+from education import agenda
+from education.models import Assignment, Event, NonPeriodicEventDetails, PeriodicEventDetails, Timetable
+
+CODE_LENGTH = Timetable._meta.get_field('code').max_length
+CODE_SUFFIX = re.compile(r'-\d+$')
+
+EVENT_FIELDS = ('pk', 'title', 'description', 'event_type_id', 'timetable_id')
+DETAILS_FIELDS = ('pk', 'event_id', 'start_time', 'end_time', 'instructor_id')
+PERIODIC_FIELDS = DETAILS_FIELDS + ('weekday', 'repeat_type')
+NON_PERIODIC_FIELDS = DETAILS_FIELDS + ('date',)
+DETAILS_MODELS = ((PeriodicEventDetails, PERIODIC_FIELDS), (NonPeriodicEventDetails, NON_PERIODIC_FIELDS))
+ASSIGNMENT_FIELDS = ('pk', 'title', 'description', 'timetable_id', 'start_time', 'end_time', 'instructor_id', 'date')
+
+
+def shift(value, offset):
+    """
+    Returns: aware datetime shifted by a number of days at the same local time of a day
+    """
+    return timezone.make_aware(timezone.localtime(value).replace(tzinfo=None) + offset)
+
+
+def make_code(code, taken):
+    """
+    Make a unique timetable code from the code of the original timetable,
+    numbered suffixes of clones of clones are replaced.
+    """
+    base = CODE_SUFFIX.sub('', code)
+    for number in count(2):
+        suffix = f'-{number}'
+        candidate = base[:CODE_LENGTH - len(suffix)] + suffix
+        if candidate not in taken:
+            return candidate
+
+
+class TimetableCloner:
+    """
+    Clone timetables to a new term starting at `start_date`.
+
+    Codes and titles of clones may be given by primary key of the original
+    timetable, missing codes are generated and titles are kept.
+    """
+
+    def __init__(self, timetables, start_date, codes=None, titles=None, batch_size=1000):
+        self.timetables = sorted(timetables, key=lambda timetable: (timetable.start_date, timetable.pk))
+        self.start_date = start_date
+        self.codes = codes or {}
+        self.titles = titles or {}
+        self.batch_size = batch_size
+        self.counts = {}
+        self.models = set()
+
+    @property
+    def offset(self):
+        if not self.timetables:
+            return timedelta()
+        return self.start_date - self.timetables[0].start_date
+
+    @transaction.atomic
+    def clone(self):
+        """
+        Returns: list of cloned timetables in order of their originals
+        """
+        offset, codes = self.offset, self.get_codes()
+        timetables = self.copy(Timetable, [
+            {
+                'pk': timetable.pk, 'code': codes[timetable.pk], 'course_id': timetable.course_id,
+                'title': self.titles.get(timetable.pk, timetable.title),
+                'start_date': timetable.start_date + offset, 'end_date': timetable.end_date + offset,
+            }
+            for timetable in self.timetables
+        ])
+
+        events = self.copy(Event, [
+            {**row, 'timetable_id': timetables[row['timetable_id']].pk}
+            for row in Event.objects.filter(timetable__in=list(timetables)).values(*EVENT_FIELDS)
+        ])
+        for model, fields in DETAILS_MODELS:
+            rows = model.objects.filter(event__in=list(events)).values(*fields)
+            if model is NonPeriodicEventDetails:
+                rows = [{**row, 'date': shift(row['date'], offset)} for row in rows]
+            details = self.copy(model, [{**row, 'event_id': events[row['event_id']].pk} for row in rows])
+            self.copy_students(model.students.field, details)
+
+        assignments = self.copy(Assignment, [
+            {**row, 'timetable_id': timetables[row['timetable_id']].pk, 'date': shift(row['date'], offset)}
+            for row in Assignment.objects.filter(timetable__in=list(timetables)).values(*ASSIGNMENT_FIELDS)
+        ])
+        self.copy_students(Assignment.students.field, assignments)
+
+        agenda.refresh_events([event.pk for event in events.values()])
+        agenda.refresh_assignments([assignment.pk for assignment in assignments.values()])
+        for model in self.models:
+            generations.bump(model)
+        return [timetables[timetable.pk] for timetable in self.timetables]
+
+    def get_codes(self):
+        """
+        Returns: dictionary of codes of clones by primary key of the original
+        """
+        taken = set(Timetable.objects.values_list('code', flat=True)) | set(self.codes.values())
+        codes = {}
+        for timetable in self.timetables:
+            codes[timetable.pk] = self.codes.get(timetable.pk) or make_code(timetable.code, taken)
+            taken.add(codes[timetable.pk])
+        return codes
+
+    def copy(self, model, rows):
+        """
+        Insert copies of rows of a model.
+        Args:
+            model: model class
+            rows: iterable of dictionaries of field values including the primary key of the original
+
+        Returns: dictionary of copies by primary key of the original
+        """
+        rows = list(rows)
+        originals = [row.pop('pk') for row in rows]
+        objs = bulk.bulk_create(model, [model(**row) for row in rows], self.batch_size)
+        self.add_count(model, len(objs))
+        return dict(zip(originals, objs))
+
+    def copy_students(self, field, copies):
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        rows = through.objects.filter(**{f'{source}__in': list(copies)}).values_list(source, target)
+        created = bulk.bulk_add(field, [(copies[pk].pk, student) for pk, student in rows], self.batch_size)
+        self.add_count(through, len(created))
+
+    def add_count(self, model, number):
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + number
+        self.models.add(model)
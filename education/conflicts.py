@@ -0,0 +1,217 @@
+"""
+Detection of overlapping occurrences in agendas of instructors and students.
+
+Agenda entries (see `education.agenda`) serve as the interval index: they
+hold expanded occurrences of every user indexed by user and start, so the
+occurrences of a new schedule are checked with a few range queries over the
+users it concerns. Occurrences of the schedule itself, and of schedules
+saved together, are checked against each other with an in-memory
+`IntervalIndex`.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.db.models import Q
+from django.utils import timezone
+
+from education.agenda import get_course_users
+from education.models import AgendaEntry
+from education.occurrences import combine, iter_dates
+
+Slot = namedtuple('Slot', ('start', 'end', 'title', 'kind', 'event', 'details', 'assignment', 'users'))
+Conflict = namedtuple('Conflict', ('user', 'slot', 'other'))
+
+SLOTS_PER_QUERY = 50
+USERS_PER_QUERY = 500
+
+
+class IntervalIndex:
+    """
+    Intervals sorted by start answering overlap queries in logarithmic time.
+
+    Only intervals starting at most the longest interval length before the
+    queried start may overlap it, so a query is two binary searches and a
+    scan of the candidates between them.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=attrgetter('start'))
+        self.starts = [interval.start for interval in self.intervals]
+        self.max_length = max((interval.end - interval.start for interval in self.intervals), default=timedelta())
+
+    def overlapping(self, start, end):
+        """
+        Returns: list of intervals overlapping the half-open range from start to end
+        """
+        low = bisect_left(self.starts, start - self.max_length)
+        high = bisect_left(self.starts, end)
+        return [interval for interval in self.intervals[low:high] if interval.end > start]
+
+
+def get_audience(course_users, instructor, students):
+    # Like agendas, details and assignments listing students are attended by them only.
+    users = {student.user_id for student in students} or set(course_users)
+    if instructor is not None:
+        users.add(instructor.user_id)
+    return frozenset(users)
+
+
+def iter_event_slots(title, timetable, periodic_details=(), non_periodic_details=()):
+    """
+    Expand event details over the term of a timetable.
+    Args:
+        title: event title
+        timetable: timetable of the event
+        periodic_details: iterable of dictionaries of periodic details fields
+        non_periodic_details: iterable of dictionaries of non-periodic details fields
+
+    Returns: iterator of slots
+    """
+    course_users = get_course_users([timetable.course_id])[timetable.course_id]
+    for details in periodic_details:
+        users = get_audience(course_users, details.get('instructor'), details.get('students', ()))
+        days = iter_dates(details['weekday'], details['repeat_type'], timetable.start_date, timetable.end_date,
+                          timetable.start_date, timetable.end_date)
+        for day in days:
+            yield make_slot(day, details['start_time'], details['end_time'], title, AgendaEntry.Kind.Event, users)
+    for details in non_periodic_details:
+        users = get_audience(course_users, details.get('instructor'), details.get('students', ()))
+        yield make_slot(get_local_date(details['date']), details['start_time'], details['end_time'], title,
+                        AgendaEntry.Kind.Event, users)
+
+
+def iter_assignment_slots(title, timetable, date, start_time, end_time, instructor=None, students=()):
+    """
+    Returns: iterator of the slot of an assignment
+    """
+    users = get_audience(get_course_users([timetable.course_id])[timetable.course_id], instructor, students)
+    yield make_slot(get_local_date(date), start_time, end_time, title, AgendaEntry.Kind.Assignment, users)
+
+
+def get_local_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def make_slot(day, start_time, end_time, title, kind, users):
+    return Slot(combine(day, start_time), combine(day, end_time), title, kind, None, None, None, users)
+
+
+def find_conflicts(slots, exclude=None):
+    """
+    Find occurrences overlapping slots of a new or changed schedule.
+
+    Empty slots never overlap anything.
+    Args:
+        slots: iterable of slots of the schedule
+        exclude: optional Q object of agenda entries replaced by the schedule
+
+    Returns: list of conflicts sorted by start and user
+    """
+    slots = [slot for slot in slots if slot.end > slot.start and slot.users]
+    index = IntervalIndex(slots)
+    conflicts = []
+
+    for position, slot in enumerate(index.intervals):
+        # Later slots starting before this one ends overlap it.
+        for other in index.intervals[position + 1:bisect_left(index.starts, slot.end)]:
+            conflicts.extend(Conflict(user, slot, other) for user in slot.users & other.users)
+
+    # Slots sharing an audience are checked with the same queries.
+    audiences = {}
+    for slot in slots:
+        audiences.setdefault(slot.users, []).append(slot)
+    for users, audience_slots in audiences.items():
+        users = sorted(users)
+        for entry in iter_overlapping_entries(users, audience_slots, exclude):
+            for slot in index.overlapping(entry.start, entry.end):
+                if entry.users[0] in slot.users:
+                    conflicts.append(Conflict(entry.users[0], slot, entry))
+
+    conflicts.sort(key=lambda conflict: (conflict.slot.start, conflict.user, conflict.other.start))
+    return conflicts
+
+
+def find_batch_conflicts(schedules):
+    """
+    Find overlapping occurrences of schedules saved together.
+
+    Every schedule is checked on its own with `find_conflicts`, so only
+    slots of different schedules are compared.
+    Args:
+        schedules: list of lists of slots by schedule
+
+    Returns: list of conflicts with slots of earlier schedules aligned with schedules
+    """
+    positions, slots = {}, []
+    for position, schedule in enumerate(schedules):
+        for slot in schedule:
+            if slot.end > slot.start and slot.users:
+                positions[id(slot)] = position
+                slots.append(slot)
+    index = IntervalIndex(slots)
+
+    conflicts = [[] for _ in schedules]
+    for slot in slots:
+        position = positions[id(slot)]
+        for other in index.overlapping(slot.start, slot.end):
+            if positions[id(other)] < position:
+                conflicts[position].extend(Conflict(user, slot, other) for user in slot.users & other.users)
+    for schedule_conflicts in conflicts:
+        schedule_conflicts.sort(key=lambda conflict: (conflict.slot.start, conflict.user, conflict.other.start))
+    return conflicts
+
+
+def iter_overlapping_entries(users, slots, exclude=None):
+    for user_start in range(0, len(users), USERS_PER_QUERY):
+        for slot_start in range(0, len(slots), SLOTS_PER_QUERY):
+            ranges = reduce(or_, (
+                Q(start__lt=slot.end, end__gt=slot.start)
+                for slot in slots[slot_start:slot_start + SLOTS_PER_QUERY]
+            ))
+            entries = AgendaEntry.objects.filter(ranges, user__in=users[user_start:user_start + USERS_PER_QUERY])
+            if exclude is not None:
+                entries = entries.exclude(exclude)
+            for row in entries.values_list(
+                'user_id', 'start', 'end', 'title', 'kind', 'event__uuid', 'details', 'assignment__uuid',
+            ):
+                user_id, *fields = row
+                yield Slot(*fields, (user_id,))
+
+
+def iter_timetable_conflicts(timetable):
+    """
+    Find overlapping occurrences in agendas of users attending a timetable.
+
+    Entries of every attending user are read in order of start within the
+    term and swept with a list of entries which have not ended yet, only
+    pairs involving the timetable are reported.
+    Returns: iterator of conflicts sorted by user and start
+    """
+    in_timetable = Q(event__timetable=timetable) | Q(assignment__timetable=timetable)
+    users = AgendaEntry.objects.filter(in_timetable).values('user')
+    entries = AgendaEntry.objects.filter(
+        user__in=users,
+        start__lt=combine(timetable.end_date + timedelta(days=1), datetime.min.time()),
+        end__gt=combine(timetable.start_date, datetime.min.time()),
+    ).order_by('user', 'start', 'pk').values_list(
+        'user__uuid', 'start', 'end', 'title', 'kind', 'event__uuid', 'details', 'assignment__uuid',
+        'event__timetable_id', 'assignment__timetable_id',
+    )
+
+    current_user, active = None, []
+    for user, *fields, event_timetable, assignment_timetable in entries.iterator():
+        if user != current_user:
+            current_user, active = user, []
+        entry = Slot(*fields, (user,))
+        owned = timetable.pk in (event_timetable, assignment_timetable)
+        active = [(other, other_owned) for other, other_owned in active if other.end > entry.start]
+        if entry.end > entry.start:
+            for other, other_owned in active:
+                if owned or other_owned:
+                    yield Conflict(user, other, entry)
+            active.append((entry, owned))
@@ -0,0 +1,154 @@
+"""
+Bulk upserts of grades of solutions of an assignment.
+
+Rows identify a solution of the assignment by its `solution` UUID or by the
+`email` of its student, whose latest solution is graded, and hold a `value`
+and an optional `comment`. Rows are validated with a query per kind of key
+and one for existing grades, then missing grades are inserted with a bulk
+insert and changed ones are updated with a bulk update in a single
+transaction. Bulk writes do not send model signals, so the generation of
+grades is bumped at the end.
+"""
+from uuid import UUID
+
+from django.db import transaction
+
+from common.cache import generations
+from education.models import Grade, Solution
+
+VALUE_MAX = 32767
+CREATED, UPDATED, UNCHANGED, REJECTED = 'created', 'updated', 'unchanged', 'rejected'
+
+
+def parse_uuid(value):
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def parse_value(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if 0 <= value <= VALUE_MAX else None
+
+
+class GradeUpload:
+    """
+    Upsert grades of solutions of `assignment` given by `instructor`, who
+    replaces the instructor of updated grades when given.
+
+    `counts` holds numbers of rows by status, `results` holds dictionaries
+    of the row number, starting at 1, its status and the grade UUID or
+    errors by field of rejected rows.
+    """
+
+    def __init__(self, assignment, instructor=None, batch_size=1000):
+        self.assignment = assignment
+        self.instructor = instructor
+        self.batch_size = batch_size
+        self.counts = dict.fromkeys((CREATED, UPDATED, UNCHANGED, REJECTED), 0)
+        self.results = []
+
+    @transaction.atomic
+    def run(self, rows):
+        """
+        Args:
+            rows: iterable of dictionaries of grade fields
+
+        Returns: counts and results of rows
+        """
+        rows = [row if isinstance(row, dict) else None for row in rows]
+        solutions = self.get_solutions(rows)
+        grades = {grade.solution_id: grade for grade in Grade.objects.filter(solution__in=set(solutions.values()))}
+
+        created, updated, graded = [], [], set()
+        for number, row in enumerate(rows, 1):
+            errors, solution = self.validate(row, solutions)
+            if solution in graded:
+                errors['non_field_errors'] = ['The solution is graded by an earlier row.']
+            if errors:
+                self.add_result(number, REJECTED, errors=errors)
+                continue
+            graded.add(solution)
+
+            value, comment = parse_value(row['value']), str(row.get('comment') or '')
+            grade = grades.get(solution)
+            if grade is None:
+                grade = Grade(solution_id=solution, value=value, comment=comment, instructor=self.instructor)
+                created.append(grade)
+                status = CREATED
+            elif (grade.value, grade.comment) == (value, comment):
+                status = UNCHANGED
+            else:
+                grade.value, grade.comment = value, comment
+                if self.instructor is not None:
+                    grade.instructor = self.instructor
+                updated.append(grade)
+                status = UPDATED
+            self.add_result(number, status, grade=grade.uuid)
+
+        Grade.objects.bulk_create(created, batch_size=self.batch_size)
+        Grade.objects.bulk_update(updated, ('value', 'comment', 'instructor'), batch_size=self.batch_size)
+        if created or updated:
+            generations.bump(Grade)
+        return {**self.counts, 'results': self.results}
+
+    def get_solutions(self, rows):
+        """
+        Returns: dictionary of primary keys of solutions of the assignment by
+        solution UUID and by student email
+        """
+        uuids, emails = set(), set()
+        for row in rows:
+            if row is None:
+                continue
+            if row.get('solution'):
+                uuids.add(parse_uuid(row['solution']))
+            elif row.get('email'):
+                emails.add(str(row['email']).strip())
+
+        solutions = self.assignment.solutions.all()
+        found = dict(solutions.filter(uuid__in=uuids - {None}).values_list('uuid', 'pk'))
+        # Later solutions of a student replace earlier ones.
+        found.update(solutions.filter(student__user__email__in=emails).order_by('created_at', 'pk').values_list(
+            'student__user__email', 'pk',
+        ))
+        return found
+
+    @staticmethod
+    def validate(row, solutions):
+        """
+        Returns: tuple of errors by field and the primary key of the graded solution
+        """
+        if row is None:
+            return {'non_field_errors': ['Expected an object.']}, None
+
+        errors, solution = {}, None
+        if row.get('solution'):
+            key = parse_uuid(row['solution'])
+            if key is None:
+                errors['solution'] = ['Enter a valid UUID.']
+            elif key not in solutions:
+                errors['solution'] = ['Unknown solution of the assignment.']
+            solution = solutions.get(key)
+        elif row.get('email'):
+            solution = solutions.get(str(row['email']).strip())
+            if solution is None:
+                errors['email'] = ['No solution of the assignment by a student with this email.']
+        else:
+            errors['solution'] = ['Enter a solution UUID or a student email.']
+
+        if row.get('value') in (None, ''):
+            errors['value'] = ['This field is required.']
+        elif parse_value(row['value']) is None:
+            errors['value'] = [f'Enter an integer between 0 and {VALUE_MAX}.']
+        return errors, solution
+
+    def add_result(self, number, status, **result):
+        self.counts[status] += 1
+        self.results.append({'row': number, 'status': status, **result})
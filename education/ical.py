@@ -0,0 +1,201 @@
+"""
+iCalendar (RFC 5545) feeds of timetables and user agendas.
+
+Periodic event details become a single recurring VEVENT with an RRULE,
+`Even` and `Odd` details repeat every other week from their first
+occurrence. Non-periodic details and assignments become single VEVENTs.
+Feeds are generated lazily row by row, so they can be streamed.
+
+Times are written in UTC, so feeds need no VTIMEZONE definitions. Weekly
+rules in UTC would move occurrences by an hour across daylight saving
+time changes of the current time zone, so occurrences of details whose
+UTC offset changes during the term are listed in an RDATE instead.
+"""
+from django.db.models import Subquery
+from django.utils import timezone
+
+from education.models import AgendaEntry, Assignment, NonPeriodicEventDetails, PeriodicEventDetails, \
+    PeriodicTimetableItem
+from education.occurrences import combine, iter_dates
+
+PRODUCT_ID = '-//LMS//Timetables//EN'
+UID_DOMAIN = 'lms'
+LINE_LENGTH = 75
+CHUNK_LINES = 200
+
+RRULE_INTERVALS = {
+    PeriodicTimetableItem.RepeatType.Weekly: 1,
+    PeriodicTimetableItem.RepeatType.Even: 2,
+    PeriodicTimetableItem.RepeatType.Odd: 2,
+}
+
+EVENT_FIELDS = (
+    'uuid', 'start_time', 'end_time', 'event__title', 'event__description', 'event__event_type__title',
+    'event__updated_at', 'instructor__user__full_name', 'instructor__user__email',
+)
+PERIODIC_FIELDS = EVENT_FIELDS + (
+    'weekday', 'repeat_type', 'event__timetable__start_date', 'event__timetable__end_date',
+)
+NON_PERIODIC_FIELDS = EVENT_FIELDS + ('date',)
+ASSIGNMENT_FIELDS = (
+    'uuid', 'start_time', 'end_time', 'title', 'description', 'date', 'timetable__updated_at',
+    'instructor__user__full_name', 'instructor__user__email',
+)
+
+
+def escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line into lines of at most 75 octets."""
+    encoded = line.encode()
+    if len(encoded) <= LINE_LENGTH:
+        return line
+    lines, start, limit = [], 0, LINE_LENGTH
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Do not split multi-byte characters.
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        lines.append(encoded[start:end].decode())
+        start, limit = end, LINE_LENGTH - 1
+    return '\r\n '.join(lines)
+
+
+def format_utc(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def make_event(uid, start, end, summary, modified, description='', categories='', organizer=None, rrule=None,
+               rdates=()):
+    """
+    Returns: list of content lines of a VEVENT, `organizer` is a tuple of a name and an email, `rdates` are
+    starts of further occurrences
+    """
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{UID_DOMAIN}',
+        f'DTSTAMP:{format_utc(modified)}',
+        f'DTSTART:{format_utc(start)}',
+        f'DTEND:{format_utc(end)}',
+        f'SUMMARY:{escape(summary)}',
+    ]
+    if rrule:
+        lines.append(f'RRULE:{rrule}')
+    if rdates:
+        lines.append(f'RDATE:{",".join(map(format_utc, rdates))}')
+    if description:
+        lines.append(f'DESCRIPTION:{escape(description)}')
+    if categories:
+        lines.append(f'CATEGORIES:{escape(categories)}')
+    if organizer and organizer[1]:
+        name, email = organizer
+        name = name.replace('"', "'")
+        lines.append(f'ORGANIZER;CN="{name}":mailto:{email}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def iter_periodic_events(details):
+    for (uuid, start_time, end_time, title, description, event_type, modified, *instructor,
+         weekday, repeat_type, term_start, term_end) in details:
+        days = list(iter_dates(weekday, repeat_type, term_start, term_end, term_start, term_end))
+        if not days:
+            continue
+        starts = [combine(day, start_time) for day in days]
+        rrule, rdates = None, ()
+        if len({start.utcoffset() for start in starts}) == 1:
+            rrule = 'FREQ=WEEKLY;INTERVAL={};BYDAY={};UNTIL={}'.format(
+                RRULE_INTERVALS[repeat_type], weekday, format_utc(starts[-1]),
+            )
+        else:
+            rdates = starts[1:]
+        yield make_event(
+            uuid, starts[0], combine(days[0], end_time), title, modified,
+            description, event_type, instructor, rrule, rdates,
+        )
+
+
+def iter_non_periodic_events(details):
+    for uuid, start_time, end_time, title, description, event_type, modified, *instructor, date in details:
+        day = timezone.localtime(date).date()
+        yield make_event(
+            uuid, combine(day, start_time), combine(day, end_time), title, modified,
+            description, event_type, instructor,
+        )
+
+
+def iter_assignment_events(assignments):
+    for uuid, start_time, end_time, title, description, date, modified, *instructor in assignments:
+        day = timezone.localtime(date).date()
+        yield make_event(
+            uuid, combine(day, start_time), combine(day, end_time), title, modified,
+            description, 'Assignment', instructor,
+        )
+
+
+def iter_calendar(name, periodic, non_periodic, assignments):
+    """
+    Render a calendar of event details and assignments.
+    Args:
+        name: calendar name shown by calendar applications
+        periodic: queryset of periodic event details
+        non_periodic: queryset of non-periodic event details
+        assignments: queryset of assignments
+
+    Returns: iterator of rendered chunks of lines
+    """
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODUCT_ID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+        f'X-WR-TIMEZONE:{timezone.get_current_timezone_name()}',
+    ]
+    components = (
+        iter_periodic_events(periodic.values_list(*PERIODIC_FIELDS).iterator()),
+        iter_non_periodic_events(non_periodic.order_by('date').values_list(*NON_PERIODIC_FIELDS).iterator()),
+        iter_assignment_events(assignments.order_by('date').values_list(*ASSIGNMENT_FIELDS).iterator()),
+    )
+    for events in components:
+        for event in events:
+            lines.extend(event)
+            if len(lines) >= CHUNK_LINES:
+                yield render(lines)
+                lines = []
+    lines.append('END:VCALENDAR')
+    yield render(lines)
+
+
+def render(lines):
+    return ''.join(f'{fold(line)}\r\n' for line in lines)
+
+
+def iter_timetable_calendar(timetable):
+    """Render the calendar of all events and assignments of a timetable."""
+    return iter_calendar(
+        timetable.title,
+        PeriodicEventDetails.objects.filter(event__timetable=timetable),
+        NonPeriodicEventDetails.objects.filter(event__timetable=timetable),
+        Assignment.objects.filter(timetable=timetable),
+    )
+
+
+def iter_user_calendar(user):
+    """Render the calendar of events and assignments in the agenda of a user."""
+    entries = AgendaEntry.objects.filter(user=user)
+    details = Subquery(entries.filter(kind=AgendaEntry.Kind.Event).values('details'))
+    return iter_calendar(
+        user.full_name,
+        PeriodicEventDetails.objects.filter(uuid__in=details),
+        NonPeriodicEventDetails.objects.filter(uuid__in=details),
+        Assignment.objects.filter(pk__in=Subquery(entries.filter(kind=AgendaEntry.Kind.Assignment).values(
+            'assignment',
+        ))),
+    )
@@ -0,0 +1,49 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from education.cloning import TimetableCloner
+from education.models import Course, Timetable
+
+
+class Command(BaseCommand):
+    help = 'Clone a timetable or all timetables of a course with their events and assignments to a new term.'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--timetable', help='Code of the timetable to clone.')
+        source.add_argument('--course', help='Code of the course whose timetables are cloned.')
+        parser.add_argument('--start-date', type=date.fromisoformat, required=True,
+                            help='First day of the new term in YYYY-MM-DD format.')
+        parser.add_argument('--code', help='Code of the cloned timetable, generated by default.')
+        parser.add_argument('--title', help='Title of the cloned timetable, kept by default.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows per insert.')
+
+    def handle(self, *args, **options):
+        if options['timetable']:
+            timetables = list(Timetable.objects.filter(code=options['timetable']))
+            if not timetables:
+                raise CommandError(f'Timetable "{options["timetable"]}" does not exist.')
+        else:
+            if options['code'] or options['title']:
+                raise CommandError('--code and --title can only be given with --timetable.')
+            course = Course.objects.filter(code=options['course']).first()
+            if course is None:
+                raise CommandError(f'Course "{options["course"]}" does not exist.')
+            timetables = list(course.timetables.all())
+        if options['code'] and Timetable.objects.filter(code=options['code']).exists():
+            raise CommandError(f'Timetable "{options["code"]}" already exists.')
+
+        pk = timetables[0].pk if timetables else None
+        cloner = TimetableCloner(
+            timetables, options['start_date'],
+            codes={pk: options['code']} if options['code'] else None,
+            titles={pk: options['title']} if options['title'] else None,
+            batch_size=options['batch_size'],
+        )
+        clones = cloner.clone()
+        self.stdout.write(json.dumps(cloner.counts, indent=2, sort_keys=True))
+        self.stdout.write(self.style.SUCCESS(
+            f'Cloned {len(clones)} timetables: {", ".join(clone.code for clone in clones)}.'
+        ))
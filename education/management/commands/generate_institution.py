@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from education.synthetic import InstitutionGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic institution with users, groups, courses, timetables, events, ' \
+           'assignments, solutions, grades and contents.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Multiplier of the generated institution size.')
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the random generator.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows per insert.')
+
+    def handle(self, *args, **options):
+        generator = InstitutionGenerator(
+            scale=options['scale'], seed=options['seed'], batch_size=options['batch_size'],
+        )
+        counts = generator.generate()
+        self.stdout.write(json.dumps(counts, indent=2, sort_keys=True))
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(counts.values())} rows, users share the password "{generator.password}".'
+        ))
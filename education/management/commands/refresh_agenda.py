@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from education import agenda
+from education.models import AgendaEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild agendas of all users from events and assignments.'
+
+    def handle(self, *args, **options):
+        agenda.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {AgendaEntry.objects.count()} agenda entries.'))
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.8 on 2026-10-18 03:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('education', '0009_auto_20261018_0308'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendaEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('E', 'Event'), ('A', 'Assignment')], max_length=1)),
+                ('details', models.UUIDField(null=True, verbose_name='Event details identifier')),
+                ('title', models.CharField(max_length=255)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('assignment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agenda_entries', to='education.assignment')),
+                ('event', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agenda_entries', to='education.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agenda_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='agendaentry',
+            index=models.Index(fields=['user', 'start'], name='agenda_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.8 on 2026-10-18 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('education', '0010_auto_20261018_0342'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolverJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Public identifier')),
+                ('parameters', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('F', 'Finished'), ('E', 'Failed')], default='P', max_length=1)),
+                ('progress', models.FloatField(default=0)),
+                ('conflicts', models.PositiveIntegerField(null=True, verbose_name='Conflicts of the best solution')),
+                ('penalty', models.PositiveIntegerField(null=True, verbose_name='Daily load penalty of the best solution')),
+                ('solution', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True)),
+                ('created_date', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('applied_date', models.DateTimeField(null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('timetable', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='solver_jobs', to='education.timetable')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
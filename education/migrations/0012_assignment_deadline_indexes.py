@@ -0,0 +1,17 @@
+# Generated by Django 3.1.8 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0011_solverjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['date', 'end_time'], name='assignment_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.8 on 2026-10-18 05:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0012_assignment_deadline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='periodiceventdetails',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='solverjob',
+            name='updated_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Last update of the status or progress'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from accounts.models import InstructorProfile, StudentProfile, StudentGroup
@@ -18,6 +20,7 @@ class Course(UUIDFieldMixin, models.Model):
         StudentGroup,
         related_name='joined_courses',
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.code} - {self.title}'
@@ -34,6 +37,7 @@ class Timetable(UUIDFieldMixin, models.Model):
     )
     start_date = models.DateField(verbose_name='Course start date')
     end_date = models.DateField(verbose_name='Course end date')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.title} ({self.course.code} course)'
@@ -108,6 +112,11 @@ class NonPeriodicTimetableItem(TimetableItem):
 class Assignment(NonPeriodicTimetableItem):
     """Represent a course assignment related to event."""
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('date', 'end_time'), name='assignment_deadline_idx'),
+        )
+
     def __str__(self) -> str:
         return self.title
 
@@ -189,6 +198,7 @@ class Event(UUIDFieldMixin, models.Model):
         on_delete=models.CASCADE,
         related_name='events'
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.title} ({self.event_type.title})'
@@ -226,6 +236,7 @@ class PeriodicEventDetails(EventDetails):
         on_delete=models.CASCADE,
         related_name='periodic_event_details'
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class NonPeriodicEventDetails(EventDetails):
@@ -236,3 +247,76 @@ class NonPeriodicEventDetails(EventDetails):
         on_delete=models.CASCADE,
         related_name='non_periodic_event_details'
     )
+
+
+class AgendaEntry(models.Model):
+    """Materialized occurrence of an event or assignment in a user's agenda."""
+
+    class Kind(models.TextChoices):
+        Event = 'E', _('Event')
+        Assignment = 'A', _('Assignment')
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='agenda_entries',
+    )
+    kind = models.CharField(choices=Kind.choices, max_length=1)
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='agenda_entries',
+    )
+    assignment = models.ForeignKey(
+        Assignment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='agenda_entries',
+    )
+    details = models.UUIDField(null=True, verbose_name='Event details identifier')
+    title = models.CharField(max_length=255)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('user', 'start'), name='agenda_user_start_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.title} ({self.start})'
+
+
+class SolverJob(UUIDFieldMixin, models.Model):
+    """Represent a background run of the timetable solver, see `education.solver`."""
+
+    class Status(models.TextChoices):
+        Pending = 'P', _('Pending')
+        Running = 'R', _('Running')
+        Finished = 'F', _('Finished')
+        Failed = 'E', _('Failed')
+
+    timetable = models.ForeignKey(
+        Timetable,
+        on_delete=models.CASCADE,
+        related_name='solver_jobs',
+    )
+    parameters = models.JSONField(default=dict)
+    status = models.CharField(choices=Status.choices, default=Status.Pending, max_length=1)
+    progress = models.FloatField(default=0)
+    conflicts = models.PositiveIntegerField(null=True, verbose_name='Conflicts of the best solution')
+    penalty = models.PositiveIntegerField(null=True, verbose_name='Daily load penalty of the best solution')
+    solution = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+    )
+    created_date = models.DateTimeField(default=timezone.now, editable=False)
+    updated_date = models.DateTimeField(default=timezone.now, verbose_name='Last update of the status or progress')
+    applied_date = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f'{self.timetable} ({self.get_status_display()})'
@@ -0,0 +1,120 @@
+"""
+Occupancy of instructors, student groups and courses by weekday and time of day.
+
+An occupancy matrix has a row per weekday and a column per bin of `bin_size`
+minutes of a day, every cell holds minutes occupied by event occurrences
+within the bin summed over a date range. Occurrences of periodic details
+share the weekday and the time of day, so each periodic details is added
+once weighted by the number of its dates in the range (see
+`education.occurrences.iter_dates`) instead of once per occurrence, and
+the cost depends on the number of details rather than the length of the
+range. Student groups are occupied by events of courses they have joined,
+like in agendas.
+"""
+from collections import namedtuple
+from datetime import time, timedelta
+
+from django.utils import timezone
+
+from accounts.models import InstructorProfile, StudentGroup
+from education.availability import MINUTES_PER_DAY
+from education.models import Course, NonPeriodicEventDetails, PeriodicEventDetails
+from education.occurrences import WEEKDAYS, combine, iter_dates
+
+# Lookups of the subject of event details and of its model and name.
+Subject = namedtuple('Subject', ('lookup', 'model', 'name'))
+SUBJECTS = {
+    'instructor': Subject('instructor__uuid', InstructorProfile, 'user__full_name'),
+    'student_group': Subject('event__timetable__course__student_groups__uuid', StudentGroup, 'code'),
+    'course': Subject('event__timetable__course__uuid', Course, 'code'),
+}
+BIN_SIZES = (15, 30, 60, 120)
+
+
+def get_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def get_bins(bin_size):
+    """
+    Returns: list of start times of bins of a day in HH:MM format
+    """
+    return [f'{minutes // 60:02}:{minutes % 60:02}' for minutes in range(0, MINUTES_PER_DAY, bin_size)]
+
+
+class OccupancyMatrix:
+    """Occupied minutes of a subject by weekday and bin of a day."""
+
+    def __init__(self, bin_size):
+        self.bin_size = bin_size
+        self.rows = [[0] * (MINUTES_PER_DAY // bin_size) for _ in range(7)]
+
+    @property
+    def total(self):
+        return sum(map(sum, self.rows))
+
+    def add(self, weekday, start_time, end_time, weight=1):
+        """
+        Add an interval of a day occurring on a weekday `weight` times.
+        Intervals ending at midnight or earlier than they start are cut at
+        the end of the day, empty intervals are ignored.
+        """
+        if end_time == start_time:
+            return
+        start = get_minutes(start_time)
+        end = get_minutes(end_time) if end_time > start_time else MINUTES_PER_DAY
+        row = self.rows[weekday]
+        for index in range(start // self.bin_size, -(-end // self.bin_size)):
+            bin_start = index * self.bin_size
+            row[index] += (min(end, bin_start + self.bin_size) - max(start, bin_start)) * weight
+
+
+def compute_occupancy(by, date_from, date_to, bin_size, uuids=None):
+    """
+    Compute occupancy matrices of instructors, student groups or courses
+    between two dates, both inclusive.
+    Args:
+        by: key of `SUBJECTS`
+        date_from: first date of the range
+        date_to: last date of the range
+        bin_size: minutes per bin, a divisor of minutes of a day
+        uuids: optional list of UUIDs of subjects, which are included even
+            when they are not occupied, all occupied subjects by default
+
+    Returns: list of dictionaries of the subject UUID, its name, total
+    minutes and the matrix as a list of rows sorted by name
+    """
+    subject = SUBJECTS[by]
+    filters = {f'{subject.lookup}__isnull': False}
+    if uuids is not None:
+        filters[f'{subject.lookup}__in'] = uuids
+    matrices = {}
+
+    def get_matrix(uuid):
+        if uuid not in matrices:
+            matrices[uuid] = OccupancyMatrix(bin_size)
+        return matrices[uuid]
+
+    for uuid in uuids or ():
+        get_matrix(uuid)
+
+    periodic = PeriodicEventDetails.objects.filter(
+        event__timetable__start_date__lte=date_to, event__timetable__end_date__gte=date_from, **filters,
+    ).values_list(subject.lookup, 'start_time', 'end_time', 'weekday', 'repeat_type',
+                  'event__timetable__start_date', 'event__timetable__end_date')
+    for uuid, start_time, end_time, weekday, repeat_type, term_start, term_end in periodic:
+        weight = sum(1 for _ in iter_dates(weekday, repeat_type, term_start, term_end, date_from, date_to))
+        if weight:
+            get_matrix(uuid).add(WEEKDAYS[weekday], start_time, end_time, weight)
+
+    non_periodic = NonPeriodicEventDetails.objects.filter(
+        date__gte=combine(date_from, time.min), date__lt=combine(date_to + timedelta(days=1), time.min), **filters,
+    ).values_list(subject.lookup, 'start_time', 'end_time', 'date')
+    for uuid, start_time, end_time, day in non_periodic.iterator():
+        get_matrix(uuid).add(timezone.localtime(day).weekday(), start_time, end_time)
+
+    names = dict(subject.model.objects.filter(uuid__in=list(matrices)).values_list('uuid', subject.name))
+    return sorted((
+        {'uuid': uuid, 'name': names.get(uuid, ''), 'total': matrix.total, 'matrix': matrix.rows}
+        for uuid, matrix in matrices.items()
+    ), key=lambda result: (result['name'], str(result['uuid'])))
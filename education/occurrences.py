@@ -0,0 +1,124 @@
+"""
+Expansion of timetable events into dated occurrences.
+
+Periodic event details repeat on their weekday during the term of their
+timetable. Weeks are counted from the week containing the timetable start
+date, which is the first, odd week. `Even` and `Odd` details occur every
+other week accordingly.
+"""
+import heapq
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
+from django.utils import timezone
+
+from education.models import NonPeriodicEventDetails, PeriodicEventDetails, PeriodicTimetableItem
+
+WEEKDAYS = {weekday: index for index, weekday in enumerate(PeriodicTimetableItem.WeekDay.values)}
+
+Occurrence = namedtuple('Occurrence', (
+    'start', 'end', 'periodic', 'details', 'event', 'title', 'event_type', 'timetable', 'instructor',
+))
+
+DETAILS_FIELDS = (
+    'uuid', 'start_time', 'end_time', 'event__uuid', 'event__title', 'event__event_type__title',
+    'event__timetable__uuid', 'instructor__uuid',
+)
+
+
+def get_week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def iter_dates(weekday, repeat_type, term_start, term_end, date_from, date_to):
+    """
+    Generate dates of a periodic item between two dates, both inclusive.
+
+    The first date is computed directly from the term start, so the cost
+    does not depend on how far the range is from the start of the term.
+    Args:
+        weekday: `PeriodicTimetableItem.WeekDay` value
+        repeat_type: `PeriodicTimetableItem.RepeatType` value
+        term_start: first date of the timetable
+        term_end: last date of the timetable
+        date_from: first date of the range
+        date_to: last date of the range
+
+    Returns: iterator of dates in ascending order
+    """
+    start, end = max(term_start, date_from), min(term_end, date_to)
+    if start > end:
+        return iter(())
+
+    first = start + timedelta(days=(WEEKDAYS[weekday] - start.weekday()) % 7)
+    step = 7
+    if repeat_type != PeriodicTimetableItem.RepeatType.Weekly:
+        step = 14
+        week = (get_week_start(first) - get_week_start(term_start)).days // 7
+        # Week 0 is the first, odd week of the term.
+        is_odd = week % 2 == 0
+        if is_odd != (repeat_type == PeriodicTimetableItem.RepeatType.Odd):
+            first += timedelta(days=7)
+
+    return map(date.fromordinal, range(first.toordinal(), end.toordinal() + 1, step))
+
+
+def combine(day, time):
+    return timezone.make_aware(datetime.combine(day, time))
+
+
+def make_occurrence(day, details, periodic):
+    (uuid, start_time, end_time, event, title, event_type, timetable, instructor) = details[:8]
+    return Occurrence(
+        combine(day, start_time), combine(day, end_time), periodic,
+        uuid, event, title, event_type, timetable, instructor,
+    )
+
+
+def iter_periodic(details, date_from, date_to):
+    for row in details:
+        weekday, repeat_type, term_start, term_end = row[8:]
+        for day in iter_dates(weekday, repeat_type, term_start, term_end, date_from, date_to):
+            yield make_occurrence(day, row, True)
+
+
+def iter_non_periodic(details):
+    # Rows are ordered by date, occurrences of a single day are sorted by
+    # their start time.
+    occurrences = (make_occurrence(timezone.localtime(row[8]).date(), row, False) for row in details)
+    for _, day_occurrences in groupby(occurrences, key=lambda occurrence: occurrence.start.date()):
+        yield from sorted(day_occurrences)
+
+
+def expand(events, date_from, date_to):
+    """
+    Expand events into occurrences between two dates, both inclusive.
+
+    Periodic details are read in a single query and expanded lazily,
+    non-periodic details are streamed from the database in date order, so
+    memory use is bounded by the number of periodic details rather than
+    the number of occurrences.
+    Args:
+        events: queryset of events
+        date_from: first date of the range
+        date_to: last date of the range
+
+    Returns: iterator of occurrences sorted by start
+    """
+    periodic = PeriodicEventDetails.objects.filter(
+        event__in=events,
+        event__timetable__start_date__lte=date_to,
+        event__timetable__end_date__gte=date_from,
+    ).values_list(*DETAILS_FIELDS, 'weekday', 'repeat_type', 'event__timetable__start_date',
+                  'event__timetable__end_date')
+
+    range_start = combine(date_from, datetime.min.time())
+    range_end = combine(date_to + timedelta(days=1), datetime.min.time())
+    non_periodic = NonPeriodicEventDetails.objects.filter(
+        event__in=events, date__gte=range_start, date__lt=range_end,
+    ).order_by('date').values_list(*DETAILS_FIELDS, 'date')
+
+    streams = [iter_periodic([row], date_from, date_to) for row in periodic]
+    streams.append(iter_non_periodic(non_periodic.iterator()))
+    return heapq.merge(*streams)
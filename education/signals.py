@@ -0,0 +1,205 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import InstructorProfile, StudentGroup, StudentProfile
+from accounts.signals import group_students_changed
+from common.signals import bulk_saved
+from education import agenda
+from education.models import (
+    AgendaEntry,
+    Assignment,
+    Course,
+    Event,
+    NonPeriodicEventDetails,
+    PeriodicEventDetails,
+    Timetable,
+)
+
+M2M_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+# Fields which agenda entries are built from, agendas are only rebuilt when
+# one of them changes.
+DETAILS_FIELDS = ('event_id', 'start_time', 'end_time', 'instructor_id')
+AGENDA_FIELDS = {
+    Timetable: ('start_date', 'end_date'),
+    Event: ('title', 'timetable_id'),
+    PeriodicEventDetails: DETAILS_FIELDS + ('weekday', 'repeat_type'),
+    NonPeriodicEventDetails: DETAILS_FIELDS + ('date',),
+    Assignment: ('title', 'timetable_id', 'date', 'start_time', 'end_time', 'instructor_id'),
+}
+
+
+def get_student_users(student_ids):
+    return StudentProfile.objects.filter(pk__in=student_ids).values_list('user_id', flat=True)
+
+
+@receiver(pre_save, sender=Timetable)
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=PeriodicEventDetails)
+@receiver(pre_save, sender=NonPeriodicEventDetails)
+@receiver(pre_save, sender=Assignment)
+def collect_agenda_fields(sender, instance, **kwargs):
+    instance._agenda_fields = None
+    if instance.pk is not None:
+        instance._agenda_fields = sender.objects.filter(pk=instance.pk).values_list(*AGENDA_FIELDS[sender]).first()
+
+
+def is_agenda_changed(instance):
+    """Whether a saved instance is new or any of its fields shown in agendas has changed."""
+    fields = getattr(instance, '_agenda_fields', None)
+    return fields is None or fields != tuple(getattr(instance, field) for field in AGENDA_FIELDS[type(instance)])
+
+
+@receiver(post_save, sender=Event)
+def refresh_event_agenda(instance, **kwargs):
+    if is_agenda_changed(instance):
+        agenda.refresh_events([instance.pk])
+
+
+@receiver(post_save, sender=PeriodicEventDetails)
+@receiver(post_save, sender=NonPeriodicEventDetails)
+def refresh_event_details_agenda(instance, **kwargs):
+    if is_agenda_changed(instance):
+        events = {instance.event_id}
+        if instance._agenda_fields is not None:
+            # The details may be moved from another event.
+            events.add(instance._agenda_fields[0])
+        agenda.refresh_events(events)
+
+
+@receiver(post_delete, sender=PeriodicEventDetails)
+@receiver(post_delete, sender=NonPeriodicEventDetails)
+def delete_event_details_agenda(instance, **kwargs):
+    # Entries are only removed, the details may be deleted along with the event.
+    AgendaEntry.objects.filter(details=instance.uuid).delete()
+
+
+@receiver(post_save, sender=Assignment)
+def refresh_assignment_agenda(instance, **kwargs):
+    if is_agenda_changed(instance):
+        agenda.refresh_assignments([instance.pk])
+
+
+@receiver(post_save, sender=Timetable)
+def refresh_timetable_agenda(instance, created, **kwargs):
+    if not created and is_agenda_changed(instance):
+        agenda.refresh_events(instance.events.values_list('pk', flat=True))
+        agenda.refresh_assignments(instance.assignments.values_list('pk', flat=True))
+
+
+def is_bulk_agenda_changed(sender, created, fields, relations=()):
+    """Whether objects saved in bulk are new or any written field is shown in agendas."""
+    attnames = {sender._meta.get_field(name).attname for name in fields}
+    return created or bool(attnames & {*AGENDA_FIELDS[sender], *relations})
+
+
+@receiver(bulk_saved, sender=Event)
+def refresh_bulk_event_agenda(sender, objects, created, fields, **kwargs):
+    if is_bulk_agenda_changed(sender, created, fields):
+        agenda.refresh_events([obj.pk for obj in objects])
+
+
+@receiver(bulk_saved, sender=Assignment)
+def refresh_bulk_assignment_agenda(sender, objects, created, fields, **kwargs):
+    if is_bulk_agenda_changed(sender, created, fields, ('students',)):
+        agenda.refresh_assignments([obj.pk for obj in objects])
+
+
+@receiver(bulk_saved, sender=Timetable)
+def refresh_bulk_timetable_agenda(sender, objects, created, fields, **kwargs):
+    if not created and is_bulk_agenda_changed(sender, created, fields):
+        timetables = [obj.pk for obj in objects]
+        agenda.refresh_events(Event.objects.filter(timetable__in=timetables).values_list('pk', flat=True))
+        agenda.refresh_assignments(Assignment.objects.filter(timetable__in=timetables).values_list('pk', flat=True))
+
+
+@receiver(bulk_saved, sender=Course)
+def refresh_bulk_course_agenda(objects, fields, **kwargs):
+    if 'student_groups' in fields:
+        agenda.refresh_courses([obj.pk for obj in objects])
+
+
+@receiver(bulk_saved, sender=StudentGroup)
+def refresh_bulk_student_group_agenda(objects, fields, **kwargs):
+    if 'students' in fields:
+        courses = Course.objects.filter(student_groups__in=[obj.pk for obj in objects]).values_list('pk', flat=True)
+        agenda.refresh_courses(courses.distinct())
+
+
+@receiver(m2m_changed, sender=PeriodicEventDetails.students.through)
+@receiver(m2m_changed, sender=NonPeriodicEventDetails.students.through)
+@receiver(m2m_changed, sender=Assignment.students.through)
+def refresh_students_agenda(sender, action, instance, reverse, model, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if reverse:
+        agenda.refresh_user(instance.user_id)
+        return
+
+    # Course students attend only while no students are listed, so every user is refreshed.
+    if isinstance(instance, Assignment):
+        agenda.refresh_assignments([instance.pk])
+    else:
+        agenda.refresh_events([instance.event_id])
+
+
+@receiver(m2m_changed, sender=StudentGroup.students.through)
+def refresh_student_group_agenda(action, instance, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if reverse:
+        agenda.refresh_user(instance.user_id)
+    else:
+        users = None if pk_set is None else get_student_users(pk_set)
+        agenda.refresh_courses(instance.joined_courses.values_list('pk', flat=True), users)
+
+
+@receiver(group_students_changed, sender=StudentGroup)
+def refresh_group_students_agenda(groups, students, **kwargs):
+    courses = Course.objects.filter(student_groups__in=groups).values_list('pk', flat=True).distinct()
+    agenda.refresh_courses(courses, get_student_users(students))
+
+
+@receiver(m2m_changed, sender=Course.student_groups.through)
+def refresh_course_agenda(action, instance, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Courses of the group are gone after it is cleared.
+        instance._agenda_courses = list(instance.joined_courses.values_list('pk', flat=True))
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        users = None
+        if pk_set is not None:
+            users = StudentProfile.objects.filter(student_groups__in=pk_set).values_list('user_id', flat=True)
+        agenda.refresh_courses([instance.pk], users)
+    else:
+        courses = instance._agenda_courses if pk_set is None else pk_set
+        agenda.refresh_courses(courses, instance.students.values_list('user_id', flat=True))
+
+
+@receiver(pre_delete, sender=StudentGroup)
+def collect_student_group_users(instance, **kwargs):
+    instance._agenda_users = list(instance.students.values_list('user_id', flat=True))
+    instance._agenda_courses = list(instance.joined_courses.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=StudentGroup)
+def refresh_student_group_users_agenda(instance, **kwargs):
+    agenda.refresh_courses(instance._agenda_courses, instance._agenda_users)
+
+
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=InstructorProfile)
+def refresh_profile_agenda(instance, **kwargs):
+    # The profile may be deleted along with its user, so the agenda is only
+    # rebuilt after commit if the user still exists.
+    AgendaEntry.objects.filter(user=instance.user_id).delete()
+    user_id = instance.user_id
+
+    def refresh():
+        if get_user_model().objects.filter(pk=user_id).exists():
+            agenda.refresh_user(user_id)
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,143 @@
+"""
+Search of conflict-free weekly placements of periodic event details.
+
+The week is a bitmap with a bit per slot of every day of odd and even
+weeks of a term, so a placement of event details on a weekday, a repeat
+type and a start time is an integer mask, and two placements overlap when
+their masks intersect. Users attending exactly the same event details are
+merged into resources, event details sharing a resource are neighbours.
+
+Placements are found by a randomized min-conflicts search: it repeatedly
+takes a conflicting event details, or any of them once there are no
+conflicts, and moves it to the placement with the fewest overlapping
+neighbours and the most even daily load of its resources. The search
+starts from a greedy placement and continues from a given one, so a
+restart can run in rounds in a process pool, see `education.solver_jobs`.
+
+This module does not depend on Django, so it can be imported by worker
+processes which are spawned rather than forked.
+"""
+import random
+from collections import namedtuple
+
+NOISE = 0.1
+
+# Lists by event details of placements as (mask, day, weight) tuples, where the weight is the number of slots
+# occupied in two weeks, of indices of their resources and of indices of their neighbours.
+Problem = namedtuple('Problem', ('candidates', 'resources', 'neighbors', 'resource_count'))
+
+_problem = None
+
+
+def init_worker(problem):
+    """Keep the problem in a worker process, so it is sent to every worker only once."""
+    global _problem
+    _problem = problem
+
+
+def search(assignment, seed, iterations):
+    """
+    Continue the search in a worker process, see `Search.run`.
+    """
+    return Search(_problem, seed, assignment).run(iterations)
+
+
+class Search:
+    """State of the min-conflicts search of a problem."""
+
+    def __init__(self, problem, seed, assignment=None):
+        self.problem = problem
+        self.random = random.Random(seed)
+        count = len(problem.candidates)
+        self.choices = [None] * count
+        self.masks = [0] * count
+        self.conflicts = [0] * count
+        self.loads = [[0] * 7 for _ in range(problem.resource_count)]
+        self.total = 0
+        self.penalty = 0
+
+        if assignment is None:
+            # The most constrained event details are placed first.
+            order = sorted(range(count), key=lambda item: (len(problem.candidates[item]), self.random.random()))
+            for item in order:
+                self.add(item, self.get_best(item))
+        else:
+            for item, index in enumerate(assignment):
+                self.add(item, index)
+
+    @property
+    def cost(self):
+        return self.total, self.penalty
+
+    def add(self, item, index):
+        mask, day, weight = self.problem.candidates[item][index]
+        for neighbor in self.problem.neighbors[item]:
+            if self.masks[neighbor] & mask:
+                self.conflicts[neighbor] += 1
+                self.conflicts[item] += 1
+                self.total += 1
+        for resource in self.problem.resources[item]:
+            load = self.loads[resource][day]
+            self.penalty += 2 * weight * load + weight * weight
+            self.loads[resource][day] = load + weight
+        self.choices[item], self.masks[item] = index, mask
+
+    def remove(self, item):
+        mask, day, weight = self.problem.candidates[item][self.choices[item]]
+        self.masks[item] = 0
+        for neighbor in self.problem.neighbors[item]:
+            if self.masks[neighbor] & mask:
+                self.conflicts[neighbor] -= 1
+                self.total -= 1
+        self.conflicts[item] = 0
+        for resource in self.problem.resources[item]:
+            load = self.loads[resource][day] - weight
+            self.penalty -= 2 * weight * load + weight * weight
+            self.loads[resource][day] = load
+
+    def get_best(self, item):
+        """
+        Returns: index of the placement of unplaced event details with the
+        fewest conflicts and the lowest penalty, ties are broken randomly
+        """
+        neighbors = self.problem.neighbors[item]
+        resources = self.problem.resources[item]
+        occupied = 0
+        for neighbor in neighbors:
+            occupied |= self.masks[neighbor]
+        day_loads = [sum(self.loads[resource][day] for resource in resources) for day in range(7)]
+
+        candidates = self.problem.candidates[item]
+        offset = self.random.randrange(len(candidates))
+        best, best_cost = None, None
+        for position in range(len(candidates)):
+            index = (position + offset) % len(candidates)
+            mask, day, weight = candidates[index]
+            conflicts = 0
+            if mask & occupied:
+                conflicts = sum(1 for neighbor in neighbors if self.masks[neighbor] & mask)
+            cost = (conflicts, 2 * weight * day_loads[day] + len(resources) * weight * weight)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = index, cost
+        return best
+
+    def run(self, iterations):
+        """
+        Move event details for a number of iterations.
+
+        Returns: tuple of the current assignment and a tuple of the number
+        of conflicts, the penalty and the assignment of the best state
+        """
+        best = (*self.cost, list(self.choices))
+        items = range(len(self.choices))
+        for _ in range(iterations if items else 0):
+            conflicting = [item for item in items if self.conflicts[item]]
+            item = self.random.choice(conflicting or items)
+            self.remove(item)
+            if self.random.random() < NOISE:
+                self.add(item, self.random.randrange(len(self.problem.candidates[item])))
+            else:
+                self.add(item, self.get_best(item))
+            if self.cost < best[:2]:
+                best = (*self.cost, list(self.choices))
+        return list(self.choices), best
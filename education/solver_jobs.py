@@ -0,0 +1,427 @@
+"""
+Background jobs of the timetable solver.
+
+A job places periodic event details of a timetable given by its
+parameters: the event details with their durations, optional instructors,
+student groups and whether they repeat every other week, blocked times,
+allowed weekdays, hours of a day and the slot resolution. Event details
+are attended by their instructor, their students and the students of their
+student groups, or the students of groups enrolled in the course when they
+list neither students nor student groups, like in agendas. Blocked
+times without instructors and student groups block everybody.
+
+Occurrences of the term already in agendas of the attending users (see
+`education.agenda`) are busy in the weeks of the same parity, so solutions
+do not conflict with other timetables either. Event details being solved
+are ignored, as they move. Agendas may change while a job runs, so
+solutions are checked for conflicts again when they are applied.
+
+Jobs run in a thread of the process which created them, so they are lost
+when it stops. Pending and running jobs not updated for
+`SOLVER_STALE_TIMEOUT` seconds are considered stale and, like failed jobs,
+can be restarted.
+
+The search itself (see `education.solver`) runs in a process pool in
+rounds of independent restarts. After every round the job stores its
+progress and the best solution found so far. Solutions are written to
+event details only when they are applied.
+"""
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import InstructorProfile, StudentProfile
+from common.cache import generations
+from education import agenda, solver
+from education.availability import MINUTES_PER_DAY
+from education.conflicts import find_conflicts, iter_event_slots
+from education.models import AgendaEntry, PeriodicEventDetails, PeriodicTimetableItem, SolverJob
+from education.occurrences import WEEKDAYS, combine, get_week_start
+
+USERS_PER_QUERY = 500
+
+# Week 0 of a term is odd, see `education.occurrences.iter_dates`.
+REPEAT_PARITIES = {
+    PeriodicTimetableItem.RepeatType.Weekly: (0, 1),
+    PeriodicTimetableItem.RepeatType.Odd: (0,),
+    PeriodicTimetableItem.RepeatType.Even: (1,),
+}
+WEEKLY_REPEAT_TYPES = (PeriodicTimetableItem.RepeatType.Weekly,)
+BIWEEKLY_REPEAT_TYPES = (PeriodicTimetableItem.RepeatType.Odd, PeriodicTimetableItem.RepeatType.Even)
+
+
+class SolverError(Exception):
+    pass
+
+
+def get_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    return time(minutes // 60, minutes % 60).isoformat()
+
+
+class TimetableSolver:
+    """Build the problem of a solver job and search for its solution in a process pool."""
+
+    def __init__(self, job):
+        self.job = job
+        self.timetable = job.timetable
+        parameters = job.parameters
+        self.events = parameters['events']
+        self.blocked = parameters.get('blocked', [])
+        self.weekdays = parameters['weekdays']
+        self.day_start = get_minutes(time.fromisoformat(parameters['day_start']))
+        self.day_end = get_minutes(time.fromisoformat(parameters['day_end']))
+        self.resolution = parameters['resolution']
+        self.slots_per_day = MINUTES_PER_DAY // self.resolution
+        self.instructors = {}
+        self.groups = {}
+        self.placements = []
+
+    def make_mask(self, weekday, parities, first, last):
+        run = (1 << (last - first)) - 1
+        mask = 0
+        for parity in parities:
+            mask |= run << ((parity * 7 + weekday) * self.slots_per_day + first)
+        return mask
+
+    def get_slots(self, start_time, end_time):
+        start, end = get_minutes(start_time), get_minutes(end_time)
+        return start // self.resolution, -(-end // self.resolution) if end else self.slots_per_day
+
+    def get_users(self):
+        """
+        Returns: list of sets of user identifiers attending event details in order of `events`
+        """
+        keys = [event['details'] for event in self.events]
+        rows = {
+            str(uuid): (pk, instructor_user_id)
+            for pk, uuid, instructor_user_id in PeriodicEventDetails.objects.filter(
+                uuid__in=keys, event__timetable=self.timetable,
+            ).values_list('pk', 'uuid', 'instructor__user_id')
+        }
+        missing = set(keys) - set(rows)
+        if missing:
+            raise SolverError(f'Unknown event details: {", ".join(sorted(missing))}.')
+
+        students = agenda.get_student_users(PeriodicEventDetails.students.field, [pk for pk, _ in rows.values()])
+        course_users = agenda.get_course_users([self.timetable.course_id])[self.timetable.course_id]
+
+        users = []
+        for event in self.events:
+            pk, instructor_user_id = rows[event['details']]
+            if event.get('instructor'):
+                instructor_user_id = self.instructors[event['instructor']]
+            attending = set(students[pk])
+            if event.get('student_groups'):
+                for group in event['student_groups']:
+                    attending |= self.groups[group]
+            elif not attending:
+                attending |= course_users
+            if instructor_user_id is not None:
+                attending.add(instructor_user_id)
+            users.append(attending)
+        return users
+
+    def get_instructor_users(self):
+        uuids = {event['instructor'] for event in self.events if event.get('instructor')}
+        for blocked in self.blocked:
+            uuids.update(blocked.get('instructors', ()))
+        return {
+            str(uuid): user_id
+            for uuid, user_id in InstructorProfile.objects.filter(uuid__in=uuids).values_list('uuid', 'user_id')
+        }
+
+    def get_group_users(self):
+        uuids = set()
+        for item in self.events + self.blocked:
+            uuids.update(item.get('student_groups', ()))
+        users = defaultdict(set)
+        rows = StudentProfile.objects.filter(student_groups__uuid__in=uuids).values_list(
+            'student_groups__uuid', 'user_id',
+        )
+        for uuid, user_id in rows:
+            users[str(uuid)].add(user_id)
+        return users
+
+    def get_entry_mask(self, start, end, term_week):
+        start, end = timezone.localtime(start), timezone.localtime(end)
+        day = start.date()
+        parity = (get_week_start(day) - term_week).days // 7 % 2
+        first, last = self.get_slots(start, end)
+        if end.date() != day:
+            last = self.slots_per_day
+        return self.make_mask(day.weekday(), (parity,), first, last) if last > first else 0
+
+    def get_busy_masks(self, user_ids):
+        """
+        Returns: dictionary of masks of agenda occurrences and blocked times by user, and the mask of times
+        blocked for everybody
+        """
+        term_week = get_week_start(self.timetable.start_date)
+        entries = AgendaEntry.objects.filter(
+            start__lt=combine(self.timetable.end_date + timedelta(days=1), time.min),
+            end__gt=combine(self.timetable.start_date, time.min),
+        ).exclude(details__in=[event['details'] for event in self.events])
+
+        # Occurrences of the same event details or assignment are shared by all
+        # their attendees, so their masks are computed once per source.
+        attendees, intervals = defaultdict(set), set()
+        user_ids = sorted(user_ids)
+        for start in range(0, len(user_ids), USERS_PER_QUERY):
+            chunk = entries.filter(user__in=user_ids[start:start + USERS_PER_QUERY])
+            for user_id, *source in chunk.values_list('user_id', 'details', 'assignment').distinct().iterator():
+                attendees[tuple(source)].add(user_id)
+            intervals.update(chunk.values_list('details', 'assignment', 'start', 'end').distinct())
+        masks = defaultdict(int)
+        for details, assignment, entry_start, entry_end in intervals:
+            masks[details, assignment] |= self.get_entry_mask(entry_start, entry_end, term_week)
+
+        busy = defaultdict(int)
+        for source, users in attendees.items():
+            for user_id in users:
+                busy[user_id] |= masks[source]
+
+        blocked_all = 0
+        for blocked in self.blocked:
+            first, last = self.get_slots(time.fromisoformat(blocked['start_time']),
+                                         time.fromisoformat(blocked['end_time']))
+            mask = self.make_mask(WEEKDAYS[blocked['weekday']], REPEAT_PARITIES[blocked['repeat_type']], first, last)
+            users = {self.instructors[uuid] for uuid in blocked.get('instructors', ())}
+            for group in blocked.get('student_groups', ()):
+                users |= self.groups[group]
+            if not blocked.get('instructors') and not blocked.get('student_groups'):
+                blocked_all |= mask
+            for user_id in users:
+                busy[user_id] |= mask
+        return busy, blocked_all
+
+    def build(self):
+        """
+        Returns: `solver.Problem` of the job, placements are kept as (weekday, repeat type, start minute) tuples
+        """
+        self.instructors = self.get_instructor_users()
+        self.groups = self.get_group_users()
+        users = self.get_users()
+        busy, blocked_all = self.get_busy_masks(set().union(*users))
+
+        # Users attending the same event details form a resource.
+        attended = defaultdict(set)
+        for item, item_users in enumerate(users):
+            for user_id in item_users:
+                attended[user_id].add(item)
+        resources, resource_busy = {}, []
+        for user_id, items in attended.items():
+            index = resources.setdefault(frozenset(items), len(resources))
+            if index == len(resource_busy):
+                resource_busy.append(0)
+            resource_busy[index] |= busy[user_id]
+        item_resources = [[] for _ in users]
+        neighbors = [set() for _ in users]
+        for items, index in resources.items():
+            for item in items:
+                item_resources[item].append(index)
+                neighbors[item] |= items - {item}
+
+        candidates = []
+        for item, event in enumerate(self.events):
+            forbidden = blocked_all
+            for index in item_resources[item]:
+                forbidden |= resource_busy[index]
+            item_candidates, placements = [], []
+            slots = -(-event['duration'] // self.resolution)
+            repeat_types = BIWEEKLY_REPEAT_TYPES if event.get('biweekly') else WEEKLY_REPEAT_TYPES
+            for weekday in self.weekdays:
+                for repeat_type in repeat_types:
+                    parities = REPEAT_PARITIES[repeat_type]
+                    first = -(-self.day_start // self.resolution)
+                    for start in range(first, self.slots_per_day):
+                        if start * self.resolution + event['duration'] > self.day_end:
+                            break
+                        mask = self.make_mask(WEEKDAYS[weekday], parities, start, start + slots)
+                        if not mask & forbidden:
+                            item_candidates.append((mask, WEEKDAYS[weekday], slots * len(parities)))
+                            placements.append((weekday, repeat_type, start * self.resolution))
+            if not item_candidates:
+                raise SolverError(f'No free time for event details {event["details"]}.')
+            candidates.append(item_candidates)
+            self.placements.append(placements)
+
+        return solver.Problem(
+            candidates, [tuple(indices) for indices in item_resources], [tuple(items) for items in neighbors],
+            len(resources),
+        )
+
+    def describe(self, assignment):
+        """
+        Returns: list of dictionaries of placements of event details
+        """
+        solution = []
+        for event, placements, index in zip(self.events, self.placements, assignment):
+            weekday, repeat_type, start = placements[index]
+            solution.append({
+                'details': event['details'],
+                'instructor': event.get('instructor'),
+                'weekday': weekday,
+                'repeat_type': repeat_type,
+                'start_time': format_minutes(start),
+                'end_time': format_minutes(start + event['duration']),
+            })
+        return solution
+
+    def solve(self):
+        """Run rounds of restarts of the search and report progress and the best solution after each of them."""
+        problem = self.build()
+        restarts = getattr(settings, 'SOLVER_RESTARTS', 4)
+        rounds = getattr(settings, 'SOLVER_ROUNDS', 10)
+        iterations = getattr(settings, 'SOLVER_ITERATIONS', 500)
+        workers = getattr(settings, 'SOLVER_WORKERS', None) or os.cpu_count()
+
+        best, done = None, 0
+        with ProcessPoolExecutor(max_workers=min(workers, restarts), mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=solver.init_worker, initargs=(problem,)) as executor:
+            futures = {
+                executor.submit(solver.search, None, self.get_seed(restart, 0), iterations): (restart, 0)
+                for restart in range(restarts)
+            }
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    restart, round_number = futures.pop(future)
+                    assignment, result = future.result()
+                    done += 1
+                    if best is None or result[:2] < best[:2]:
+                        best = result
+                    if round_number + 1 < rounds:
+                        seed = self.get_seed(restart, round_number + 1)
+                        futures[executor.submit(solver.search, assignment, seed, iterations)] = (
+                            restart, round_number + 1,
+                        )
+                conflicts, penalty, assignment = best
+                SolverJob.objects.filter(pk=self.job.pk).update(
+                    progress=done / (restarts * rounds), conflicts=conflicts, penalty=penalty,
+                    solution=self.describe(assignment), updated_date=timezone.now(),
+                )
+
+    def get_seed(self, restart, round_number):
+        return f'{self.job.pk}:{restart}:{round_number}'
+
+
+def update_job(job_id, **fields):
+    SolverJob.objects.filter(pk=job_id).update(updated_date=timezone.now(), **fields)
+
+
+def run_job(job_id):
+    """Run a solver job in the current thread."""
+    job = SolverJob.objects.select_related('timetable').get(pk=job_id)
+    update_job(job_id, status=SolverJob.Status.Running)
+    try:
+        TimetableSolver(job).solve()
+    except SolverError as error:
+        update_job(job_id, status=SolverJob.Status.Failed, error=str(error))
+    except Exception:
+        update_job(job_id, status=SolverJob.Status.Failed, error='Solver failed.')
+        raise
+    else:
+        update_job(job_id, status=SolverJob.Status.Finished, progress=1)
+
+
+def run_in_background(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def start_job(job):
+    """Run a solver job in a background thread once the current transaction commits."""
+    transaction.on_commit(lambda: threading.Thread(target=run_in_background, args=(job.pk,), daemon=True).start())
+
+
+def is_stale(job):
+    """Whether a pending or running job was not updated for `SOLVER_STALE_TIMEOUT` seconds."""
+    timeout = timedelta(seconds=getattr(settings, 'SOLVER_STALE_TIMEOUT', 600))
+    return job.status in (SolverJob.Status.Pending, SolverJob.Status.Running) \
+        and job.updated_date < timezone.now() - timeout
+
+
+def restart_job(job):
+    """Reset the progress and the solution of a failed or stale job and start it again."""
+    job.status, job.progress, job.error = SolverJob.Status.Pending, 0, ''
+    job.conflicts = job.penalty = None
+    job.solution = []
+    job.updated_date = timezone.now()
+    job.save(update_fields=('status', 'progress', 'error', 'conflicts', 'penalty', 'solution', 'updated_date'))
+    start_job(job)
+
+
+def iter_solution_slots(timetable, details):
+    """
+    Returns: iterator of slots of placed periodic event details
+    """
+    for obj in details:
+        values = {field: getattr(obj, field) for field in ('weekday', 'repeat_type', 'start_time', 'end_time')}
+        values['instructor'], values['students'] = obj.instructor, list(obj.students.all())
+        yield from iter_event_slots(obj.event.title, timetable, (values,))
+
+
+@transaction.atomic
+def apply_solution(job):
+    """
+    Write the best solution of a job to its event details.
+
+    Bulk updates neither validate schedules nor send model signals, so the
+    placements are checked for conflicts with current agendas first, then
+    agendas of the events are rebuilt and the generation of event details
+    is bumped.
+    Raises:
+        SolverError: if the placements overlap occurrences of other schedules
+    """
+    placements = {placement['details']: placement for placement in job.solution}
+    instructors = {
+        str(obj.uuid): obj for obj in InstructorProfile.objects.filter(
+            uuid__in={placement['instructor'] for placement in job.solution if placement.get('instructor')},
+        ).only('uuid', 'user_id')
+    }
+    details = list(PeriodicEventDetails.objects.filter(
+        event__timetable=job.timetable_id, uuid__in=list(placements),
+    ).select_related('event', 'instructor').prefetch_related('students'))
+    updated_at = timezone.now()
+    for obj in details:
+        placement = placements[str(obj.uuid)]
+        obj.weekday, obj.repeat_type = placement['weekday'], placement['repeat_type']
+        obj.start_time = time.fromisoformat(placement['start_time'])
+        obj.end_time = time.fromisoformat(placement['end_time'])
+        if placement.get('instructor') in instructors:
+            obj.instructor = instructors[placement['instructor']]
+        obj.updated_at = updated_at
+
+    conflicts = find_conflicts(
+        iter_solution_slots(job.timetable, details), Q(details__in=[obj.uuid for obj in details]),
+    )
+    if conflicts:
+        slot, other = conflicts[0].slot, conflicts[0].other
+        raise SolverError(
+            f'The solution has {len(conflicts)} schedule conflicts, "{slot.title}" from '
+            f'{timezone.localtime(slot.start):%Y-%m-%d %H:%M} overlaps "{other.title}" from '
+            f'{timezone.localtime(other.start):%Y-%m-%d %H:%M}.'
+        )
+
+    PeriodicEventDetails.objects.bulk_update(
+        details, ('weekday', 'repeat_type', 'start_time', 'end_time', 'instructor', 'updated_at'),
+    )
+    agenda.refresh_events({obj.event_id for obj in details})
+    generations.bump(PeriodicEventDetails)
+    job.applied_date = updated_at
+    job.save(update_fields=('applied_date',))
+    return details
@@ -0,0 +1,328 @@
+import random
+import string
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import InstructorProfile, StudentGroup, StudentProfile
+from common import bulk
+from common.cache import generations
+from common.models import FileContentItem, ImageContentItem, TextContentItem, VideoContentItem
+from common.permissions import permission_cache
+from education import agenda
+from education.models import (
+    AgendaEntry,
+    Assignment,
+    AssignmentContent,
+    Course,
+    CourseContent,
+    Event,
+    EventType,
+    Grade,
+    NonPeriodicEventDetails,
+    PeriodicEventDetails,
+    PeriodicTimetableItem,
+    Solution,
+    SolutionContent,
+    Timetable,
+)
+
+User = get_user_model()
+
+CONTENT_ITEM_MODELS = (TextContentItem, FileContentItem, ImageContentItem, VideoContentItem,)
+EVENT_TYPES = ('Lecture', 'Seminar', 'Laboratory', 'Consultation',)
+
+
+class InstitutionGenerator:
+    """
+    Generate a synthetic institution with bulk inserts.
+
+    Sizes are given per scale unit, so `scale=10` creates ten times as many
+    users, groups, courses and everything related to them. Bulk inserts do
+    not send model signals, so agendas are rebuilt and generations of all
+    generated models are bumped at the end.
+    """
+    instructors = 10
+    student_groups = 10
+    students_per_group = 20
+    courses = 20
+    instructors_per_course = 2
+    groups_per_course = 2
+    events_per_timetable = 10
+    assignments_per_timetable = 5
+    contents_per_course = 2
+    contents_per_assignment = 2
+    solution_rate = 0.5
+    grade_rate = 0.5
+    password = 'password'
+
+    def __init__(self, scale=1, seed=None, batch_size=1000):
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = ''.join(self.random.choice(string.ascii_uppercase) for _ in range(3))
+        self.start_date = date.today() - timedelta(days=30)
+        self.counts = {}
+        self.models = set()
+
+    @transaction.atomic
+    def generate(self):
+        """
+        Generate the institution.
+
+        Returns: dictionary of created object counts by model label
+        """
+        auth_groups = self.create_auth_groups()
+        instructors = self.create_profiles(InstructorProfile, self.instructors * self.scale, auth_groups[1])
+        groups = self.create_student_groups(auth_groups[0])
+        courses = self.create_courses(instructors, groups)
+        timetables = self.create_timetables(courses)
+        self.create_events(timetables, instructors)
+        assignments = self.create_assignments(timetables)
+        solutions = self.create_solutions(assignments)
+        self.create_grades(solutions)
+        self.create_contents(courses, assignments, solutions)
+        agenda.rebuild()
+        self.counts[AgendaEntry._meta.label] = AgendaEntry.objects.count()
+        self.models.add(AgendaEntry)
+
+        for model in self.models:
+            generations.bump(model)
+        permission_cache.bump_version()
+        return self.counts
+
+    def bulk_create(self, model, objs):
+        """Insert objects in batches, see `common.bulk.bulk_create`."""
+        objs = bulk.bulk_create(model, objs, self.batch_size)
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + len(objs)
+        self.models.add(model)
+        return objs
+
+    def bulk_add(self, field, pairs):
+        """Insert many-to-many rows of `field` for (source, target) pairs."""
+        rows = bulk.bulk_add(field, [(source.pk, target.pk) for source, target in pairs], self.batch_size)
+        through = field.remote_field.through
+        self.counts[through._meta.label] = self.counts.get(through._meta.label, 0) + len(rows)
+        self.models.add(through)
+
+    def create_auth_groups(self):
+        groups = self.bulk_create(Group, [
+            Group(name=f'{self.prefix} students'),
+            Group(name=f'{self.prefix} instructors'),
+        ])
+        groups = list(Group.objects.filter(name__in=[group.name for group in groups]).order_by('-name'))
+        view_permissions = Permission.objects.filter(
+            content_type__app_label__in=('accounts', 'education', 'common'), codename__startswith='view_',
+        )
+        self.bulk_add(Group.permissions.field, [
+            (group, permission) for group in groups for permission in view_permissions
+        ])
+        return groups
+
+    def create_users(self, role, count, auth_group):
+        password = make_password(self.password)
+        users = self.bulk_create(User, [
+            User(
+                full_name=f'{role.title()} {index}',
+                email=f'{role}{index}.{self.prefix.lower()}@example.com',
+                password=password,
+            )
+            for index in range(count)
+        ])
+        self.bulk_add(User.groups.field, [(user, auth_group) for user in users])
+        return users
+
+    def create_profiles(self, model, count, auth_group):
+        users = self.create_users(model._meta.model_name.replace('profile', ''), count, auth_group)
+        return self.bulk_create(model, [model(user=user) for user in users])
+
+    def create_student_groups(self, auth_group):
+        count = self.student_groups * self.scale
+        students = self.create_profiles(StudentProfile, count * self.students_per_group, auth_group)
+        groups = self.bulk_create(StudentGroup, [
+            StudentGroup(code=f'{self.prefix}G{index}', title=f'Group {index}', year_of_admission=2020 + index % 4)
+            for index in range(count)
+        ])
+        self.bulk_add(StudentGroup.students.field, [
+            (group, student)
+            for index, group in enumerate(groups)
+            for student in students[index * self.students_per_group:(index + 1) * self.students_per_group]
+        ])
+        self.group_students = {
+            group.pk: students[index * self.students_per_group:(index + 1) * self.students_per_group]
+            for index, group in enumerate(groups)
+        }
+        return groups
+
+    def create_courses(self, instructors, groups):
+        courses = self.bulk_create(Course, [
+            Course(code=f'{self.prefix}C{index}', title=f'Course {index}', syllabus='Syllabus')
+            for index in range(self.courses * self.scale)
+        ])
+        self.course_instructors = {
+            course.pk: self.random.sample(instructors, self.instructors_per_course) for course in courses
+        }
+        self.course_students = {}
+        course_groups = []
+        for course in courses:
+            for group in self.random.sample(groups, self.groups_per_course):
+                course_groups.append((course, group))
+                self.course_students.setdefault(course.pk, []).extend(self.group_students[group.pk])
+        self.bulk_add(Course.instructors.field, [
+            (course, instructor) for course in courses for instructor in self.course_instructors[course.pk]
+        ])
+        self.bulk_add(Course.student_groups.field, course_groups)
+        return courses
+
+    def create_timetables(self, courses):
+        return self.bulk_create(Timetable, [
+            Timetable(
+                code=f'{self.prefix}T{index}',
+                title=f'{course.title} timetable',
+                course=course,
+                start_date=self.start_date,
+                end_date=self.start_date + timedelta(weeks=16),
+            )
+            for index, course in enumerate(courses)
+        ])
+
+    def create_events(self, timetables, instructors):
+        event_types = [
+            EventType.objects.get_or_create(title=title)[0] for title in EVENT_TYPES
+        ]
+        events = self.bulk_create(Event, [
+            Event(
+                title=f'Event {index}',
+                description='Description',
+                event_type=self.random.choice(event_types),
+                timetable=timetable,
+            )
+            for timetable in timetables
+            for index in range(self.events_per_timetable)
+        ])
+
+        weekdays = PeriodicTimetableItem.WeekDay.values[:5]
+        repeat_types = PeriodicTimetableItem.RepeatType.values
+        periodic_details, non_periodic_details = [], []
+        for event in events:
+            course_id = self.timetable_courses[event.timetable_id]
+            start_time, end_time = self.random_period()
+            periodic_details.append(PeriodicEventDetails(
+                event=event,
+                start_time=start_time,
+                end_time=end_time,
+                weekday=self.random.choice(weekdays),
+                repeat_type=self.random.choice(repeat_types),
+                instructor=self.random.choice(self.course_instructors[course_id]),
+            ))
+            start_time, end_time = self.random_period()
+            non_periodic_details.append(NonPeriodicEventDetails(
+                event=event,
+                start_time=start_time,
+                end_time=end_time,
+                date=self.random_datetime(start_time),
+                instructor=self.random.choice(self.course_instructors[course_id]),
+            ))
+
+        for model, details in ((PeriodicEventDetails, periodic_details),
+                               (NonPeriodicEventDetails, non_periodic_details)):
+            details = self.bulk_create(model, details)
+            self.bulk_add(model.students.field, [
+                (detail, student)
+                for detail in details
+                for student in self.course_students[self.timetable_courses[detail.event.timetable_id]]
+            ])
+        return events
+
+    @property
+    def timetable_courses(self):
+        if not hasattr(self, '_timetable_courses'):
+            self._timetable_courses = dict(Timetable.objects.values_list('pk', 'course_id'))
+        return self._timetable_courses
+
+    def create_assignments(self, timetables):
+        assignments = []
+        for timetable in timetables:
+            for index in range(self.assignments_per_timetable):
+                start_time, end_time = self.random_period()
+                assignments.append(Assignment(
+                    title=f'Assignment {index}',
+                    description='Description',
+                    timetable=timetable,
+                    start_time=start_time,
+                    end_time=end_time,
+                    date=self.random_datetime(start_time),
+                    instructor=self.random.choice(self.course_instructors[timetable.course_id]),
+                ))
+        assignments = self.bulk_create(Assignment, assignments)
+        self.bulk_add(Assignment.students.field, [
+            (assignment, student)
+            for assignment in assignments
+            for student in self.course_students[self.timetable_courses[assignment.timetable_id]]
+        ])
+        return assignments
+
+    def create_solutions(self, assignments):
+        solutions = []
+        for assignment in assignments:
+            students = self.course_students[self.timetable_courses[assignment.timetable_id]]
+            for student in self.random.sample(students, int(len(students) * self.solution_rate)):
+                solutions.append(Solution(assignment=assignment, student=student, comment='Comment'))
+        return self.bulk_create(Solution, solutions)
+
+    def create_grades(self, solutions):
+        graded = self.random.sample(solutions, int(len(solutions) * self.grade_rate))
+        assignment_instructors = dict(Assignment.objects.values_list('pk', 'instructor_id'))
+        return self.bulk_create(Grade, [
+            Grade(
+                value=self.random.randint(0, 100),
+                solution=solution,
+                instructor_id=assignment_instructors[solution.assignment_id],
+                comment='Comment',
+            )
+            for solution in graded
+        ])
+
+    def create_contents(self, courses, assignments, solutions):
+        owners = (
+            [(CourseContent, 'course', course) for course in courses for _ in range(self.contents_per_course)]
+            + [(AssignmentContent, 'assignment', assignment)
+               for assignment in assignments for _ in range(self.contents_per_assignment)]
+            + [(SolutionContent, 'solution', solution) for solution in solutions]
+        )
+        item_models = [CONTENT_ITEM_MODELS[index % len(CONTENT_ITEM_MODELS)] for index in range(len(owners))]
+        items = {}
+        for model in CONTENT_ITEM_MODELS:
+            count = item_models.count(model)
+            items[model] = iter(self.bulk_create(model, [
+                self.make_content_item(model, index) for index in range(count)
+            ]))
+
+        contents = {}
+        for (content_model, owner_field, owner), item_model in zip(owners, item_models):
+            content = content_model(item=next(items[item_model]), **{owner_field: owner})
+            contents.setdefault(content_model, []).append(content)
+        for content_model, objs in contents.items():
+            self.bulk_create(content_model, objs)
+
+    @staticmethod
+    def make_content_item(model, index):
+        title = f'{model._meta.verbose_name.title()} {index}'
+        if model is TextContentItem:
+            return model(title=title, content='Content')
+        if model is VideoContentItem:
+            return model(title=title, url=f'https://example.com/videos/{index}')
+        return model(title=title, file=f'{model._meta.model_name}/{index}.pdf')
+
+    def random_period(self):
+        start = self.random.randrange(8 * 60, 18 * 60, 15)
+        duration = self.random.choice((45, 60, 90))
+        return time(start // 60, start % 60), time((start + duration) // 60, (start + duration) % 60)
+
+    def random_datetime(self, start_time):
+        day = self.start_date + timedelta(days=self.random.randrange(16 * 7))
+        return timezone.make_aware(datetime.combine(day, start_time))